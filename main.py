@@ -8,19 +8,32 @@ Desktop Widgets Ultimate v4.0
 
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
 import calendar
+import csv
 from datetime import datetime, timedelta
+import heapq
 import json
+import math
 import os
 import ctypes
 from ctypes import wintypes
 import sys
-import winreg
 import time
 import threading
+import queue
+import re
+import sqlite3
+from collections import Counter, OrderedDict
+from bisect import bisect_left, insort
 
 # ============== WINDOWS API ==============
-user32 = ctypes.windll.user32
+# Only available on Windows - elsewhere the module still imports and uses FakeDesktopBackend
+try:
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+except AttributeError:
+    user32 = kernel32 = None
 
 # Constants
 GWL_EXSTYLE = -20
@@ -29,20 +42,48 @@ WS_CHILD = 0x40000000
 WS_EX_TOOLWINDOW = 0x00000080
 WS_EX_NOACTIVATE = 0x08000000
 WS_EX_LAYERED = 0x00080000
+DESKTOP_SWITCHDESKTOP = 0x0100
 
 # API Functions
-FindWindow = user32.FindWindowW
-FindWindowEx = user32.FindWindowExW
-SendMessageTimeout = user32.SendMessageTimeoutW
-SetParent = user32.SetParent
-GetParent = user32.GetParent
-SetWindowLong = user32.SetWindowLongW
-GetWindowLong = user32.GetWindowLongW
-ShowWindow = user32.ShowWindow
-EnumWindows = user32.EnumWindows
-GetClassName = user32.GetClassNameW
-
-WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int))
+if user32:
+    FindWindow = user32.FindWindowW
+    FindWindowEx = user32.FindWindowExW
+    SendMessageTimeout = user32.SendMessageTimeoutW
+    SetParent = user32.SetParent
+    GetParent = user32.GetParent
+    SetWindowLong = user32.SetWindowLongW
+    GetWindowLong = user32.GetWindowLongW
+    ShowWindow = user32.ShowWindow
+    IsWindow = user32.IsWindow
+    EnumWindows = user32.EnumWindows
+    GetClassName = user32.GetClassNameW
+    GetLastInputInfo = user32.GetLastInputInfo
+    OpenInputDesktop = user32.OpenInputDesktop
+    CloseDesktop = user32.CloseDesktop
+    GetTickCount = kernel32.GetTickCount
+    GetTickCount.restype = wintypes.DWORD
+    
+    WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int))
+
+
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+
+def beep():
+    """Notification sound - silent where winsound is missing"""
+    if winsound:
+        try:
+            winsound.MessageBeep()
+        except RuntimeError:
+            pass
+
 
 # ============== PATHS ==============
 if getattr(sys, 'frozen', False):
@@ -51,83 +92,216 @@ else:
     APP_PATH = os.path.abspath(__file__)
 
 DATA_FILE = os.path.join(os.path.expanduser("~"), "desktop_widgets_ultimate_data.json")
-STARTUP_FOLDER = os.path.join(os.environ["APPDATA"], "Microsoft", "Windows", "Start Menu", "Programs", "Startup")
+JOURNAL_FILE = DATA_FILE + ".log"
+DATA_DB = os.path.join(os.path.expanduser("~"), "desktop_widgets_ultimate_data.db")
+DATA_DIR = os.path.join(os.path.expanduser("~"), "desktop_widgets_ultimate_data")
+THEMES_FILE = os.path.join(os.path.expanduser("~"), "desktop_widgets_themes.json")
+STARTUP_FOLDER = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "Microsoft", "Windows", "Start Menu", "Programs", "Startup")
 SHORTCUT_PATH = os.path.join(STARTUP_FOLDER, "DesktopWidgets.bat")
 
 
 # ============== DESKTOP WALLPAPER LAYER ==============
+class Win32DesktopBackend:
+    """Platform calls behind DesktopWallpaperLayer and the idle check.
+    find_layer() may block and runs on a worker thread; everything else runs on the Tk thread"""
+    
+    def find_layer(self):
+        """Find (or make Progman spawn) the WorkerW window behind the desktop icons"""
+        progman = FindWindow("Progman", None)
+        if not progman:
+            return None
+        
+        # Send message to spawn WorkerW
+        result = ctypes.c_ulong()
+        SendMessageTimeout(progman, 0x052C, 0, 0, 0x0000, 1000, ctypes.byref(result))
+        
+        time.sleep(0.2)
+        
+        # Find WorkerW
+        found = []
+        
+        def find_workerw(hwnd, lParam):
+            class_name = ctypes.create_unicode_buffer(256)
+            GetClassName(hwnd, class_name, 256)
+            if class_name.value == "WorkerW":
+                shell = FindWindowEx(hwnd, None, "SHELLDLL_DefView", None)
+                if shell:
+                    found.append(FindWindowEx(None, hwnd, "WorkerW", None))
+            return True
+        
+        EnumWindows(WNDENUMPROC(find_workerw), 0)
+        
+        # If WorkerW not found, use Progman
+        return found[-1] if found and found[-1] else progman
+    
+    def is_valid(self, layer):
+        # Explorer restarts replace the layer window
+        return bool(IsWindow(layer))
+    
+    def handle(self, win):
+        return GetParent(win.winfo_id())
+    
+    def embed(self, hwnd, layer):
+        # Set as child of desktop layer
+        SetParent(hwnd, layer)
+        
+        # Set window styles
+        style = GetWindowLong(hwnd, GWL_EXSTYLE)
+        style |= WS_EX_TOOLWINDOW | WS_EX_NOACTIVATE
+        SetWindowLong(hwnd, GWL_EXSTYLE, style)
+        
+        # Show window
+        ShowWindow(hwnd, 5)
+        return True
+    
+    def idle_seconds(self):
+        info = LASTINPUTINFO(ctypes.sizeof(LASTINPUTINFO), 0)
+        if not GetLastInputInfo(ctypes.byref(info)):
+            return 0
+        return ((GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000
+    
+    def locked(self):
+        # The input desktop can't be opened while the lock screen owns it
+        desk = OpenInputDesktop(0, False, DESKTOP_SWITCHDESKTOP)
+        if not desk:
+            return True
+        CloseDesktop(desk)
+        return False
+    
+    def is_idle(self, after):
+        return self.locked() or self.idle_seconds() >= after
+
+
+class FakeDesktopBackend:
+    """In-memory backend for other platforms, tests and benchmarks: windows stay normal
+    toplevels, embedding is only recorded. find_delay simulates a slow layer search"""
+    
+    def __init__(self, find_delay=0.0, idle=False):
+        self.find_delay = find_delay
+        self.idle = idle
+        self.layer = 1
+        self.finds = 0
+        self.embedded = {}     # window handle -> layer
+    
+    def find_layer(self):
+        self.finds += 1
+        time.sleep(self.find_delay)
+        return self.layer
+    
+    def is_valid(self, layer):
+        return layer == self.layer
+    
+    def handle(self, win):
+        return win.winfo_id()
+    
+    def embed(self, hwnd, layer):
+        self.embedded[hwnd] = layer
+        return True
+    
+    def is_idle(self, after):
+        return self.idle
+
+
+def open_backend(name=None):
+    name = name or DESKTOP_BACKEND
+    if name == "win32" or (name == "auto" and user32):
+        return Win32DesktopBackend()
+    return FakeDesktopBackend()
+
+
 class DesktopWallpaperLayer:
-    """Embeds windows into the desktop wallpaper layer"""
+    """Embeds windows into the desktop wallpaper layer.
+    The layer window is searched for on a worker thread, cached and revalidated before each use.
+    Windows asking to be embedded are queued and embedded together in one batch"""
     
-    _workerw = None
-    _progman = None
+    def __init__(self, root, backend):
+        self.root = root
+        self.backend = backend
+        self.layer = None
+        self.pending = []          # widgets waiting for the next batch
+        self.batches = 0
+        self.embedded = 0
+        self.find_ms = None
+        self._thread = None
+        self._found = None         # set by the worker thread, picked up by _poll
+        self._job = None
+        self._retry_at = 0.0       # monotonic time before which a missing layer isn't searched for again
+        self._backoff = DESKTOP_RETRY_MS
     
-    @classmethod
-    def initialize(cls):
-        """Initialize and find/create the WorkerW window"""
+    def start(self):
+        """Begin looking for the layer window without blocking the Tk thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._found = None
+        self._thread = threading.Thread(target=self._find, daemon=True)
+        self._thread.start()
+        self.root.after(DESKTOP_POLL_MS, self._poll)
+    
+    def _find(self):
+        t0 = time.perf_counter()
         try:
-            # Find Program Manager
-            cls._progman = FindWindow("Progman", None)
-            if not cls._progman:
-                return False
-            
-            # Send message to spawn WorkerW
-            result = ctypes.c_ulong()
-            SendMessageTimeout(cls._progman, 0x052C, 0, 0, 0x0000, 1000, ctypes.byref(result))
-            
-            time.sleep(0.2)
-            
-            # Find WorkerW
-            def find_workerw(hwnd, lParam):
-                class_name = ctypes.create_unicode_buffer(256)
-                GetClassName(hwnd, class_name, 256)
-                if class_name.value == "WorkerW":
-                    shell = FindWindowEx(hwnd, None, "SHELLDLL_DefView", None)
-                    if shell:
-                        cls._workerw = FindWindowEx(None, hwnd, "WorkerW", None)
-                return True
-            
-            EnumWindows(WNDENUMPROC(find_workerw), 0)
-            
-            # If WorkerW not found, use Progman
-            if not cls._workerw:
-                cls._workerw = cls._progman
-            
-            return cls._workerw is not None
-            
+            layer = self.backend.find_layer()
         except Exception as e:
             print(f"Desktop init error: {e}")
-            return False
+            layer = None
+        self._found = (layer, (time.perf_counter() - t0) * 1000)
     
-    @classmethod
-    def embed(cls, hwnd):
-        """Embed a window into the desktop layer"""
-        try:
-            if not cls._workerw:
-                cls.initialize()
-            
-            if cls._workerw:
-                # Set as child of desktop layer
-                SetParent(hwnd, cls._workerw)
-                
-                # Set window styles
-                style = GetWindowLong(hwnd, GWL_EXSTYLE)
-                style |= WS_EX_TOOLWINDOW | WS_EX_NOACTIVATE
-                SetWindowLong(hwnd, GWL_EXSTYLE, style)
-                
-                # Show window
-                ShowWindow(hwnd, 5)
-                return True
-        except Exception as e:
-            print(f"Embed error: {e}")
-        return False
+    def _poll(self):
+        if self._found is None:
+            self.root.after(DESKTOP_POLL_MS, self._poll)
+            return
+        self.layer, self.find_ms = self._found
+        if self.layer is None:
+            # No layer to embed into (no shell running?): windows stay normal toplevels, and
+            # requests in the meantime don't start the expensive search again
+            self._retry_at = time.monotonic() + self._backoff / 1000
+            self._backoff = min(self._backoff * 2, DESKTOP_RETRY_MAX_MS)
+            self._fallback()
+        else:
+            self._backoff = DESKTOP_RETRY_MS
+            if self.pending:
+                self._flush()
     
-    @classmethod
-    def get_parent(cls):
-        """Get the desktop layer window handle"""
-        if not cls._workerw:
-            cls.initialize()
-        return cls._workerw
+    def _fallback(self):
+        for widget in self.pending:
+            print(f"✗ {widget.wid} not embedded - using fallback")
+        self.pending = []
+    
+    def request(self, widget):
+        """Embed widget with the next batch (once the layer is known)"""
+        if widget not in self.pending:
+            self.pending.append(widget)
+        if not self._job:
+            self._job = self.root.after_idle(self._flush)
+    
+    def _flush(self):
+        self._job = None
+        if not self.pending:
+            return
+        if self.layer is None or not self.backend.is_valid(self.layer):
+            # Not found yet, or gone stale: look (again) and flush when done
+            if self._found is not None:
+                self.layer = None
+            if time.monotonic() < self._retry_at:
+                self._fallback()
+                return
+            self.start()
+            return
+        
+        widgets, self.pending = self.pending, []
+        self.root.update_idletasks()     # once for the whole batch
+        self.batches += 1
+        for widget in widgets:
+            try:
+                ok = self.backend.embed(self.backend.handle(widget.win), self.layer)
+            except Exception as e:
+                print(f"Embed error: {e}")
+                ok = False
+            if ok:
+                self.embedded += 1
+                print(f"✓ {widget.wid} embedded")
+            else:
+                print(f"✗ {widget.wid} not embedded - using fallback")
 
 
 # ============== COLOR THEMES ==============
@@ -142,6 +316,86 @@ THEMES = {
     "☁️ White": {"bg": "#FAFAFA", "header": "#E8E8E8", "accent": "#607D8B", "text": "#424242", "text_light": "#757575", "button": "#EEE", "entry": "#FFF", "border": "#E0E0E0"},
 }
 
+THEME_ROLES = ("bg", "header", "accent", "text", "text_light", "button", "entry", "border")
+COLOR_OPTIONS = {"bg", "fg", "selectcolor", "insertbackground", "activebackground", "activeforeground",
+                 "highlightbackground", "highlightcolor"}
+
+
+def load_user_themes(path=THEMES_FILE, check=None):
+    """Layer user themes from a JSON file over THEMES, e.g. {"Rose": {"base": "🌙 Dark", "accent": "#E91E63"}}.
+    Missing roles come from base (default Blue); a built-in name only overrides the roles it lists.
+    check(color) may raise to reject a theme with a bad color. Returns the names loaded"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            user = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"Theme file error: {e}")
+        return []
+    
+    loaded = []
+    for name, roles in user.items() if isinstance(user, dict) else []:
+        if not isinstance(roles, dict):
+            continue
+        theme = dict(THEMES.get(name) or THEMES.get(roles.get("base"), THEMES["🌊 Blue"]))
+        theme.update({role: color for role, color in roles.items() if role in THEME_ROLES})
+        try:
+            for color in theme.values():
+                if check:
+                    check(color)
+        except Exception as e:
+            print(f"Theme {name} skipped: {e}")
+            continue
+        THEMES[name] = theme
+        loaded.append(name)
+    return loaded
+
+
+class ThemeStyles:
+    """Theme roles of one widget's Tk widgets and canvas items.
+    A theme switch is one configure pass over what is registered - nothing is rebuilt"""
+    
+    def __init__(self, theme):
+        self.theme = theme
+        self.widgets = {}       # Tk widget -> {option: role}
+        self.canvases = []      # canvases whose items carry "option:role" tags from paint()
+    
+    def create(self, cls, *args, **options):
+        """cls(*args, **options) where color options may name a role (bg="entry")"""
+        roles = {k: v for k, v in options.items() if k in COLOR_OPTIONS and v in THEME_ROLES}
+        options.update({k: self.theme[role] for k, role in roles.items()})
+        widget = cls(*args, **options)
+        if roles:
+            self.widgets[widget] = roles
+        if isinstance(widget, tk.Canvas):
+            self.canvases.append(widget)
+        return widget
+    
+    def paint(self, **options):
+        """Canvas item options where colors may name a role (fill="accent"), tagged for apply()"""
+        tags = []
+        for opt, color in options.items():
+            if color in THEME_ROLES:
+                tags.append(f"{opt}:{color}")
+                options[opt] = self.theme[color]
+        if tags:
+            options["tags"] = tuple(tags)
+        return options
+    
+    def apply(self, theme):
+        self.theme = theme
+        for widget, roles in list(self.widgets.items()):
+            try:
+                widget.config(**{opt: theme[role] for opt, role in roles.items()})
+            except tk.TclError:
+                del self.widgets[widget]     # destroyed since it was created
+        for canvas in self.canvases:
+            for role in THEME_ROLES:
+                for opt in ("fill", "outline"):
+                    canvas.itemconfigure(f"{opt}:{role}", **{opt: theme[role]})
+
+
 FONTS = {
     "title": ("Segoe UI Semibold", 11),
     "header": ("Segoe UI Semibold", 10),
@@ -163,9 +417,15 @@ COMPACT_SIZES = {
     "sticky_notes": (260, 280),
     "pomodoro": (220, 280),
     "habit_tracker": (320, 220),
-    "clock": (180, 120)
+    "clock": (180, 120),
+    "agenda": (240, 280)
 }
 
+# Size classes by window scale (the larger of width and height relative to COMPACT_SIZES), smallest first
+BREAKPOINTS = (("compact", 0.0), ("expanded", 1.2), ("wide", 2.0))
+RESIZE_HYSTERESIS = 0.05   # scale margin past a breakpoint before the class changes
+FRAME_MS = 16              # pointer motion and resize layout passes run at most once per frame
+
 MIN_SIZES = {
     "calendar": (220, 250),
     "todo": (200, 220),
@@ -175,8 +435,932 @@ MIN_SIZES = {
     "sticky_notes": (200, 200),
     "pomodoro": (180, 220),
     "habit_tracker": (280, 180),
-    "clock": (150, 100)
+    "clock": (150, 100),
+    "agenda": (180, 150)
+}
+
+# Write-behind saving (milliseconds)
+SAVE_DELAY_MS = 800        # quiet period after the last edit before writing
+SAVE_MAX_DELAY_MS = 5000   # never hold a dirty store longer than this while typing
+SAVE_POLL_MS = 100         # how often the Tk loop checks for finished background writes
+SAVE_RETRIES = 3           # automatic retries after a failed write
+EDIT_IDLE_MS = 500           # editors commit their text once typing pauses this long
+LAYOUT_SAVE_DELAY_MS = 2000  # window positions and sizes are recorded once moving has settled this long
+
+# Storage: "json" rewrites the whole file, "journal" appends change records to JOURNAL_FILE,
+# "sqlite" keeps one table per domain in DATA_DB, "partitioned" keeps one file per month in DATA_DIR
+STORAGE_MODE = os.environ.get("DESKTOP_WIDGETS_STORAGE", "json")
+JOURNAL_COMPACT_BYTES = 256 * 1024   # fold the log into a new snapshot past this size
+PARTITION_CACHE = 6                  # month partitions kept in memory before LRU eviction
+
+# Desktop embedding: "auto" uses Win32 on Windows and the in-memory fake elsewhere
+DESKTOP_BACKEND = os.environ.get("DESKTOP_WIDGETS_BACKEND", "auto")
+DESKTOP_POLL_MS = 50        # how often the Tk loop checks whether the layer search finished
+DESKTOP_RETRY_MS = 5000     # after a search finds no layer, wait this long before searching again,
+DESKTOP_RETRY_MAX_MS = 300000   # doubling with each failed search up to this
+
+# Idle: widgets stop rendering after this long without input (or while locked), checked every minute
+# and every IDLE_POLL_MS once idle so they wake up soon after the user comes back
+IDLE_AFTER_S = 300
+IDLE_POLL_MS = 5000
+
+# Navigation: view models kept per widget (the shown page, its neighbours and a few recent ones)
+PAGE_CACHE_SIZE = 5
+
+# Scrolling lists: rows built beyond each edge of the view, and scroll-region update throttle
+VIRTUAL_OVERSCAN = 3
+SCROLL_REGION_MS = 50
+
+# Search: domains in the full-text index, hits shown per query, and how much a word matched
+# only by its beginning counts against an exact match
+SEARCH_DOMAINS = ("todos", "notes", "events", "day_planner", "week_planner", "monthly")
+SEARCH_LISTS = ("todos", "notes")
+SEARCH_LIMIT = 50
+SEARCH_PREFIX_WEIGHT = 0.5
+SEARCH_SCAN_DOCS = 500      # documents read best-first before a multi-word query intersects postings instead
+SEARCH_POLL_MS = 100        # how often the Tk loop checks whether the index build finished
+
+# Recurring events: rule frequencies, and how far ahead a rule with a count is followed to find its end
+RECUR_FREQS = ("daily", "weekly", "monthly", "yearly")
+RECUR_SCAN_MONTHS = 1200
+
+# Agenda: days ahead it lists, and the data it is built from
+AGENDA_DAYS = 14
+AGENDA_DOMAINS = ("events", "recurring", "timed", "day_planner", "week_planner", "todos")
+
+# Reminders: snooze length, and the time of day offered for "remind on the due day"
+REMINDER_SNOOZE_MIN = 10
+REMINDER_DUE_TIME = "09:00"
+
+
+# ============== PERSISTENCE ==============
+class WriteBehindSaver:
+    """Coalesces bursts of save requests into one write when the app goes idle"""
+    
+    def __init__(self, root, write, delay=SAVE_DELAY_MS, max_delay=SAVE_MAX_DELAY_MS, clock=time.monotonic):
+        self.root = root
+        self.write = write
+        self.delay = delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.dirty = False
+        self.writes = 0
+        self._first_dirty = None
+        self._timer = None
+        self._idle = None
+    
+    @property
+    def pending(self):
+        """True while there are changes that have not been written yet"""
+        return self.dirty
+    
+    def mark_dirty(self):
+        """Record a change and push the write back until the burst settles"""
+        now = self.clock()
+        if not self.dirty:
+            self.dirty = True
+            self._first_dirty = now
+        self._cancel()
+        
+        # Keep deferring while edits arrive, but not past max_delay
+        waited = (now - self._first_dirty) * 1000
+        wait = max(0, min(self.delay, self.max_delay - waited))
+        self._timer = self.root.after(int(wait), self._on_quiet)
+    
+    def _on_quiet(self):
+        self._timer = None
+        self._idle = self.root.after_idle(self.flush)
+    
+    def _cancel(self):
+        for job in (self._timer, self._idle):
+            if job:
+                try:
+                    self.root.after_cancel(job)
+                except Exception:
+                    pass
+        self._timer = self._idle = None
+    
+    def flush(self):
+        """Write immediately if anything is pending. Returns True if a write happened"""
+        self._cancel()
+        if not self.dirty:
+            return False
+        self.dirty = False
+        self._first_dirty = None
+        self.write()
+        self.writes += 1
+        return True
+
+
+class BackgroundWriter:
+    """Runs store writes on a worker thread.
+    Results come back through a queue that the Tk loop drains with poll()"""
+    
+    def __init__(self, write):
+        self.write = write
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.outstanding = 0
+        self.thread = threading.Thread(target=self._run, name="widgets-writer", daemon=True)
+        self.thread.start()
+    
+    def submit(self, payload):
+        self.outstanding += 1
+        self.jobs.put(payload)
+    
+    def _run(self):
+        while True:
+            payload = self.jobs.get()
+            if isinstance(payload, threading.Event):
+                payload.set()
+                continue
+            try:
+                self.write(payload)
+                self.results.put((payload, None))
+            except Exception as e:
+                self.results.put((payload, e))
+    
+    def poll(self):
+        """Collect finished writes as (payload, error) pairs. Call from the Tk thread"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.outstanding -= len(done)
+        return done
+    
+    def drain(self, timeout=5.0):
+        """Block until everything submitted so far has been written"""
+        marker = threading.Event()
+        self.jobs.put(marker)
+        return marker.wait(timeout)
+
+
+def read_json(path):
+    """Load a JSON document, or {} if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Load error ({os.path.basename(path)}): {e}")
+        return {}
+
+
+def atomic_write(path, text):
+    """Replace a file so readers see either the old or the new content, never a mix"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _walk(data, path, create=False):
+    """Follow a key/index path into nested dicts and lists"""
+    node = data
+    for key in path:
+        if isinstance(node, list):
+            if not isinstance(key, int) or not -len(node) <= key < len(node):
+                return None
+            node = node[key]
+        elif isinstance(node, dict):
+            if key not in node:
+                if not create:
+                    return None
+                node[key] = {}
+            node = node[key]
+        else:
+            return None
+    return node
+
+
+def apply_change(data, op, path, value=None):
+    """Apply one change record ("set", "del" or "append") to app data. Returns False if it did not apply"""
+    parent = _walk(data, path[:-1], create=(op != "del"))
+    key = path[-1]
+    if isinstance(parent, list):
+        if not isinstance(key, int) or not -len(parent) <= key < len(parent):
+            return False
+        if op == "set":
+            parent[key] = value
+        elif op == "del":
+            del parent[key]
+        else:
+            parent[key].append(value)
+        return True
+    if not isinstance(parent, dict):
+        return False
+    if op == "set":
+        parent[key] = value
+    elif op == "del":
+        if key not in parent:
+            return False
+        del parent[key]
+    else:
+        parent.setdefault(key, []).append(value)
+    return True
+
+
+def read_journal(path, after_seq=0):
+    """Read change records newer than after_seq.
+    Returns (records, good_bytes, total_bytes) - a torn last line ends the valid part"""
+    records, good = [], 0
+    if not os.path.exists(path):
+        return records, 0, 0
+    with open(path, "rb") as f:
+        raw = f.read()
+    for line in raw.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+        try:
+            seq, op, p, v = json.loads(line)
+        except Exception:
+            break
+        good += len(line)
+        if seq > after_seq:
+            records.append((seq, op, p, v))
+    return records, good, len(raw)
+
+
+def copy_tree(value):
+    """Copy nested dicts/lists - much cheaper than deepcopy for plain JSON data"""
+    if isinstance(value, dict):
+        return {k: copy_tree(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_tree(v) for v in value]
+    return value
+
+
+def merge_missing(target, source):
+    """Fill in entries of source that target lacks, recursing into dicts. Values already in target win"""
+    for k, v in source.items():
+        if k not in target:
+            target[k] = v
+        elif isinstance(target[k], dict) and isinstance(v, dict):
+            merge_missing(target[k], v)
+
+
+class IncrementalEncoder:
+    """Produces the same text as json.dumps(data, indent=2, ensure_ascii=False), but re-encodes only
+    what changed. Dict sections (events, day_planner, positions, ...) are cached per child entry, other
+    sections whole. prepare() runs on the Tk thread, encode() on the writer thread"""
+    
+    def __init__(self):
+        # Tk thread: what has been sent to the encoder and what changed since
+        self.kinds = {}          # section -> "dict" or "value" as last sent
+        self.dirty = {}          # section -> None (whole section) or set of changed child keys
+        self.all_dirty = True
+        # Writer thread: cached fragments
+        self.fragments = {}      # section -> {child: encoded line} for dicts, else encoded value
+        self.blocks = {}         # section -> its assembled '  "key": ...' text
+    
+    def mark(self, changes):
+        """Note which subtrees the changes touched. None means everything.
+        Child keys only matter for dict sections - prepare() re-encodes others whole"""
+        if changes is None:
+            self.all_dirty = True
+            return
+        for _, path, _ in changes:
+            key = path[0]
+            if len(path) == 1:
+                self.dirty[key] = None
+            elif self.dirty.get(key, ()) is not None:
+                self.dirty.setdefault(key, set()).add(path[1])
+    
+    def prepare(self, data):
+        """Copy only the dirty subtrees. Returns the payload for encode()"""
+        updates = {}
+        for key, value in data.items():
+            kind = "dict" if isinstance(value, dict) else "value"
+            if self.all_dirty or self.kinds.get(key) != kind:
+                updates[key] = ("whole", copy_tree(value))
+            elif key in self.dirty and (kind != "dict" or self.dirty[key] is None):
+                # Lists and scalars have no per-child fragments
+                updates[key] = ("whole", copy_tree(value))
+            elif key in self.dirty:
+                changed = {k: copy_tree(value[k]) for k in self.dirty[key] if k in value}
+                updates[key] = ("children", list(value), changed)
+            self.kinds[key] = kind
+        for key in [k for k in self.kinds if k not in data]:
+            del self.kinds[key]
+        self.dirty.clear()
+        self.all_dirty = False
+        return list(data), updates
+    
+    def encode(self, payload):
+        order, updates = payload
+        for key, update in updates.items():
+            if update[0] == "whole":
+                value = update[1]
+                if isinstance(value, dict):
+                    self.fragments[key] = {k: self._line(k, v) for k, v in value.items()}
+                else:
+                    self.fragments[key] = self._enc(value, 1)
+            else:
+                _, children, changed = update
+                old = self.fragments[key]
+                self.fragments[key] = {k: self._line(k, changed[k]) if k in changed else old[k] for k in children}
+            self.blocks.pop(key, None)
+        for key in [k for k in self.fragments if k not in updates and k not in order]:
+            del self.fragments[key]
+            self.blocks.pop(key, None)
+        
+        parts = []
+        for key in order:
+            block = self.blocks.get(key)
+            if block is None:
+                frag = self.fragments[key]
+                if isinstance(frag, dict):
+                    frag = "{\n" + ",\n".join(frag.values()) + "\n  }" if frag else "{}"
+                block = self.blocks[key] = f"  {json.dumps(key, ensure_ascii=False)}: {frag}"
+            parts.append(block)
+        return "{\n" + ",\n".join(parts) + "\n}" if parts else "{}"
+    
+    @staticmethod
+    def _enc(value, depth):
+        # JSON strings never contain raw newlines, so re-indenting is a plain replace
+        return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + "  " * depth)
+    
+    def _line(self, key, value):
+        return f"    {json.dumps(key, ensure_ascii=False)}: {self._enc(value, 2)}"
+
+
+class JsonStore:
+    """Single JSON document - every commit rewrites the whole file.
+    prepare() runs on the Tk thread and must be cheap; write() runs on the writer thread"""
+    
+    def __init__(self, path=DATA_FILE, journal_path=JOURNAL_FILE):
+        self.path = path
+        self.journal_path = journal_path
+        self.encoder = IncrementalEncoder()
+        self._stale_journal = False
+    
+    def load(self):
+        data = read_json(self.path)
+        seq = data.pop("journal_seq", 0)
+        
+        # Fold in edits left behind by journal mode so switching modes never drops them
+        records, _, _ = read_journal(self.journal_path, seq)
+        for _, op, p, v in records:
+            apply_change(data, op, p, v)
+        self._stale_journal = os.path.exists(self.journal_path)
+        return data
+    
+    def fetch(self, data, domain, key, pending=()):
+        """Make one period of a domain available in data. Everything is already loaded here.
+        pending lists changes not yet passed to prepare()"""
+        pass
+    
+    def hold(self, data, path):
+        """data[path] changed in memory and will be recorded later - keep it loaded until then"""
+        pass
+    
+    def months(self, data, domain):
+        """Sorted "YYYY-MM" periods holding data for a period domain, loaded or not"""
+        return sorted({key[:7] for key in data.get(domain, {})})
+    
+    def scan(self, domains):
+        """(path, value) for stored periods of domains that load() left out of data.
+        Runs on the search thread. Everything is loaded here"""
+        return iter(())
+    
+    def close(self):
+        pass
+    
+    def prepare(self, data, changes):
+        """Take a consistent snapshot to write. changes is the list of (op, path, value)
+        since the last commit, or None if unknown"""
+        self.encoder.mark(changes)
+        return self.encoder.prepare(data)
+    
+    def write(self, payload):
+        atomic_write(self.path, self.encoder.encode(payload))
+        if self._stale_journal:
+            os.remove(self.journal_path)
+            self._stale_journal = False
+    
+    def failed(self, payload):
+        """Called on the Tk thread when write(payload) raised"""
+        self.encoder.mark(None)
+    
+    def commit(self, data, changes):
+        """Prepare and write in one go on the calling thread"""
+        self.write(self.prepare(data, changes))
+
+
+class JournalStore(JsonStore):
+    """Snapshot file plus an append-only log of change records.
+    A commit appends only the changed values; the log is folded into a new snapshot past compact_bytes"""
+    
+    def __init__(self, path=DATA_FILE, journal_path=JOURNAL_FILE, compact_bytes=JOURNAL_COMPACT_BYTES):
+        super().__init__(path, journal_path)
+        self.compact_bytes = compact_bytes
+        self.seq = 0
+        self.log_bytes = 0
+        self.compactions = 0
+        self._needs_compact = False
+    
+    def load(self):
+        data = read_json(self.path)
+        self.seq = data.pop("journal_seq", 0)
+        
+        records, good, total = read_journal(self.journal_path, self.seq)
+        for seq, op, p, v in records:
+            apply_change(data, op, p, v)
+            self.seq = seq
+        
+        # Drop a half-written tail so new records are not appended after garbage
+        if good < total:
+            print(f"Journal: dropped {total - good} bytes of torn tail")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+        self.log_bytes = good
+        return data
+    
+    def prepare(self, data, changes):
+        self.encoder.mark(changes)
+        lines = []
+        for op, p, v in changes or ():
+            self.seq += 1
+            lines.append(json.dumps([self.seq, op, p, v], ensure_ascii=False, separators=(",", ":")))
+        chunk = ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+        
+        if changes is None or self._needs_compact or self.log_bytes + len(chunk) >= self.compact_bytes:
+            self._needs_compact = False
+            self.log_bytes = 0
+            self.encoder.mark([("set", ["journal_seq"], self.seq)])
+            return ("compact", self.encoder.prepare(dict(data, journal_seq=self.seq)))
+        self.log_bytes += len(chunk)
+        return ("append", chunk)
+    
+    def write(self, payload):
+        if payload[0] == "append":
+            if payload[1]:
+                with open(self.journal_path, "ab") as f:
+                    f.write(payload[1])
+                    f.flush()
+                    os.fsync(f.fileno())
+            return
+        
+        # Compaction: the old snapshot is replaced atomically, then the log is emptied.
+        # If we stop in between, records already folded in are skipped by seq on the next load
+        atomic_write(self.path, self.encoder.encode(payload[1]))
+        open(self.journal_path, "wb").close()
+        self.compactions += 1
+    
+    def failed(self, payload):
+        # The log may be missing records now - the next commit writes a full snapshot
+        super().failed(payload)
+        self._needs_compact = True
+
+
+# Period domains: rows keyed the way the widgets look them up; loaded on demand per period
+SQL_PERIOD_DOMAINS = {
+    "events": ("date",),                # fetched per month "YYYY-MM"
+    "day_planner": ("date", "hour"),    # fetched per date
+    "week_planner": ("week", "day"),    # fetched per week start date
+    "monthly": ("month", "section"),    # fetched per month "YYYY-MM"
+    "pomo_stats": ("date",),            # fetched per month "YYYY-MM"
+    "pomo_log": ("date",),              # fetched per month "YYYY-MM"
 }
+SQL_LIST_DOMAINS = ("todos", "notes", "habits")
+SQL_LAYOUT_KEYS = ("positions", "sizes", "widget_themes")
+
+
+class SqliteStore:
+    """SQLite database (WAL mode) with one table per domain.
+    Period domains are loaded lazily through fetch(); every change becomes a single-row upsert or delete"""
+    
+    def __init__(self, path=DATA_DB, json_path=DATA_FILE, journal_path=JOURNAL_FILE):
+        self.path = path
+        self.json_path = json_path
+        self.journal_path = journal_path
+        self.loaded = set()
+        self.db = None     # reads, Tk thread
+        self.wdb = None    # writes, writer thread
+        self._needs_full = False
+    
+    def _connect(self, **kwargs):
+        db = sqlite3.connect(self.path, **kwargs)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS layout (kind TEXT, wid TEXT, value TEXT, PRIMARY KEY (kind, wid))")
+            for table, cols in SQL_PERIOD_DOMAINS.items():
+                db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(c + ' TEXT' for c in cols)}, "
+                           f"value TEXT, PRIMARY KEY ({', '.join(cols)}))")
+            for table in SQL_LIST_DOMAINS:
+                db.execute(f"CREATE TABLE IF NOT EXISTS {table} (pos INTEGER PRIMARY KEY, value TEXT)")
+        return db
+    
+    def load(self):
+        self.db = self._connect()
+        # Used from the writer thread only once loading is done, so sharing it is safe
+        self.wdb = self._connect(check_same_thread=False)
+        if not self.db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+            self.migrate()
+        
+        data = {domain: {} for domain in SQL_PERIOD_DOMAINS}
+        for key, value in self.db.execute("SELECT key, value FROM settings"):
+            data[key] = json.loads(value)
+        for kind, wid, value in self.db.execute("SELECT kind, wid, value FROM layout"):
+            data.setdefault(kind, {})[wid] = json.loads(value)
+        for table in SQL_LIST_DOMAINS:
+            rows = self.db.execute(f"SELECT value FROM {table} ORDER BY pos").fetchall()
+            if rows:
+                data[table] = [json.loads(v) for v, in rows]
+        self.loaded = set()
+        return data
+    
+    def migrate(self):
+        """One-shot import of the JSON file (and any journal tail). The JSON file is left in place as a backup"""
+        source = JsonStore(self.json_path, self.journal_path).load()
+        with self.wdb:
+            self._write_all(source)
+            self.wdb.execute("INSERT OR REPLACE INTO meta VALUES ('migrated', ?)", (datetime.now().isoformat(),))
+        if source:
+            print(f"Migrated {self.json_path} to {self.path}")
+    
+    def fetch(self, data, domain, key, pending=()):
+        """Load one period of a domain into data unless it is already there. In-memory values win"""
+        if domain in ("events", "pomo_stats", "pomo_log"):
+            # Fetched per month - a date from a change path means its month
+            key = key[:7]
+        if domain not in SQL_PERIOD_DOMAINS or (domain, key) in self.loaded:
+            return
+        self.loaded.add((domain, key))
+        cols = SQL_PERIOD_DOMAINS[domain]
+        if domain in ("events", "pomo_stats", "pomo_log"):
+            rows = self.db.execute(f"SELECT date, value FROM {domain} WHERE date >= ? AND date < ?",
+                                   (key + "-00", key + "-99"))
+        else:
+            rows = self.db.execute(f"SELECT {', '.join(cols)}, value FROM {domain} WHERE {cols[0]} = ?", (key,))
+        target = data.setdefault(domain, {})
+        for row in rows:
+            *keys, value = row
+            node = target
+            for k in keys[:-1]:
+                node = node.setdefault(k, {})
+            node.setdefault(keys[-1], json.loads(value))
+    
+    def hold(self, data, path):
+        # Periods are never dropped from memory here
+        pass
+    
+    def months(self, data, domain):
+        col = SQL_PERIOD_DOMAINS[domain][0]
+        stored = {m for m, in self.db.execute(f"SELECT DISTINCT substr({col}, 1, 7) FROM {domain}")}
+        return sorted(stored | {key[:7] for key in data.get(domain, {})})
+    
+    def scan(self, domains):
+        # Own connection - this runs on the search thread
+        db = sqlite3.connect(self.path)
+        try:
+            for domain in domains:
+                if domain in SQL_PERIOD_DOMAINS:
+                    cols = ", ".join(SQL_PERIOD_DOMAINS[domain])
+                    for *keys, value in db.execute(f"SELECT {cols}, value FROM {domain}"):
+                        yield (domain, *keys), json.loads(value)
+        finally:
+            db.close()
+    
+    def prepare(self, data, changes):
+        """Copy what the writer thread needs: the changed values, plus the current
+        value of small layout/settings entries which are always rewritten whole"""
+        if changes is None or self._needs_full:
+            self._needs_full = False
+            return ("all", copy_tree(data))
+        resolved = []
+        for op, path, value in changes:
+            domain = path[0]
+            current = None
+            if domain in SQL_LAYOUT_KEYS:
+                current = copy_tree(_walk(data, path[:2]))
+            elif domain not in SQL_PERIOD_DOMAINS and domain not in SQL_LIST_DOMAINS:
+                current = copy_tree(data.get(domain))
+            resolved.append((op, list(path), copy_tree(value), current))
+        return ("changes", resolved)
+    
+    def write(self, payload):
+        kind, body = payload
+        with self.wdb:
+            if kind == "all":
+                self._write_all(body)
+            else:
+                for op, path, value, current in body:
+                    self._apply(op, path, value, current)
+    
+    def failed(self, payload):
+        # A failed batch was rolled back - upsert everything loaded next time
+        self._needs_full = True
+    
+    def commit(self, data, changes):
+        self.write(self.prepare(data, changes))
+    
+    # ----- Writing (writer thread) -----
+    def _write_all(self, data):
+        """Upsert everything in data. Period rows that are not loaded are left untouched"""
+        for key, value in data.items():
+            self._write_domain(key, value)
+    
+    def _write_domain(self, domain, value):
+        if domain in SQL_PERIOD_DOMAINS:
+            for row in self._flatten(value, len(SQL_PERIOD_DOMAINS[domain])):
+                self._upsert(domain, row[:-1], row[-1])
+        elif domain in SQL_LIST_DOMAINS:
+            self.wdb.execute(f"DELETE FROM {domain}")
+            self.wdb.executemany(f"INSERT INTO {domain} VALUES (?, ?)",
+                                [(i, self._enc(v)) for i, v in enumerate(value or [])])
+        elif domain in SQL_LAYOUT_KEYS:
+            self.wdb.execute("DELETE FROM layout WHERE kind = ?", (domain,))
+            for wid, v in (value or {}).items():
+                self.wdb.execute("INSERT OR REPLACE INTO layout VALUES (?, ?, ?)", (domain, wid, self._enc(v)))
+        else:
+            self.wdb.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", (domain, self._enc(value)))
+    
+    def _apply(self, op, path, value, current):
+        domain = path[0]
+        if domain in SQL_PERIOD_DOMAINS:
+            self._apply_period(domain, op, path[1:], value)
+        elif domain in SQL_LIST_DOMAINS:
+            self._apply_list(domain, op, path[1:], value)
+        elif domain in SQL_LAYOUT_KEYS:
+            if len(path) == 1:
+                self._write_domain(domain, current)
+            elif current is None:
+                self.wdb.execute("DELETE FROM layout WHERE kind = ? AND wid = ?", (domain, path[1]))
+            else:
+                # Layout entries are tiny - always write the widget's whole current value
+                self.wdb.execute("INSERT OR REPLACE INTO layout VALUES (?, ?, ?)",
+                                 (domain, path[1], self._enc(current)))
+        elif op == "del" and len(path) == 1:
+            self.wdb.execute("DELETE FROM settings WHERE key = ?", (domain,))
+        else:
+            self._write_domain(domain, current)
+    
+    def _apply_period(self, domain, op, keys, value):
+        cols = SQL_PERIOD_DOMAINS[domain]
+        depth = len(cols)
+        if len(keys) < depth:
+            # A whole period (or domain) was replaced or removed
+            where = " AND ".join(f"{c} = ?" for c in cols[:len(keys)]) or "1"
+            self.wdb.execute(f"DELETE FROM {domain} WHERE {where}", keys)
+            if op == "set":
+                for row in self._flatten(value, depth - len(keys)):
+                    self._upsert(domain, tuple(keys) + row[:-1], row[-1])
+        elif len(keys) == depth:
+            if op == "del":
+                where = " AND ".join(f"{c} = ?" for c in cols)
+                self.wdb.execute(f"DELETE FROM {domain} WHERE {where}", keys)
+            else:
+                self._upsert(domain, keys, value)
+        else:
+            # Change inside one row's value: patch that row only
+            row = self._select(domain, keys[:depth])
+            if row is not None and apply_change(row, op, keys[depth:], value):
+                self._upsert(domain, keys[:depth], row)
+    
+    def _apply_list(self, table, op, keys, value):
+        count = self.wdb.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if not keys:
+            if op == "append":
+                self.wdb.execute(f"INSERT INTO {table} VALUES (?, ?)", (count, self._enc(value)))
+            else:
+                self._write_domain(table, value if op == "set" else [])
+            return
+        pos = keys[0] if keys[0] >= 0 else count + keys[0]
+        if len(keys) == 1 and op == "del":
+            self.wdb.execute(f"DELETE FROM {table} WHERE pos = ?", (pos,))
+            # Shift the tail down in two steps so the primary key never collides
+            self.wdb.execute(f"UPDATE {table} SET pos = -(pos - 1) WHERE pos > ?", (pos,))
+            self.wdb.execute(f"UPDATE {table} SET pos = -pos WHERE pos < 0")
+        elif len(keys) == 1:
+            self.wdb.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?)", (pos, self._enc(value)))
+        else:
+            row = self.wdb.execute(f"SELECT value FROM {table} WHERE pos = ?", (pos,)).fetchone()
+            if row:
+                item = json.loads(row[0])
+                if apply_change(item, op, keys[1:], value):
+                    self.wdb.execute(f"UPDATE {table} SET value = ? WHERE pos = ?", (self._enc(item), pos))
+    
+    def _select(self, domain, keys):
+        where = " AND ".join(f"{c} = ?" for c in SQL_PERIOD_DOMAINS[domain])
+        row = self.wdb.execute(f"SELECT value FROM {domain} WHERE {where}", keys).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _upsert(self, domain, keys, value):
+        marks = ", ".join("?" * (len(keys) + 1))
+        self.wdb.execute(f"INSERT OR REPLACE INTO {domain} VALUES ({marks})", (*keys, self._enc(value)))
+    
+    def close(self):
+        for db in (self.db, self.wdb):
+            if db:
+                db.close()
+        self.db = self.wdb = None
+    
+    @staticmethod
+    def _flatten(value, depth):
+        """Turn nested dicts into (key, ..., value) rows `depth` levels deep"""
+        if depth == 0:
+            return [(value,)]
+        rows = []
+        for k, v in (value or {}).items():
+            rows.extend((k,) + row for row in SqliteStore._flatten(v, depth - 1))
+        return rows
+    
+    @staticmethod
+    def _enc(value):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# Period domains are keyed by date, week start or month - the first 7 chars are the partition
+PERIOD_DOMAINS = tuple(SQL_PERIOD_DOMAINS)
+
+
+class PartitionedStore:
+    """core.json for layout, todos, notes and habits plus one JSON file per month of planner history.
+    Months are loaded on demand through fetch() and evicted least-recently-used"""
+    
+    def __init__(self, folder=DATA_DIR, json_path=DATA_FILE, journal_path=JOURNAL_FILE, capacity=PARTITION_CACHE):
+        self.folder = folder
+        self.core_path = os.path.join(folder, "core.json")
+        self.json_path = json_path
+        self.journal_path = journal_path
+        self.capacity = capacity
+        self.loaded = OrderedDict()    # partition id -> True, least recently used first
+        self.dirty = set()             # partitions changed since the last prepare()
+        self.core_dirty = False
+        self.unwritten = {}            # partition id -> prepared copy the writer has not finished yet
+        self._lock = threading.Lock()
+    
+    def _part_path(self, pid):
+        return os.path.join(self.folder, f"{pid}.json")
+    
+    @staticmethod
+    def _pid(path):
+        """Partition a change touches: a month id, "*" for a whole domain, or None for core"""
+        if path[0] not in PERIOD_DOMAINS:
+            return None
+        return path[1][:7] if len(path) > 1 else "*"
+    
+    def load(self):
+        if not os.path.exists(self.core_path):
+            self.migrate()
+        data = read_json(self.core_path)
+        for domain in PERIOD_DOMAINS:
+            data.setdefault(domain, {})
+        self.loaded.clear()
+        return data
+    
+    def migrate(self):
+        """One-shot split of the JSON file into partitions. The JSON file is left in place as a backup"""
+        source = JsonStore(self.json_path, self.journal_path).load()
+        os.makedirs(self.folder, exist_ok=True)
+        parts = {}
+        for domain in PERIOD_DOMAINS:
+            for key, value in (source.pop(domain, None) or {}).items():
+                parts.setdefault(key[:7], {}).setdefault(domain, {})[key] = value
+        for pid, part in parts.items():
+            atomic_write(self._part_path(pid), json.dumps(part, indent=2, ensure_ascii=False))
+        atomic_write(self.core_path, json.dumps(source, indent=2, ensure_ascii=False))
+        if parts:
+            print(f"Migrated {self.json_path} into {len(parts)} partitions in {self.folder}")
+    
+    def fetch(self, data, domain, key, pending=()):
+        if domain not in PERIOD_DOMAINS:
+            return
+        pid = key[:7]
+        if pid in self.loaded:
+            self.loaded.move_to_end(pid)
+            return
+        self._load(data, pid)
+        self._evict(data, pending, keep=pid)
+    
+    def hold(self, data, path):
+        # A dirty month is never evicted, and the next commit writes it with the in-memory value
+        pid = self._pid(path)
+        if pid is not None:
+            self.dirty.add(pid)
+    
+    def months(self, data, domain):
+        # Partition files hold every period domain, so this can list months without this one
+        names = os.listdir(self.folder) if os.path.isdir(self.folder) else []
+        stored = {n[:-5] for n in names if n.endswith(".json") and n != "core.json"}
+        return sorted(stored | {key[:7] for key in data.get(domain, {})})
+    
+    def scan(self, domains):
+        names = os.listdir(self.folder) if os.path.isdir(self.folder) else []
+        for pid in sorted(n[:-5] for n in names if n.endswith(".json") and n != "core.json"):
+            with self._lock:
+                part = self.unwritten.get(pid)
+            part = read_json(self._part_path(pid)) if part is None else copy_tree(part)
+            for domain in domains:
+                for key, value in part.get(domain, {}).items():
+                    yield (domain, key), value
+    
+    def _load(self, data, pid):
+        with self._lock:
+            part = self.unwritten.get(pid)
+        if part is None:
+            part = read_json(self._part_path(pid))
+        else:
+            # The writer thread may still be encoding it - take our own copy
+            part = copy_tree(part)
+        for domain, values in part.items():
+            merge_missing(data.setdefault(domain, {}), values)
+        self.loaded[pid] = True
+    
+    def _evict(self, data, pending, keep=None):
+        # keep is the month just fetched - even when every older month is busy
+        busy = self.dirty | {self._pid(path) for _, path, _ in pending} | {keep}
+        for pid in list(self.loaded):
+            if len(self.loaded) <= self.capacity:
+                break
+            if pid in busy or "*" in busy:
+                continue
+            del self.loaded[pid]
+            for domain in PERIOD_DOMAINS:
+                values = data.get(domain, {})
+                for k in [k for k in values if k[:7] == pid]:
+                    del values[k]
+    
+    def close(self):
+        pass
+    
+    def prepare(self, data, changes):
+        if changes is None:
+            self.core_dirty = True
+            self.dirty.update(self.loaded)
+        for _, path, _ in changes or ():
+            pid = self._pid(path)
+            if pid is None:
+                self.core_dirty = True
+            elif pid == "*":
+                self.dirty.update(self.loaded)
+            else:
+                self.dirty.add(pid)
+        
+        parts = {}
+        for pid in self.dirty:
+            # Never write a month we have only partly in memory
+            if pid not in self.loaded:
+                self._load(data, pid)
+            part = {}
+            for domain in PERIOD_DOMAINS:
+                values = {k: copy_tree(v) for k, v in data.get(domain, {}).items() if k[:7] == pid}
+                if values:
+                    part[domain] = values
+            parts[pid] = part
+        with self._lock:
+            self.unwritten.update(parts)
+        
+        core = None
+        if self.core_dirty:
+            core = {k: copy_tree(v) for k, v in data.items() if k not in PERIOD_DOMAINS}
+        self.dirty.clear()
+        self.core_dirty = False
+        return (core, parts)
+    
+    def write(self, payload):
+        core, parts = payload
+        os.makedirs(self.folder, exist_ok=True)
+        for pid, part in parts.items():
+            path = self._part_path(pid)
+            if part:
+                atomic_write(path, json.dumps(part, indent=2, ensure_ascii=False))
+            elif os.path.exists(path):
+                os.remove(path)
+            with self._lock:
+                if self.unwritten.get(pid) is part:
+                    del self.unwritten[pid]
+        if core is not None:
+            atomic_write(self.core_path, json.dumps(core, indent=2, ensure_ascii=False))
+    
+    def failed(self, payload):
+        core, parts = payload
+        self.core_dirty = self.core_dirty or core is not None
+        self.dirty.update(parts)
+    
+    def commit(self, data, changes):
+        self.write(self.prepare(data, changes))
+
+
+def open_store(mode=STORAGE_MODE):
+    """Create the storage backend for the configured mode"""
+    if mode == "journal":
+        return JournalStore()
+    if mode == "sqlite":
+        return SqliteStore()
+    if mode == "partitioned":
+        return PartitionedStore()
+    return JsonStore()
 
 
 # ============== AUTOSTART ==============
@@ -200,7 +1384,9 @@ def disable_autostart():
 
 # ============== SCROLLABLE FRAME ==============
 class ScrollFrame(tk.Frame):
-    """Frame with scrollbars - content has FIXED minimum sizes"""
+    """Frame with scrollbars - content has FIXED minimum sizes.
+    After set_rows() it is a virtual list: only the visible rows (plus overscan) exist as
+    widgets and are recycled while scrolling; inner then holds a fixed header above them"""
     
     def __init__(self, parent, bg="#FFF"):
         super().__init__(parent, bg=bg)
@@ -209,7 +1395,7 @@ class ScrollFrame(tk.Frame):
         self.vbar = tk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
         self.hbar = tk.Scrollbar(self, orient="horizontal", command=self.canvas.xview)
         
-        self.canvas.configure(yscrollcommand=self.vbar.set, xscrollcommand=self.hbar.set)
+        self.canvas.configure(yscrollcommand=self._on_yscroll, xscrollcommand=self.hbar.set)
         
         self.vbar.pack(side="right", fill="y")
         self.hbar.pack(side="bottom", fill="x")
@@ -218,23 +1404,771 @@ class ScrollFrame(tk.Frame):
         self.inner = tk.Frame(self.canvas, bg=bg)
         self.win = self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
         
-        self.inner.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        
-        # Mouse wheel scroll
-        self.canvas.bind("<MouseWheel>", self._scroll_y)
-        self.inner.bind("<MouseWheel>", self._scroll_y)
-        self.canvas.bind("<Shift-MouseWheel>", self._scroll_x)
+        # Virtual rows: item index -> row dict ({"frame": ..., "item": canvas window, ...})
+        self.count = 0
+        self.row_h = 0
+        self.row_w = 0
+        self.cols = 1
+        self.make_row = None
+        self.fill_row = None
+        self.rows = {}
+        self.spare = []
+        self._region = None
+        self._region_job = None
+        self._refresh_job = None
+        
+        self.inner.bind("<Configure>", self._queue_region)
+        self.canvas.bind("<Configure>", self._queue_region)
+        
+        # Mouse wheel scroll - rows carry wheel_tag so the wheel works over them too
+        self.wheel_tag = f"ScrollWheel{id(self)}"
+        self.canvas.bind_class(self.wheel_tag, "<MouseWheel>", self._scroll_y)
+        self.canvas.bind_class(self.wheel_tag, "<Shift-MouseWheel>", self._scroll_x)
+        self.forward_wheel(self.canvas)
+        self.forward_wheel(self.inner)
     
     def _scroll_y(self, e):
         self.canvas.yview_scroll(int(-1 * (e.delta / 120)), "units")
+        return "break"
+    
+    def _scroll_x(self, e):
+        self.canvas.xview_scroll(int(-1 * (e.delta / 120)), "units")
+        return "break"
+    
+    def forward_wheel(self, widget):
+        """Scroll this frame when the wheel turns over widget or its children"""
+        tags = widget.bindtags()
+        if self.wheel_tag not in tags:
+            widget.bindtags(tags[:1] + (self.wheel_tag,) + tags[1:])
+        for child in widget.winfo_children():
+            self.forward_wheel(child)
+    
+    def _on_yscroll(self, first, last):
+        self.vbar.set(first, last)
+        if self.make_row and not self._refresh_job:
+            self._refresh_job = self.after_idle(self._refresh)
+    
+    def _queue_region(self, e=None):
+        # <Configure> fires for every child packed into inner - update the region once they settle
+        if not self._region_job:
+            self._region_job = self.after(SCROLL_REGION_MS, self._update_region)
+    
+    def _update_region(self):
+        self._region_job = None
+        if self.make_row:
+            self._refresh()
+        else:
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    
+    def set_rows(self, count, row_h, make_row, fill_row, cols=1, row_w=0):
+        """Show count items as recycled rows of row_h pixels (cols per line, at least row_w wide).
+        make_row(parent) builds an empty row dict with a "frame", fill_row(row, i) shows item i"""
+        self.count = count
+        self.row_h = row_h
+        self.row_w = row_w
+        self.cols = cols
+        self.make_row = make_row
+        self.fill_row = fill_row
+        self.forward_wheel(self.inner)
+        self.set_count(count)
+    
+    def set_count(self, count, first=0):
+        """New item count after the items from index first on changed - only their rows are refilled"""
+        self.count = count
+        for i in [i for i in self.rows if i >= count]:
+            self._release(i)
+        for i, row in self.rows.items():
+            if i >= first:
+                self.fill_row(row, i)
+        self._refresh()
+    
+    def see(self, i):
+        """Scroll the virtual list so item i is at the top and its row exists"""
+        self._refresh()
+        top = self.inner.winfo_reqheight() if self.inner.winfo_children() else 0
+        if self._region and self._region[3]:
+            self.canvas.yview_moveto((top + (i // self.cols) * self.row_h) / self._region[3])
+            self._refresh()
+    
+    def _release(self, i):
+        # Parked outside the scroll region - the canvas unmaps windows it can't show
+        row = self.rows.pop(i)
+        self.canvas.coords(row["item"], -10000, -10000)
+        self.spare.append(row)
+    
+    def _refresh(self):
+        self._refresh_job = None
+        if not self.make_row:
+            return
+        
+        top = self.inner.winfo_reqheight() if self.inner.winfo_children() else 0
+        col_w = max(self.row_w, self.canvas.winfo_width() // self.cols)
+        width = max(col_w * self.cols, self.inner.winfo_reqwidth())
+        lines = -(-self.count // self.cols)
+        region = (0, 0, width, top + lines * self.row_h)
+        if region != self._region:
+            # Reconfiguring calls yscrollcommand again, so only touch it on a real change
+            self._region = region
+            self.canvas.configure(scrollregion=region)
+        
+        # Visible lines plus overscan on both sides
+        y = self.canvas.canvasy(0) - top
+        first = max(0, int(y // self.row_h) - VIRTUAL_OVERSCAN)
+        last = min(lines, int((y + self.canvas.winfo_height()) // self.row_h) + 1 + VIRTUAL_OVERSCAN)
+        wanted = range(first * self.cols, min(self.count, last * self.cols))
+        
+        for i in [i for i in self.rows if i not in wanted]:
+            self._release(i)
+        
+        for i in wanted:
+            row = self.rows.get(i)
+            if row is None:
+                if self.spare:
+                    row = self.spare.pop()
+                else:
+                    row = self.make_row(self.canvas)
+                    row["item"] = self.canvas.create_window(0, 0, window=row["frame"], anchor="nw")
+                    self.forward_wheel(row["frame"])
+                self.rows[i] = row
+                self.fill_row(row, i)
+            self.canvas.coords(row["item"], (i % self.cols) * col_w, top + (i // self.cols) * self.row_h)
+            self.canvas.itemconfigure(row["item"], width=col_w, height=self.row_h)
+    
+    def configure(self, cnf=None, **kw):
+        # bg colors the canvas and inner frame too, so theme switches treat this as one frame
+        if "bg" in kw:
+            self.canvas.configure(bg=kw["bg"])
+            self.inner.configure(bg=kw["bg"])
+        return super().configure(cnf, **kw)
+    
+    config = configure
+
+
+# ============== PAGE CACHE ==============
+def add_months(year, month, n):
+    """(year, month) shifted by n months"""
+    y, m = divmod(year * 12 + month - 1 + n, 12)
+    return y, m + 1
+
+
+class PageCache:
+    """View models for the shown page and its neighbours.
+    Neighbours are built on idle so ◀/▶ just swaps in a ready page. Each page lists the
+    (domain, key) data it was built from in "deps" and is dropped when that data changes"""
+    
+    def __init__(self, widget, build, neighbours, size=PAGE_CACHE_SIZE):
+        self.widget = widget
+        self.build = build
+        self.neighbours = neighbours
+        self.size = size
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._job = None
+        widget.app.subscribe(self.invalidate)
+    
+    def get(self, key):
+        page = self.pages.get(key)
+        if page is None:
+            self.misses += 1
+            page = self.pages[key] = self.build(key)
+        else:
+            self.hits += 1
+            # The store may have evicted the data since - edits must find it loaded again
+            for domain, k in page["deps"]:
+                if k is not None:
+                    self.widget.app.fetch(domain, k)
+        self.pages.move_to_end(key)
+        self._trim()
+        
+        if self._job:
+            self.widget.win.after_cancel(self._job)
+        self._job = self.widget.win.after_idle(self._prefetch, key)
+        return page
+    
+    def _prefetch(self, key):
+        self._job = None
+        for k in self.neighbours(key):
+            if k not in self.pages:
+                self.pages[k] = self.build(k)
+        if key in self.pages:
+            self.pages.move_to_end(key)
+        self._trim()
+    
+    def _trim(self):
+        while len(self.pages) > self.size:
+            self.pages.popitem(last=False)
+    
+    def invalidate(self, op, path):
+        domain, key = path[0], (path[1] if len(path) > 1 else None)
+        for k in [k for k, page in self.pages.items() if self._depends(page["deps"], domain, key)]:
+            del self.pages[k]
+    
+    @staticmethod
+    def _depends(deps, domain, key):
+        # Keys are dates, week starts or months, so a prefix match covers day-in-month changes
+        for d, k in deps:
+            if d == domain and (key is None or k is None or key.startswith(k) or k.startswith(key)):
+                return True
+        return False
+    
+    def clear(self):
+        self.pages.clear()
+
+
+# ============== RECURRING EVENTS ==============
+def expand_rule(rule, year, month):
+    """Days of one month matched by a recurrence rule, before until, count and exceptions.
+    The month is worked out directly - nothing outside it is generated.
+    rule: {"text", "start": "YYYY-MM-DD", "freq", "interval", "weekdays": [0-6] (weekly),
+    "day" or "nth": [n, weekday] with n = 1-4 or -1 for the last (monthly), "until", "count", "except"}"""
+    start = datetime.strptime(rule["start"], "%Y-%m-%d").date()
+    first = datetime(year, month, 1).date()
+    ndays = calendar.monthrange(year, month)[1]
+    months = (year - start.year) * 12 + month - start.month
+    every = max(1, int(rule.get("interval", 1)))
+    freq = rule.get("freq")
+    if months < 0:
+        return []
+    
+    if freq == "daily":
+        offset = (first - start).days - 1
+        days = [d for d in range(1, ndays + 1) if (offset + d) % every == 0]
+    elif freq == "weekly":
+        # Days since the Monday of the start week: weekday is this mod 7, week number this // 7
+        weekdays = set(rule.get("weekdays") or [start.weekday()])
+        offset = (first - start).days + start.weekday() - 1
+        days = [d for d in range(1, ndays + 1) if (offset + d) % 7 in weekdays and (offset + d) // 7 % every == 0]
+    elif freq == "monthly" and months % every == 0:
+        if rule.get("nth"):
+            n, weekday = rule["nth"]
+            matches = range((weekday - first.weekday()) % 7 + 1, ndays + 1, 7)
+            i = n - 1 if n > 0 else n
+            days = [matches[i]] if -len(matches) <= i < len(matches) else []
+        else:
+            day = rule.get("day", start.day)
+            days = [day] if day <= ndays else []
+    elif freq == "yearly" and months % (12 * every) == 0:
+        days = [start.day] if start.day <= ndays else []
+    else:
+        days = []
+    return [d for d in days if months or d >= start.day]
+
+
+class RecurrenceEngine:
+    """Occurrences of the rules in data["recurring"] (rule id -> rule, see expand_rule()).
+    Months are expanded only when a view asks for them and memoized per (rule, month);
+    a change to a rule drops just that rule's months"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.cache = {}    # rule id -> {"YYYY-MM": [day, ...]}
+        self.ends = {}     # rule id -> last date key allowed by until/count, or None
+        self.hits = 0
+        self.misses = 0
+        app.subscribe(self._on_change)
+    
+    def _on_change(self, op, path):
+        if path[0] != "recurring":
+            return
+        if len(path) > 1:
+            self.cache.pop(path[1], None)
+            self.ends.pop(path[1], None)
+        else:
+            self.cache.clear()
+            self.ends.clear()
+    
+    @property
+    def rules(self):
+        return self.app.data.get("recurring", {})
+    
+    def new_id(self):
+        return str(max((int(rid) for rid in self.rules), default=0) + 1)
+    
+    def days(self, rid, year, month):
+        """Days of one month on which rule rid occurs"""
+        months = self.cache.setdefault(rid, {})
+        key = f"{year}-{month:02d}"
+        days = months.get(key)
+        if days is None:
+            self.misses += 1
+            rule = self.rules[rid]
+            last = self._last(rid, rule)
+            skip = set(rule.get("except", ()))
+            days = months[key] = [d for d in expand_rule(rule, year, month)
+                                  if (last is None or f"{key}-{d:02d}" <= last) and f"{key}-{d:02d}" not in skip]
+        else:
+            self.hits += 1
+        return days
+    
+    def _last(self, rid, rule):
+        # A count is turned into an end date once, following the rule month by month from its start
+        if rid not in self.ends:
+            last = rule.get("until")
+            count = rule.get("count")
+            if count:
+                year, month = int(rule["start"][:4]), int(rule["start"][5:7])
+                for _ in range(RECUR_SCAN_MONTHS):
+                    key = f"{year}-{month:02d}"
+                    if last and key > last:
+                        break
+                    days = expand_rule(rule, year, month)
+                    if count <= len(days):
+                        end = f"{key}-{days[count - 1]:02d}"
+                        last = min(last, end) if last else end
+                        break
+                    count -= len(days)
+                    year, month = add_months(year, month, 1)
+            self.ends[rid] = last
+        return self.ends[rid]
+    
+    def month(self, year, month):
+        """{day: [(rule id, text)]} for one month"""
+        found = {}
+        for rid, rule in self.rules.items():
+            for d in self.days(rid, year, month):
+                found.setdefault(d, []).append((rid, rule.get("text", "")))
+        return found
+    
+    def on_day(self, day):
+        """[(rule id, text)] occurring on a date"""
+        return self.month(day.year, day.month).get(day.day, [])
+
+
+class RecurrenceDialog:
+    """Form to create or edit one recurring event rule"""
+    
+    def __init__(self, widget, start, rid=None, text=""):
+        self.app = widget.app
+        self.rid = rid
+        rule = self.app.recurrences.rules.get(rid) or {"text": text, "start": start, "freq": "weekly"}
+        theme = widget.theme
+        self.theme = theme
+        
+        self.win = tk.Toplevel(widget.win)
+        self.win.title("🔁 Repeat")
+        self.win.resizable(False, False)
+        self.win.attributes('-topmost', True)
+        self.win.configure(bg=theme["bg"], padx=8, pady=8)
+        
+        self.text = self._entry("Title", rule.get("text", ""), 0)
+        self.start = self._entry("Starts", rule["start"], 1)
+        
+        self.freq = tk.StringVar(value=rule.get("freq", "weekly"))
+        self._label("Repeats", 2)
+        freq = tk.OptionMenu(self.win, self.freq, *RECUR_FREQS)
+        freq.config(bg=theme["button"], fg=theme["text"], font=FONTS["small"], bd=0, highlightthickness=0)
+        freq.grid(row=2, column=1, sticky="w", pady=2)
+        
+        self._label("Every", 3)
+        self.interval = tk.Spinbox(self.win, from_=1, to=99, width=4, font=FONTS["small"])
+        self.interval.delete(0, "end")
+        self.interval.insert(0, rule.get("interval", 1))
+        self.interval.grid(row=3, column=1, sticky="w", pady=2)
+        
+        # Weekly: which days
+        self._label("Weekly on", 4)
+        days = tk.Frame(self.win, bg=theme["bg"])
+        days.grid(row=4, column=1, sticky="w")
+        chosen = rule.get("weekdays") or [datetime.strptime(start, "%Y-%m-%d").weekday()]
+        self.weekdays = []
+        for i, name in enumerate(["M", "T", "W", "T", "F", "S", "S"]):
+            var = tk.BooleanVar(value=i in chosen)
+            self.weekdays.append(var)
+            tk.Checkbutton(days, text=name, variable=var, bg=theme["bg"], fg=theme["text"],
+                          selectcolor=theme["entry"], font=FONTS["tiny"]).pack(side="left")
+        
+        # Monthly: same day number, or same weekday of the month (2nd Tuesday, last Friday)
+        self._label("Monthly by", 5)
+        self.by = tk.StringVar(value="nth" if rule.get("nth") else "day")
+        by = tk.Frame(self.win, bg=theme["bg"])
+        by.grid(row=5, column=1, sticky="w")
+        for label, value in (("day", "day"), ("weekday", "nth")):
+            tk.Radiobutton(by, text=label, variable=self.by, value=value, bg=theme["bg"], fg=theme["text"],
+                          selectcolor=theme["entry"], font=FONTS["tiny"]).pack(side="left")
+        
+        # End
+        self._label("Ends", 6)
+        self.end = tk.StringVar(value="until" if rule.get("until") else "count" if rule.get("count") else "never")
+        end = tk.Frame(self.win, bg=theme["bg"])
+        end.grid(row=6, column=1, sticky="w")
+        for label, value in (("never", "never"), ("on", "until"), ("after", "count")):
+            tk.Radiobutton(end, text=label, variable=self.end, value=value, bg=theme["bg"], fg=theme["text"],
+                          selectcolor=theme["entry"], font=FONTS["tiny"]).pack(side="left")
+        self.until = self._entry("End date", rule.get("until", ""), 7)
+        self._label("Times", 8)
+        self.count = tk.Spinbox(self.win, from_=1, to=999, width=4, font=FONTS["small"])
+        self.count.delete(0, "end")
+        self.count.insert(0, rule.get("count", 10))
+        self.count.grid(row=8, column=1, sticky="w", pady=2)
+        
+        self.error = tk.Label(self.win, text="", bg=theme["bg"], fg="#E74C3C", font=FONTS["tiny"])
+        self.error.grid(row=9, column=0, columnspan=2, sticky="w")
+        
+        btns = tk.Frame(self.win, bg=theme["bg"])
+        btns.grid(row=10, column=0, columnspan=2, sticky="e", pady=(6, 0))
+        tk.Button(btns, text="Save", command=self.save, bg=theme["accent"], fg="white",
+                 font=FONTS["small"], bd=0, padx=10, cursor="hand2").pack(side="right", padx=2)
+        tk.Button(btns, text="Cancel", command=self.win.destroy, bg=theme["button"], fg=theme["text"],
+                 font=FONTS["small"], bd=0, padx=10, cursor="hand2").pack(side="right", padx=2)
+        self.text.focus_set()
+    
+    def _label(self, text, row):
+        tk.Label(self.win, text=text, bg=self.theme["bg"], fg=self.theme["text"],
+                font=FONTS["small"]).grid(row=row, column=0, sticky="w", padx=(0, 6))
+    
+    def _entry(self, label, value, row):
+        self._label(label, row)
+        entry = tk.Entry(self.win, bg=self.theme["entry"], fg=self.theme["text"], font=FONTS["small"],
+                        bd=1, relief="solid", width=22)
+        entry.insert(0, value)
+        entry.grid(row=row, column=1, sticky="w", pady=2)
+        return entry
+    
+    def save(self):
+        text = self.text.get().strip()
+        try:
+            start = datetime.strptime(self.start.get().strip(), "%Y-%m-%d").date()
+            until = datetime.strptime(self.until.get().strip(), "%Y-%m-%d").date() if self.end.get() == "until" else None
+            interval, count = int(self.interval.get()), int(self.count.get())
+        except ValueError:
+            self.error.config(text="Dates are YYYY-MM-DD, Every and Times are numbers")
+            return
+        if not text:
+            self.error.config(text="Enter a title")
+            return
+        
+        rule = {"text": text, "start": start.isoformat(), "freq": self.freq.get(), "interval": max(1, interval)}
+        if rule["freq"] == "weekly":
+            rule["weekdays"] = [i for i, var in enumerate(self.weekdays) if var.get()] or [start.weekday()]
+        elif rule["freq"] == "monthly":
+            if self.by.get() == "nth":
+                n = (start.day - 1) // 7 + 1
+                rule["nth"] = [n if n < 5 else -1, start.weekday()]
+            else:
+                rule["day"] = start.day
+        if until:
+            rule["until"] = until.isoformat()
+        elif self.end.get() == "count":
+            rule["count"] = max(1, count)
+        old = self.app.recurrences.rules.get(self.rid, {})
+        if old.get("except"):
+            rule["except"] = old["except"]
+        
+        self.app.put(["recurring", self.rid or self.app.recurrences.new_id()], rule)
+        self.win.destroy()
+
+
+# ============== TIMED EVENTS ==============
+def minute_key(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M")
+
+
+def timed_label(event, day):
+    """How a timed event reads on one day: its start time, → its end time, or ↔ all day"""
+    key = day.isoformat()
+    if event["start"][:10] == key:
+        return f"🕒 {event['start'][11:]} {event['title']}"
+    if event["end"][:10] == key:
+        return f"→ {event['end'][11:]} {event['title']}"
+    return f"↔ {event['title']}"
+
+
+class IntervalIndex:
+    """(start, end, id) intervals sorted by start, plus an implicit segment tree holding the
+    latest end below each node. overlapping() only descends into subtrees that start before the
+    range ends and reach into it, O(log n + hits). Ends are exclusive; any ordered keys work"""
+    
+    def __init__(self, items=()):
+        self.items = sorted(items)
+        self.tree = None
+        self.size = 0
+    
+    def add(self, start, end, key):
+        insort(self.items, (start, end, key))
+        self.tree = None
+    
+    def remove(self, start, end, key):
+        i = bisect_left(self.items, (start, end, key))
+        if i < len(self.items) and self.items[i] == (start, end, key):
+            del self.items[i]
+            self.tree = None
+    
+    def _build(self):
+        # Rebuilt on the first query after a change - edits come one at a time from the user
+        size = 1
+        while size < len(self.items):
+            size *= 2
+        tree = [None] * (2 * size)
+        for i, item in enumerate(self.items):
+            tree[size + i] = item[1]
+        for i in range(size - 1, 0, -1):
+            a, b = tree[2 * i], tree[2 * i + 1]
+            tree[i] = a if b is None or (a is not None and a > b) else b
+        self.size, self.tree = size, tree
+    
+    def overlapping(self, start, end):
+        """Intervals with item start < end and item end > start, by start"""
+        if self.tree is None:
+            self._build()
+        hi = bisect_left(self.items, (end,))
+        found = []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, top = stack.pop()
+            latest = self.tree[node]
+            if lo >= hi or latest is None or latest <= start:
+                continue
+            if node >= self.size:
+                found.append(self.items[lo])
+                continue
+            mid = (lo + top) // 2
+            stack.append((2 * node + 1, mid, top))
+            stack.append((2 * node, lo, mid))
+        return found
+
+
+class TimedEvents:
+    """Events with a start and end ("YYYY-MM-DDTHH:MM", end exclusive) in data["timed"],
+    id -> {"title", "start", "end"}. They may span hours or days; views ask the
+    IntervalIndex for the range they show instead of scanning every event"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.spans = {}    # id -> (start, end) as indexed
+        self.index = IntervalIndex()
+        self._reindex()
+        app.subscribe(self._on_change)
+    
+    @property
+    def events(self):
+        return self.app.data.get("timed", {})
+    
+    def new_id(self):
+        return str(max((int(eid) for eid in self.events), default=0) + 1)
+    
+    def _reindex(self):
+        self.spans = {eid: (e["start"], e["end"]) for eid, e in self.events.items()}
+        self.index = IntervalIndex((start, end, eid) for eid, (start, end) in self.spans.items())
+    
+    def _on_change(self, op, path):
+        if path[0] != "timed":
+            return
+        if len(path) == 1:
+            self._reindex()
+            return
+        eid = path[1]
+        if eid in self.spans:
+            self.index.remove(*self.spans.pop(eid), eid)
+        event = self.events.get(eid)
+        if event:
+            self.spans[eid] = (event["start"], event["end"])
+            self.index.add(event["start"], event["end"], eid)
+    
+    def overlapping(self, start, end):
+        """[(id, event)] overlapping [start, end), by start"""
+        return [(eid, self.events[eid]) for _, _, eid in self.index.overlapping(start, end)]
+    
+    def by_day(self, first, count):
+        """{date: [(id, event)]} for each of count days from date first"""
+        found = {}
+        last = first + timedelta(days=count - 1)
+        for eid, event in self.overlapping(f"{first.isoformat()}T00:00", f"{(last + timedelta(days=1)).isoformat()}T00:00"):
+            day = max(first, datetime.strptime(event["start"][:10], "%Y-%m-%d").date())
+            end = datetime.strptime(event["end"][:10], "%Y-%m-%d").date()
+            if event["end"][11:] == "00:00":
+                end -= timedelta(days=1)
+            while day <= min(end, last):
+                found.setdefault(day, []).append((eid, event))
+                day += timedelta(days=1)
+        return found
+
+
+class TimedEventDialog:
+    """Form to create or edit one timed event"""
+    
+    def __init__(self, widget, start, eid=None):
+        self.app = widget.app
+        self.eid = eid
+        theme = widget.theme
+        begin = datetime.strptime(start, "%Y-%m-%dT%H:%M")
+        event = self.app.timed.events.get(eid) or {"title": "", "start": start, "end": minute_key(begin + timedelta(hours=1))}
+        
+        self.win = tk.Toplevel(widget.win)
+        self.win.title("🕒 Event")
+        self.win.resizable(False, False)
+        self.win.attributes('-topmost', True)
+        self.win.configure(bg=theme["bg"], padx=8, pady=8)
+        
+        self.fields = {}
+        for row, (name, label, value) in enumerate((("title", "Title", event["title"]),
+                                                    ("start", "Starts", event["start"].replace("T", " ")),
+                                                    ("end", "Ends", event["end"].replace("T", " ")))):
+            tk.Label(self.win, text=label, bg=theme["bg"], fg=theme["text"],
+                    font=FONTS["small"]).grid(row=row, column=0, sticky="w", padx=(0, 6))
+            entry = tk.Entry(self.win, bg=theme["entry"], fg=theme["text"], font=FONTS["small"],
+                            bd=1, relief="solid", width=22)
+            entry.insert(0, value)
+            entry.grid(row=row, column=1, sticky="w", pady=2)
+            self.fields[name] = entry
+        
+        self.error = tk.Label(self.win, text="", bg=theme["bg"], fg="#E74C3C", font=FONTS["tiny"])
+        self.error.grid(row=3, column=0, columnspan=2, sticky="w")
+        
+        btns = tk.Frame(self.win, bg=theme["bg"])
+        btns.grid(row=4, column=0, columnspan=2, sticky="e", pady=(6, 0))
+        tk.Button(btns, text="Save", command=self.save, bg=theme["accent"], fg="white",
+                 font=FONTS["small"], bd=0, padx=10, cursor="hand2").pack(side="right", padx=2)
+        tk.Button(btns, text="Cancel", command=self.win.destroy, bg=theme["button"], fg=theme["text"],
+                 font=FONTS["small"], bd=0, padx=10, cursor="hand2").pack(side="right", padx=2)
+        self.fields["title"].focus_set()
+    
+    def save(self):
+        title = self.fields["title"].get().strip()
+        try:
+            start, end = (datetime.strptime(self.fields[k].get().strip(), "%Y-%m-%d %H:%M") for k in ("start", "end"))
+        except ValueError:
+            self.error.config(text="Times are YYYY-MM-DD HH:MM")
+            return
+        if not title:
+            self.error.config(text="Enter a title")
+            return
+        if end <= start:
+            self.error.config(text="The end must be after the start")
+            return
+        self.app.put(["timed", self.eid or self.app.timed.new_id()],
+                     {"title": title, "start": minute_key(start), "end": minute_key(end)})
+        self.win.destroy()
+
+
+# ============== TICK SCHEDULER ==============
+TICK_UNITS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class TickScheduler:
+    """One after() chain for every periodic redraw. It wakes on the local wall-clock boundary
+    of the finest unit subscribed, so everything due at that boundary runs in one callback"""
+    
+    def __init__(self, root, clock=time.time):
+        self.root = root
+        self.clock = clock
+        self.subs = {}     # callback -> [unit seconds, last period run, widget or None]
+        self.texts = {}    # widget -> text last set through set_text()
+        self.wakeups = 0
+        self._job = None
+    
+    def subscribe(self, callback, unit="second", widget=None):
+        """Run callback(now) at every unit boundary - only while widget isn't suspended, if one is given"""
+        self.subs[callback] = [TICK_UNITS[unit], self._period(self.clock(), TICK_UNITS[unit]), widget]
+        self._schedule()
+        return callback
+    
+    def unsubscribe(self, callback):
+        if self.subs.pop(callback, None):
+            self._schedule()
+    
+    def refresh(self, widget):
+        """Run a widget's callbacks now, e.g. when it is shown again"""
+        # One reading for both, so the period and the time passed can't straddle a boundary
+        ts = self.clock()
+        now = datetime.fromtimestamp(ts)
+        for callback, sub in list(self.subs.items()):
+            if sub[2] is widget:
+                sub[1] = self._period(ts, sub[0])
+                callback(now)
+        self._schedule()
+    
+    def set_text(self, widget, text):
+        """config(text=...) only when the text changed - an unchanged label costs no redraw"""
+        if self.texts.get(widget) != text:
+            self.texts[widget] = text
+            widget.config(text=text)
+    
+    @staticmethod
+    def _period(ts, unit):
+        # Local time, so hour boundaries fall on the hour in half-hour time zones too
+        return int((ts + time.localtime(ts).tm_gmtoff) // unit)
+    
+    def _schedule(self):
+        if self._job:
+            self.root.after_cancel(self._job)
+            self._job = None
+        # Suspended widgets don't count - a withdrawn clock no longer wakes us every second
+        units = [unit for unit, _, widget in self.subs.values() if widget is None or not widget.suspended]
+        if not units:
+            return
+        unit = min(units)
+        ts = self.clock()
+        wait = unit - (ts + time.localtime(ts).tm_gmtoff) % unit
+        # A few ms late so the boundary has surely passed when we run
+        self._job = self.root.after(int(wait * 1000) + 5, self._fire)
+    
+    def _fire(self):
+        self._job = None
+        self.wakeups += 1
+        ts = self.clock()
+        now = datetime.fromtimestamp(ts)
+        for callback, sub in list(self.subs.items()):
+            unit, last, widget = sub
+            period = self._period(ts, unit)
+            if period == last or (widget is not None and widget.suspended) or callback not in self.subs:
+                continue
+            sub[1] = period
+            callback(now)
+        self._schedule()
+
+
+# ============== RESPONSIVE LAYOUT ==============
+SIZE_RANK = {name: i for i, (name, _) in enumerate(BREAKPOINTS)}
+
+
+def size_class(scale, current=None):
+    """Size class for a window scale. Leaving the current class takes passing a breakpoint
+    by RESIZE_HYSTERESIS, so a window resized right at a breakpoint doesn't flip back and forth"""
+    idx = SIZE_RANK.get(current, 0)
+    band = RESIZE_HYSTERESIS if current in SIZE_RANK else 0
+    while idx + 1 < len(BREAKPOINTS) and scale >= BREAKPOINTS[idx + 1][1] + band:
+        idx += 1
+    while idx > 0 and scale < BREAKPOINTS[idx][1] - band:
+        idx -= 1
+    return BREAKPOINTS[idx][0]
+
+
+def by_size(size, **values):
+    """Value for a size class, falling back to the nearest smaller class that has one"""
+    found = None
+    for name, _ in BREAKPOINTS:
+        if name in values:
+            found = values[name]
+        if name == size:
+            break
+    return found
+
+
+class ResponsiveLayout:
+    """Per size class rules for widgets that already exist.
+    apply() packs, forgets and configures them in place - a size change never rebuilds a UI"""
+    
+    def __init__(self):
+        self.rules = []
+    
+    def show(self, widget, smallest, **pack):
+        """Pack widget (with these pack options) from size class smallest up, forget it below"""
+        self.rules.append((widget, SIZE_RANK[smallest], pack))
     
-    def _scroll_x(self, e):
-        self.canvas.xview_scroll(int(-1 * (e.delta / 120)), "units")
+    def config(self, widget, **options):
+        """Configure widget per size class - each option is a {size class: value} dict"""
+        self.rules.append((widget, None, options))
     
-    def set_bg(self, bg):
-        self.config(bg=bg)
-        self.canvas.config(bg=bg)
-        self.inner.config(bg=bg)
+    def apply(self, size):
+        for widget, smallest, opts in self.rules:
+            if smallest is None:
+                widget.config(**{k: by_size(size, **v) for k, v in opts.items()})
+            elif SIZE_RANK[size] >= smallest:
+                if not widget.winfo_manager():
+                    widget.pack(**opts)
+            elif widget.winfo_manager():
+                widget.pack_forget()
 
 
 # ============== BASE WIDGET ==============
@@ -245,14 +2179,16 @@ class BaseWidget:
         self.app = app
         self.wid = wid
         self.title_text = title
+        self.stale = {}    # renders deferred while suspended, run once on resume
         
         # Sizes
         self.min_w, self.min_h = MIN_SIZES.get(wid, (180, 150))
-        default = COMPACT_SIZES.get(wid, (250, 300))
+        self.compact = default = COMPACT_SIZES.get(wid, (250, 300))
         
         # Theme
         theme_name = app.data.get("widget_themes", {}).get(wid, app.data.get("theme", "🌊 Blue"))
         self.theme = THEMES.get(theme_name, THEMES["🌊 Blue"])
+        self.styles = ThemeStyles(self.theme)
         
         # Create window
         self.win = tk.Toplevel(master)
@@ -268,56 +2204,52 @@ class BaseWidget:
         # State
         self.drag = {}
         self.resize = {}
-        self.expanded = size['w'] > default[0] * 1.3 or size['h'] > default[1] * 1.3
+        self.win_size = (size['w'], size['h'])
+        self.size = size_class(self._scale(*self.win_size))
+        self.layout = ResponsiveLayout()    # filled by build(), applied on every size class change
+        self._layout_job = None
+        self._motion_job = None
+        self.editors = {}      # Text/Entry -> commit(), see bind_editor()
+        self.edits = set()     # editors changed since their last commit
+        self._edit_job = None
+        self._filling = False
         
         # Build UI
-        self.border = tk.Frame(self.win, bg=self.theme["border"], padx=1, pady=1)
+        self.border = self.ui(tk.Frame, self.win, bg="border", padx=1, pady=1)
         self.border.pack(fill="both", expand=True)
         
-        self.main = tk.Frame(self.border, bg=self.theme["bg"])
+        self.main = self.ui(tk.Frame, self.border, bg="bg")
         self.main.pack(fill="both", expand=True)
         
         self._header(title)
         
-        self.content = tk.Frame(self.main, bg=self.theme["bg"])
+        self.content = self.ui(tk.Frame, self.main, bg="bg")
         self.content.pack(fill="both", expand=True, padx=6, pady=(0, 6))
         
         self._grip()
         
-        # Embed to desktop after creation
-        self.win.after(300, self._embed)
+        # Embed to desktop with the next batch
+        app.desktop.request(self)
         
         # Track size changes
         self.win.bind("<Configure>", self._on_resize)
     
-    def _embed(self):
-        """Embed into desktop wallpaper layer"""
-        try:
-            self.win.update_idletasks()
-            hwnd = GetParent(self.win.winfo_id())
-            if DesktopWallpaperLayer.embed(hwnd):
-                print(f"✓ {self.wid} embedded")
-            else:
-                print(f"✗ {self.wid} not embedded - using fallback")
-        except Exception as e:
-            print(f"Embed error: {e}")
-    
     def _header(self, title):
-        self.hdr = tk.Frame(self.main, bg=self.theme["header"], height=32)
+        self.hdr = self.ui(tk.Frame, self.main, bg="header", height=32)
         self.hdr.pack(fill="x")
         self.hdr.pack_propagate(False)
         
-        self.title_lbl = tk.Label(self.hdr, text=f" {title}", bg=self.theme["header"],
-                                  fg=self.theme["text"], font=FONTS["title"], anchor="w")
+        self.title_lbl = self.ui(tk.Label, self.hdr, text=f" {title}", bg="header",
+                                            fg="text", font=FONTS["title"], anchor="w")
         self.title_lbl.pack(side="left", fill="x", expand=True)
         
         # Buttons
-        btns = tk.Frame(self.hdr, bg=self.theme["header"])
+        btns = self.ui(tk.Frame, self.hdr, bg="header")
         btns.pack(side="right", padx=3)
         
         for txt, cmd in [("🎨", self._theme_menu), ("✕", self._hide)]:
-            b = tk.Label(btns, text=txt, bg=self.theme["header"], fg=self.theme["text"],
-                        font=FONTS["icon"], cursor="hand2")
+            b = self.ui(tk.Label, btns, text=txt, bg="header", fg="text",
+                                  font=FONTS["icon"], cursor="hand2")
             b.pack(side="left", padx=2)
             b.bind("<Button-1>", cmd)
         
@@ -335,15 +2267,69 @@ class BaseWidget:
     
     def _set_theme(self, name):
         self.theme = THEMES[name]
-        if "widget_themes" not in self.app.data:
-            self.app.data["widget_themes"] = {}
-        self.app.data["widget_themes"][self.wid] = name
-        self.app.save()
+        self.app.put(["widget_themes", self.wid], name)
         self.apply_theme()
     
+    def ui(self, cls, *args, **options):
+        """Create a Tk widget whose color options may name theme roles - they follow theme switches"""
+        return self.styles.create(cls, *args, **options)
+    
+    def bind_editor(self, widget, commit):
+        """Track real edits of a Text (<<Modified>>) or Entry (key validation) and call commit()
+        once they settle: after EDIT_IDLE_MS without typing, on focus-out, or from commit_edits()
+        before navigating away. Keys that don't change the text cost nothing"""
+        self.editors[widget] = commit
+        if isinstance(widget, tk.Text):
+            widget.bind("<<Modified>>", lambda e: self._text_modified(widget), add="+")
+        else:
+            check = widget.register(lambda: self._edited(widget) or True)
+            widget.config(validate="key", validatecommand=check)
+        widget.bind("<FocusOut>", lambda e: self.commit_edits(widget), add="+")
+    
+    def _text_modified(self, widget):
+        # Clearing the flag fires <<Modified>> again - that one finds it clear and is ignored
+        if widget.edit_modified():
+            widget.edit_modified(False)
+            self._edited(widget)
+    
+    def _edited(self, widget):
+        if self._filling:
+            return
+        self.edits.add(widget)
+        if self._edit_job:
+            self.win.after_cancel(self._edit_job)
+        self._edit_job = self.win.after(EDIT_IDLE_MS, self.commit_edits)
+    
+    def commit_edits(self, widget=None):
+        """Commit pending edits of one editor, or of all of them"""
+        for w in [widget] if widget else list(self.edits):
+            if w in self.edits:
+                self.edits.discard(w)
+                self.editors[w]()
+        if not self.edits and self._edit_job:
+            self.win.after_cancel(self._edit_job)
+            self._edit_job = None
+    
+    def fill_editor(self, widget, text):
+        """Show text in an editor without it counting as an edit"""
+        is_text = isinstance(widget, tk.Text)
+        if (widget.get("1.0", "end-1c") if is_text else widget.get()) != text:
+            self._filling = True
+            try:
+                if is_text:
+                    widget.delete("1.0", "end")
+                    widget.insert("1.0", text)
+                    widget.edit_modified(False)
+                else:
+                    widget.delete(0, "end")
+                    widget.insert(0, text)
+            finally:
+                self._filling = False
+        self.edits.discard(widget)
+    
     def _grip(self):
-        self.grip = tk.Label(self.main, text="⋱", bg=self.theme["bg"], fg=self.theme["accent"],
-                            font=("Segoe UI", 10), cursor="size_nw_se")
+        self.grip = self.ui(tk.Label, self.main, text="⋱", bg="bg", fg="accent",
+                                      font=("Segoe UI", 10), cursor="size_nw_se")
         self.grip.place(relx=1, rely=1, anchor="se")
         self.grip.bind("<Button-1>", self._resize_start)
         self.grip.bind("<B1-Motion>", self._resize_move)
@@ -354,11 +2340,18 @@ class BaseWidget:
     
     def _drag_move(self, e):
         if self.drag:
-            self.win.geometry(f"+{e.x_root - self.drag['x']}+{e.y_root - self.drag['y']}")
+            self.drag["pos"] = (e.x_root - self.drag["x"], e.y_root - self.drag["y"])
+            self.drag["to"] = "+{}+{}".format(*self.drag["pos"])
+            self._queue_motion()
     
     def _drag_end(self, e):
-        self.drag = {}
-        self._save_pos()
+        if self.drag:
+            self._apply_motion()
+            # Tk hasn't moved the window yet - save where it was just sent, not winfo_x/y
+            pos = self.drag.get("pos")
+            self.drag = {}
+            if pos:
+                self._save_pos(*pos)
     
     def _resize_start(self, e):
         self.resize = {"x": e.x_root, "y": e.y_root, "w": self.win.winfo_width(), "h": self.win.winfo_height()}
@@ -367,187 +2360,430 @@ class BaseWidget:
         if self.resize:
             nw = max(self.min_w, self.resize["w"] + e.x_root - self.resize["x"])
             nh = max(self.min_h, self.resize["h"] + e.y_root - self.resize["y"])
-            self.win.geometry(f"{int(nw)}x{int(nh)}")
+            self.resize["dims"] = (int(nw), int(nh))
+            self.resize["to"] = "{}x{}".format(*self.resize["dims"])
+            self._queue_motion()
     
     def _resize_end(self, e):
-        self.resize = {}
-        self._save_size()
-        self._check_expanded()
+        if self.resize:
+            self._apply_motion()
+            dims = self.resize.get("dims")
+            self.resize = {}
+            if dims:
+                self._save_size(*dims)
+            # Live resize is over - run the layout and renders held back during it
+            if not self.suspended:
+                self.resume()
+    
+    def _queue_motion(self):
+        # Pointer events arrive faster than frames - only the latest position is applied, once per frame
+        if not self._motion_job:
+            self._motion_job = self.win.after(FRAME_MS, self._apply_motion)
+    
+    def _apply_motion(self):
+        if self._motion_job:
+            self.win.after_cancel(self._motion_job)
+            self._motion_job = None
+        for state in (self.drag, self.resize):
+            if "to" in state:
+                self.win.geometry(state.pop("to"))
+    
+    def _scale(self, w, h):
+        return max(w / self.compact[0], h / self.compact[1])
+    
+    @property
+    def expanded(self):
+        return self.size != "compact"
     
     def _on_resize(self, e):
-        """Called when window size changes"""
-        self._check_expanded()
-    
-    def _check_expanded(self):
-        """Check if widget is in expanded mode"""
-        default = COMPACT_SIZES.get(self.wid, (250, 300))
-        w, h = self.win.winfo_width(), self.win.winfo_height()
-        new_expanded = w > default[0] * 1.2 or h > default[1] * 1.2
-        if new_expanded != self.expanded:
-            self.expanded = new_expanded
+        """<Configure> of the window - and, through its bindtag, of every child.
+        Only the window's own size counts, and a burst of events makes one layout pass per frame"""
+        if e.widget is not self.win or (e.width, e.height) == self.win_size:
+            return
+        self.win_size = (e.width, e.height)
+        if not self._layout_job:
+            self._layout_job = self.win.after(FRAME_MS, self._layout_pass)
+    
+    def _layout_pass(self):
+        self._layout_job = None
+        self.defer(self.relayout)
+    
+    def relayout(self):
+        """Move to the size class of the current window size, adjusting widgets in place"""
+        size = size_class(self._scale(*self.win_size), self.size)
+        if size != self.size:
+            self.size = size
+            self.layout.apply(size)
             self.on_mode_change()
     
     def on_mode_change(self):
-        """Override in subclasses to handle compact/expanded mode"""
+        """Override in subclasses for content that depends on the size class (layout rules are applied already)"""
         pass
     
-    def _save_pos(self):
-        if "positions" not in self.app.data:
-            self.app.data["positions"] = {}
-        self.app.data["positions"][self.wid] = {"x": self.win.winfo_x(), "y": self.win.winfo_y()}
-        self.app.save()
+    def _save_pos(self, x, y):
+        self.app.save_geometry("positions", self.wid, {"x": x, "y": y})
     
-    def _save_size(self):
-        if "sizes" not in self.app.data:
-            self.app.data["sizes"] = {}
-        self.app.data["sizes"][self.wid] = {"w": self.win.winfo_width(), "h": self.win.winfo_height()}
-        self.app.save()
+    def _save_size(self, w, h):
+        self.app.save_geometry("sizes", self.wid, {"w": w, "h": h})
     
-    def _hide(self, e=None):
+    def _hide(self, e=None, flush=True):
         self.win.withdraw()
-        if "hidden" not in self.app.data:
-            self.app.data["hidden"] = []
-        if self.wid not in self.app.data["hidden"]:
-            self.app.data["hidden"].append(self.wid)
-        self.app.save()
+        if self.wid not in self.app.data.get("hidden", []):
+            self.app.append(["hidden"], self.wid)
+        if flush:
+            self.app.flush()
         self.app.update_panel()
     
+    @property
+    def hidden(self):
+        return self.wid in self.app.data.get("hidden", [])
+    
+    @property
+    def suspended(self):
+        """Hidden, or nobody is at the machine: don't render, just remember what to redo"""
+        return self.app.idle or self.hidden
+    
+    def defer(self, fn):
+        """Run fn now, or once on resume() while suspended or during a live resize"""
+        if self.suspended or self.resize:
+            self.stale[fn] = True
+        else:
+            fn()
+    
+    def resume(self):
+        """Catch up after being suspended - each deferred render runs once, ticks run now"""
+        stale, self.stale = self.stale, {}
+        # Layout first, so the renders see the final size class
+        if stale.pop(self.relayout, False):
+            self.relayout()
+        for fn in stale:
+            fn()
+        self.app.ticks.refresh(self)
+    
     def show(self):
         self.win.deiconify()
-        if "hidden" in self.app.data and self.wid in self.app.data["hidden"]:
-            self.app.data["hidden"].remove(self.wid)
-        self.app.save()
-        self.win.after(100, self._embed)
+        hidden = self.app.data.get("hidden", [])
+        if self.wid in hidden:
+            self.app.delete(["hidden", hidden.index(self.wid)])
+            if not self.app.idle:
+                self.resume()
+        self.app.desktop.request(self)
     
     def apply_theme(self):
-        t = self.theme
-        self.border.config(bg=t["border"])
-        self.main.config(bg=t["bg"])
-        self.hdr.config(bg=t["header"])
-        self.title_lbl.config(bg=t["header"], fg=t["text"])
-        self.content.config(bg=t["bg"])
-        self.grip.config(bg=t["bg"], fg=t["accent"])
+        """Recolor in place. Subclasses only redo colors that depend on state (today, done, running)"""
+        self.styles.apply(self.theme)
 
 
 # ============== CALENDAR ==============
 class CalendarWidget(BaseWidget):
+    """Month grid (or 12-month year view) drawn as items on one Canvas.
+    Navigation is a redraw - no Tk widgets are created or destroyed"""
+    
+    HEADER_H = 18
+    
     def __init__(self, master, app):
         super().__init__(master, "📅 Calendar", "calendar", app)
         self.date = datetime.now()
+        self.view = "month"
+        self.weeks = []
+        self.edit_key = None
+        self.editor_item = None
+        # Room for the year view's 12 months and the pages either side of them
+        self.pages = PageCache(self, self._build_page, self._neighbours, size=12 + 2)
+        self.today = datetime.now().date()
         self.build()
+        app.ticks.subscribe(self._on_hour, "hour", self)
+        app.subscribe(self._on_change)
     
     def build(self):
         # Nav - always visible
-        nav = tk.Frame(self.content, bg=self.theme["bg"])
+        nav = self.ui(tk.Frame, self.content, bg="bg")
         nav.pack(fill="x", pady=3)
         
-        self.prev = tk.Button(nav, text="◀", command=self.prev_m, bg=self.theme["button"],
-                             fg=self.theme["text"], font=FONTS["small"], bd=0, padx=6, cursor="hand2")
+        self.prev = self.ui(tk.Button, nav, text="◀", command=self.prev_m, bg="button",
+                                       fg="text", font=FONTS["small"], bd=0, padx=6, cursor="hand2")
         self.prev.pack(side="left")
         
-        self.month_lbl = tk.Label(nav, bg=self.theme["bg"], fg=self.theme["text"], font=FONTS["header"])
+        self.month_lbl = self.ui(tk.Label, nav, bg="bg", fg="text", font=FONTS["header"])
         self.month_lbl.pack(side="left", fill="x", expand=True)
         
-        self.nxt = tk.Button(nav, text="▶", command=self.next_m, bg=self.theme["button"],
-                            fg=self.theme["text"], font=FONTS["small"], bd=0, padx=6, cursor="hand2")
+        self.nxt = self.ui(tk.Button, nav, text="▶", command=self.next_m, bg="button",
+                                      fg="text", font=FONTS["small"], bd=0, padx=6, cursor="hand2")
         self.nxt.pack(side="right")
         
-        # Today button - only in expanded mode
-        self.today_btn = tk.Button(nav, text="Today", command=self.go_today, bg=self.theme["accent"],
-                                   fg="white", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2")
+        # Month / year view switch
+        self.view_btn = self.ui(tk.Button, nav, text="Year", command=self.toggle_view, bg="button",
+                                            fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2")
+        self.view_btn.pack(side="right", padx=3)
         
-        # Calendar scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
-        self.scroll.pack(fill="both", expand=True)
-        self.grid = self.scroll.inner
+        # Today button - only in expanded mode
+        self.today_btn = self.ui(tk.Button, nav, text="Today", command=self.go_today, bg="accent",
+                                             fg="white", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2")
+        self.layout.show(self.today_btn, "expanded", side="right", padx=3)
+        self.layout.apply(self.size)
+        
+        # Grid canvas
+        self.canvas = self.ui(tk.Canvas, self.content, bg="bg", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.defer(self.render))
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Button-3>", self._day_menu)
+        
+        # One shared editor, placed over the day being edited
+        self.editor = self.ui(tk.Text, self.canvas, bg="entry", fg="text",
+                                        font=FONTS["tiny"], bd=1, relief="solid", wrap="word")
+        self.editor.bind("<Escape>", lambda e: self.close_editor())
+        self.editor.bind("<FocusOut>", lambda e: self.win.after_idle(self._on_editor_blur))
+        self.bind_editor(self.editor, lambda: self.save_ev(self.edit_key, self.editor))
         
         self.render()
     
+    def _on_hour(self, now):
+        # Move the today highlight after midnight, unless an event is being edited
+        if now.date() != self.today and self.edit_key is None:
+            self.today = now.date()
+            self.render()
+    
     def render(self):
-        for w in self.grid.winfo_children():
-            w.destroy()
+        self._hide_editor()
+        self.canvas.delete("all")
+        w, h = max(self.canvas.winfo_width(), 50), max(self.canvas.winfo_height(), 50)
         
-        year, month = self.date.year, self.date.month
-        self.month_lbl.config(text=f"{calendar.month_abbr[month]} {year}")
-        
-        # Show today button only in expanded mode
-        if self.expanded:
-            self.today_btn.pack(side="right", padx=3)
+        if self.view == "year":
+            self._render_year(w, h)
         else:
-            self.today_btn.pack_forget()
+            self._render_month(w, h)
+    
+    def _build_page(self, key):
+        year, month = key
+        mkey = f"{year}-{month:02d}"
+        self.app.fetch("events", mkey)
+        events = self.app.data.get("events", {})
+        return {
+            "label": f"{calendar.month_abbr[month]} {year}",
+            "weeks": calendar.monthcalendar(year, month),
+            "events": {d: events[f"{mkey}-{d:02d}"] for d in range(1, 32) if f"{mkey}-{d:02d}" in events},
+            "repeats": self.app.recurrences.month(year, month),
+            "timed": {d.day: [timed_label(e, d) for _, e in found] for d, found in
+                      self.app.timed.by_day(datetime(year, month, 1).date(), calendar.monthrange(year, month)[1]).items()},
+            "deps": {("events", mkey), ("recurring", None), ("timed", None)},
+        }
+    
+    def _neighbours(self, key):
+        return [add_months(*key, -1), add_months(*key, 1)]
+    
+    def _render_month(self, w, h):
+        c, paint = self.canvas, self.styles.paint
+        year, month = self.date.year, self.date.month
+        page = self.pages.get((year, month))
+        self.month_lbl.config(text=page["label"])
+        self.view_btn.config(text="Year")
         
-        # Day headers - FIXED WIDTH
-        cell_w = 9 if self.expanded else 5
+        # Day headers
         days = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"] if not self.expanded else ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        self.weeks = page["weeks"]
+        self.cell_w = cw = w / 7
+        self.cell_h = ch = (h - self.HEADER_H) / len(self.weeks)
         
-        for c, d in enumerate(days):
-            fg = "#E74C3C" if c >= 5 else self.theme["text"]
-            tk.Label(self.grid, text=d, bg=self.theme["header"], fg=fg,
-                    font=FONTS["tiny"], width=cell_w, relief="solid", bd=1).grid(row=0, column=c, sticky="nsew")
+        for col, d in enumerate(days):
+            x0 = col * cw
+            c.create_rectangle(x0, 0, x0 + cw, self.HEADER_H, **paint(fill="header", outline="border"))
+            c.create_text(x0 + cw / 2, self.HEADER_H / 2, text=d, font=FONTS["tiny"],
+                          **paint(fill="#E74C3C" if col >= 5 else "text"))
         
-        # Cells - FIXED SIZE
-        cal = calendar.monthcalendar(year, month)
+        # Cells
+        today = datetime.now()
+        events, repeats = page["events"], page["repeats"]
+        
+        for r, week in enumerate(self.weeks):
+            for col, day in enumerate(week):
+                x0, y0 = col * cw, self.HEADER_H + r * ch
+                if day == 0:
+                    c.create_rectangle(x0, y0, x0 + cw, y0 + ch, **paint(fill="bg", outline="border"))
+                    continue
+                
+                is_today = (year == today.year and month == today.month and day == today.day)
+                c.create_rectangle(x0, y0, x0 + cw, y0 + ch, **paint(fill="entry", outline="border"))
+                if is_today:
+                    c.create_rectangle(x0 + 1, y0 + 1, x0 + 18, y0 + 14, outline="", **paint(fill="accent"))
+                fg = "white" if is_today else ("#E74C3C" if col >= 5 else "text")
+                c.create_text(x0 + 3, y0 + 1, text=str(day), anchor="nw", font=FONTS["tiny"], **paint(fill=fg))
+                
+                # Event text in expanded mode, a dot in compact mode
+                lines = [events[day]] if day in events else []
+                lines += [f"🔁 {t}" for _, t in repeats.get(day, ())] + page["timed"].get(day, [])
+                text = "\n".join(lines)
+                if text and self.expanded:
+                    c.create_text(x0 + 3, y0 + 15, text=self._clip(text, cw - 6, ch - 16), anchor="nw",
+                                  width=cw - 6, font=FONTS["tiny"], **paint(fill="text_light"))
+                elif text:
+                    c.create_oval(x0 + cw - 8, y0 + 4, x0 + cw - 4, y0 + 8, outline="", **paint(fill="accent"))
+    
+    def _render_year(self, w, h):
+        c, paint = self.canvas, self.styles.paint
+        year = self.date.year
+        self.month_lbl.config(text=str(year))
+        self.view_btn.config(text="Month")
+        
+        self.year_cols = cols = 4 if w >= h else 3
+        rows = 12 // cols
+        self.box_w, self.box_h = mw, mh = w / cols, h / rows
         today = datetime.now()
-        events = self.app.data.get("events", {})
         
-        cell_h = 50 if self.expanded else 28
+        for m in range(1, 13):
+            bx, by = ((m - 1) % cols) * mw, ((m - 1) // cols) * mh
+            c.create_rectangle(bx + 1, by + 1, bx + mw - 1, by + mh - 1, **paint(fill="entry", outline="border"))
+            c.create_text(bx + mw / 2, by + 2, text=calendar.month_abbr[m], anchor="n",
+                          font=FONTS["tiny"], **paint(fill="accent" if (year, m) == (today.year, today.month) else "text"))
+            
+            # Day numbers scaled to the box (negative font size = pixels)
+            dx, dy = (mw - 4) / 7, (mh - 16) / 6
+            font = ("Segoe UI", -max(6, int(min(dx * 0.55, dy * 0.8))))
+            page = self.pages.get((year, m))
+            for r, week in enumerate(page["weeks"]):
+                for col, day in enumerate(week):
+                    if day == 0:
+                        continue
+                    x, y = bx + 2 + (col + 0.5) * dx, by + 15 + (r + 0.5) * dy
+                    if (year, m, day) == (today.year, today.month, today.day):
+                        c.create_rectangle(x - dx / 2, y - dy / 2, x + dx / 2, y + dy / 2, outline="", **paint(fill="accent"))
+                        fg = "white"
+                    elif day in page["events"] or day in page["repeats"] or day in page["timed"]:
+                        fg = "accent"
+                    else:
+                        fg = "#E74C3C" if col >= 5 else "text_light"
+                    c.create_text(x, y, text=str(day), font=font, **paint(fill=fg))
+    
+    @staticmethod
+    def _clip(text, width, height):
+        """Shorten text to roughly what fits in a cell"""
+        per_line, lines = max(1, int(width / 6)), max(1, int(height / 12))
+        text = text.replace("\n", " ")
+        limit = per_line * lines
+        return text if len(text) <= limit else text[:max(1, limit - 1)] + "…"
+    
+    def _on_click(self, e):
+        if self.view == "year":
+            col, row = int(e.x // self.box_w), int(e.y // self.box_h)
+            m = row * self.year_cols + col + 1
+            if 0 <= col < self.year_cols and 1 <= m <= 12:
+                self.date = self.date.replace(day=1, month=m)
+                self.view = "month"
+                self.render()
+            return
+        
+        # Editing only in expanded mode, as before
+        if not self.expanded or e.y < self.HEADER_H:
+            return
+        r, col = int((e.y - self.HEADER_H) // self.cell_h), int(e.x // self.cell_w)
+        if 0 <= r < len(self.weeks) and 0 <= col < 7 and self.weeks[r][col]:
+            self.open_editor(r, col)
+    
+    def _day_menu(self, e):
+        """Right-click on a day: make its event repeat, or skip, edit or end a series on it"""
+        if self.view == "year" or e.y < self.HEADER_H:
+            return
+        r, col = int((e.y - self.HEADER_H) // self.cell_h), int(e.x // self.cell_w)
+        if not (0 <= r < len(self.weeks) and 0 <= col < 7 and self.weeks[r][col]):
+            return
+        day = self.date.replace(day=self.weeks[r][col]).date()
+        key = day.isoformat()
         
-        for r, week in enumerate(cal):
-            for c, day in enumerate(week):
-                cell = tk.Frame(self.grid, bg=self.theme["entry"], relief="solid", bd=1,
-                               width=cell_w * 8, height=cell_h)
-                cell.grid(row=r + 1, column=c, sticky="nsew")
-                cell.grid_propagate(False)
-                
-                if day != 0:
-                    key = f"{year}-{month:02d}-{day:02d}"
-                    is_today = (year == today.year and month == today.month and day == today.day)
-                    is_wknd = c >= 5
-                    
-                    bg = self.theme["accent"] if is_today else self.theme["entry"]
-                    fg = "white" if is_today else ("#E74C3C" if is_wknd else self.theme["text"])
-                    
-                    tk.Label(cell, text=str(day), bg=bg, fg=fg, font=FONTS["tiny"]).pack(anchor="nw")
-                    
-                    # Event text - only in expanded mode
-                    if self.expanded:
-                        txt = tk.Text(cell, height=2, width=8, bg=self.theme["entry"],
-                                     fg=self.theme["text_light"], font=FONTS["tiny"], bd=0, wrap="word")
-                        txt.pack(fill="both", expand=True, padx=1)
-                        txt.insert("1.0", events.get(key, ""))
-                        txt.bind("<KeyRelease>", lambda e, k=key, t=txt: self.save_ev(k, t))
-                else:
-                    cell.config(bg=self.theme["bg"])
+        menu = tk.Menu(self.win, tearoff=0, font=FONTS["small"])
+        menu.add_command(label="🔁 Repeat…", command=lambda: RecurrenceDialog(
+            self, key, text=self.app.data.get("events", {}).get(key, "")))
+        menu.add_command(label="🕒 Timed event…", command=lambda: TimedEventDialog(self, f"{key}T09:00"))
+        for eid, event in self.app.timed.by_day(day, 1).get(day, []):
+            name = event["title"][:20]
+            menu.add_separator()
+            menu.add_command(label=f"Edit “{name}”…", command=lambda eid=eid: TimedEventDialog(self, f"{key}T09:00", eid))
+            menu.add_command(label=f"Delete “{name}”", command=lambda eid=eid: self.app.delete(["timed", eid]))
+        for rid, text in self.app.recurrences.on_day(day):
+            name = text[:20]
+            menu.add_separator()
+            menu.add_command(label=f"Skip “{name}” this day",
+                             command=lambda rid=rid: self.app.append(["recurring", rid, "except"], key))
+            menu.add_command(label=f"Edit “{name}”…", command=lambda rid=rid: RecurrenceDialog(self, key, rid))
+            menu.add_command(label=f"Delete “{name}” series", command=lambda rid=rid: self.app.delete(["recurring", rid]))
+        menu.tk_popup(e.x_root, e.y_root)
+    
+    def _on_change(self, op, path):
+        if path[0] in ("recurring", "timed"):
+            self.defer(self.render)
+    
+    def open_editor(self, r, col):
+        if self.editor_item:
+            self.render()
+        day = self.weeks[r][col]
+        self.edit_key = f"{self.date.year}-{self.date.month:02d}-{day:02d}"
+        x0, y0 = col * self.cell_w, self.HEADER_H + r * self.cell_h
+        
+        self.app.fetch("events", self.edit_key[:7])
+        self.fill_editor(self.editor, self.app.data.get("events", {}).get(self.edit_key, ""))
+        self.editor_item = self.canvas.create_window(x0 + 1, y0 + 14, anchor="nw", window=self.editor,
+                                                     width=max(self.cell_w - 2, 60), height=max(self.cell_h - 15, 30))
+        self.editor.focus_set()
+    
+    def _hide_editor(self):
+        self.commit_edits()
+        if self.editor_item:
+            self.canvas.delete(self.editor_item)
+        self.editor_item = None
+        self.edit_key = None
+    
+    def _on_editor_blur(self):
+        # Re-opening the editor on another day keeps focus in it - only close when focus really left
+        if self.editor_item and self.win.focus_get() is not self.editor:
+            self.close_editor()
+    
+    def close_editor(self):
+        if self.editor_item:
+            self._hide_editor()
+            self.render()
     
     def save_ev(self, key, txt):
-        if "events" not in self.app.data:
-            self.app.data["events"] = {}
+        if key is None:
+            return
         text = txt.get("1.0", "end-1c").strip()
         if text:
-            self.app.data["events"][key] = text
-        elif key in self.app.data["events"]:
-            del self.app.data["events"][key]
-        self.app.save()
+            self.app.put(["events", key], text)
+        else:
+            self.app.delete(["events", key])
+    
+    def toggle_view(self):
+        self.view = "month" if self.view == "year" else "year"
+        self.render()
     
     def prev_m(self):
-        self.date = self.date.replace(day=1) - timedelta(days=1)
+        if self.view == "year":
+            self.date = self.date.replace(year=self.date.year - 1, day=1)
+        else:
+            self.date = self.date.replace(day=1) - timedelta(days=1)
         self.render()
     
     def next_m(self):
-        self.date = self.date.replace(day=28) + timedelta(days=4)
-        self.date = self.date.replace(day=1)
+        if self.view == "year":
+            self.date = self.date.replace(year=self.date.year + 1, day=1)
+        else:
+            self.date = self.date.replace(day=28) + timedelta(days=4)
+            self.date = self.date.replace(day=1)
         self.render()
     
     def go_today(self):
         self.date = datetime.now()
         self.render()
     
-    def on_mode_change(self):
+    def reveal(self, key):
+        """Jump to the month of event key and open it for editing"""
+        self.date = datetime.strptime(key, "%Y-%m-%d")
+        self.view = "month"
         self.render()
+        if self.expanded:
+            for r, week in enumerate(self.weeks):
+                if self.date.day in week:
+                    self.open_editor(r, week.index(self.date.day))
     
-    def apply_theme(self):
-        super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
+    def on_mode_change(self):
         self.render()
 
 
@@ -555,247 +2791,485 @@ class CalendarWidget(BaseWidget):
 class TodoWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "✅ To-Do", "todo", app)
+        self.index_tasks()
         self.build()
+        app.ticks.subscribe(self._on_hour, "hour", self)
+        app.subscribe(self._on_change)
     
     def build(self):
         # Add task - compact
-        add = tk.Frame(self.content, bg=self.theme["bg"])
+        add = self.ui(tk.Frame, self.content, bg="bg")
         add.pack(fill="x", pady=3)
         
-        self.entry = tk.Entry(add, bg=self.theme["entry"], fg=self.theme["text"],
-                             font=FONTS["small"], bd=1, relief="solid")
+        self.entry = self.ui(tk.Entry, add, bg="entry", fg="text",
+                                       font=FONTS["small"], bd=1, relief="solid")
         self.entry.pack(side="left", fill="x", expand=True, padx=(0, 3))
         self.entry.bind("<Return>", self.add_task)
         
-        tk.Button(add, text="+", command=self.add_task, bg=self.theme["accent"],
-                 fg="white", font=FONTS["small"], bd=0, padx=6, cursor="hand2").pack(side="right")
+        self.ui(tk.Button, add, text="+", command=self.add_task, bg="accent",
+                           fg="white", font=FONTS["small"], bd=0, padx=6, cursor="hand2").pack(side="right")
         
-        # Priority frame - only in expanded
-        self.pri_frame = tk.Frame(self.content, bg=self.theme["bg"])
+        # Priority buttons - only in expanded
+        self.pri_frame = self.ui(tk.Frame, self.content, bg="bg")
         self.priority = tk.StringVar(value="low")
-        
-        # Filter frame - only in expanded
-        self.filt_frame = tk.Frame(self.content, bg=self.theme["bg"])
+        for sym, lvl in [("🔴", "high"), ("🟡", "med"), ("🟢", "low")]:
+            self.ui(tk.Radiobutton, self.pri_frame, text=sym, variable=self.priority, value=lvl,
+                                    bg="bg", font=("Segoe UI", 10), indicatoron=False,
+                                    selectcolor="button").pack(side="left", padx=2)
+        
+        # Due date and reminder time for new tasks - see parse_due()
+        self.ui(tk.Label, self.pri_frame, text="📅", bg="bg", fg="text", font=FONTS["tiny"]).pack(side="left", padx=(6, 0))
+        self.due_entry = self.ui(tk.Entry, self.pri_frame, bg="entry", fg="text", font=FONTS["tiny"],
+                                             width=10, bd=1, relief="solid")
+        self.due_entry.pack(side="left")
+        self.ui(tk.Label, self.pri_frame, text="⏰", bg="bg", fg="text", font=FONTS["tiny"]).pack(side="left", padx=(4, 0))
+        self.remind_entry = self.ui(tk.Entry, self.pri_frame, bg="entry", fg="text", font=FONTS["tiny"],
+                                                width=5, bd=1, relief="solid")
+        self.remind_entry.pack(side="left")
+        
+        # Filter buttons - only in expanded
+        self.filt_frame = self.ui(tk.Frame, self.content, bg="bg")
         self.filter = tk.StringVar(value="all")
+        for txt, val in [("All", "all"), ("Active", "active"), ("Done", "done"), ("Today", "today"), ("Overdue", "overdue")]:
+            self.ui(tk.Radiobutton, self.filt_frame, text=txt, variable=self.filter, value=val,
+                                    bg="button", fg="text", font=FONTS["tiny"],
+                                    indicatoron=False, selectcolor="accent",
+                                    command=self.load, padx=5).pack(side="left", padx=1)
         
         # Tasks scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
         self.scroll.pack(fill="both", expand=True)
-        self.tasks_fr = self.scroll.inner
         
         # Stats - only in expanded
-        self.stats = tk.Label(self.content, bg=self.theme["bg"], fg=self.theme["text_light"], font=FONTS["tiny"])
+        self.stats = self.ui(tk.Label, self.content, bg="bg", fg="text_light", font=FONTS["tiny"])
+        
+        self.layout.show(self.pri_frame, "expanded", fill="x", pady=2, before=self.scroll)
+        self.layout.show(self.filt_frame, "expanded", fill="x", pady=2, before=self.scroll)
+        self.layout.show(self.stats, "expanded", fill="x", pady=2)
+        self.layout.apply(self.size)
         
         self.load()
     
     def load(self):
-        for w in self.tasks_fr.winfo_children():
-            w.destroy()
-        
-        # Show/hide expanded elements
-        if self.expanded:
-            # Priority buttons
-            self.pri_frame.pack(fill="x", pady=2, before=self.scroll)
-            for w in self.pri_frame.winfo_children():
-                w.destroy()
-            for sym, lvl in [("🔴", "high"), ("🟡", "med"), ("🟢", "low")]:
-                tk.Radiobutton(self.pri_frame, text=sym, variable=self.priority, value=lvl,
-                              bg=self.theme["bg"], font=("Segoe UI", 10), indicatoron=False,
-                              selectcolor=self.theme["button"]).pack(side="left", padx=2)
-            
-            # Filter buttons
-            self.filt_frame.pack(fill="x", pady=2, before=self.scroll)
-            for w in self.filt_frame.winfo_children():
-                w.destroy()
-            for txt, val in [("All", "all"), ("Active", "active"), ("Done", "done")]:
-                tk.Radiobutton(self.filt_frame, text=txt, variable=self.filter, value=val,
-                              bg=self.theme["button"], fg=self.theme["text"], font=FONTS["tiny"],
-                              indicatoron=False, selectcolor=self.theme["accent"],
-                              command=self.load, padx=5).pack(side="left", padx=1)
-            
-            self.stats.pack(fill="x", pady=2)
-        else:
-            self.pri_frame.pack_forget()
-            self.filt_frame.pack_forget()
-            self.stats.pack_forget()
-        
+        self.scroll.set_rows(len(self.shown), 28, self._make_row, self._fill_row)
+        self.update_stats()
+    
+    def index_tasks(self):
+        """Give every task a stable id and build the id indexes.
+        Tasks are only ever appended, so ids increase with list position and every
+        index stays sorted - positions and rows are found by bisection"""
+        tasks = self.app.data.get("todos", [])
+        ids = [t.get("id") for t in tasks]
+        if not all(isinstance(i, int) for i in ids) or any(a >= b for a, b in zip(ids, ids[1:])):
+            for pos, task in enumerate(tasks):
+                if task.get("id") != pos + 1:
+                    self.app.put(["todos", pos, "id"], pos + 1)
+        
+        self.order = [t["id"] for t in tasks]
+        self.states = {"active": [t["id"] for t in tasks if not t.get("done")],
+                       "done": [t["id"] for t in tasks if t.get("done")]}
+        self.next_id = self.order[-1] + 1 if self.order else 1
+        self.rows = {}
+        self.index_due()
+    
+    def index_due(self):
+        """Active tasks due today and overdue, by id. Rebuilt when a due date or done state
+        changes and when the day turns - new lists, so take self.shown again afterwards"""
+        today = datetime.now().date().isoformat()
+        self.due_day = today
         tasks = self.app.data.get("todos", [])
+        self.states["today"] = [t["id"] for t in tasks if not t.get("done") and t.get("due") == today]
+        self.states["overdue"] = [t["id"] for t in tasks if not t.get("done") and t.get("due", today) < today]
+    
+    @property
+    def shown(self):
+        """Ids passing the current filter (the live index, not a copy)"""
         ftype = self.filter.get() if self.expanded else "all"
+        return self.order if ftype == "all" else self.states[ftype]
+    
+    def _pos(self, tid):
+        pos = bisect_left(self.order, tid)
+        return pos if pos < len(self.order) and self.order[pos] == tid else None
+    
+    def _on_change(self, op, path):
+        # A field set from outside the widget, e.g. the reminder scheduler ringing or snoozing a task
+        if path[0] == "todos" and len(path) > 2 and path[1] < len(self.order):
+            row = self.rows.get(self.order[path[1]])
+            if row is not None:
+                self._show_task(row, self.app.data["todos"][path[1]])
+    
+    def update_stats(self):
+        if self.expanded:
+            self.stats.config(text=f"📊 {len(self.states['done'])}/{len(self.order)} done")
+    
+    def _make_row(self, parent):
+        outer = self.ui(tk.Frame, parent, bg="bg")
+        frame = self.ui(tk.Frame, outer, bg="entry", pady=3)
+        frame.pack(fill="both", expand=True, pady=1, padx=1)
+        row = {"frame": outer, "id": None, "var": tk.BooleanVar(), "size": None}
         
-        done_count = sum(1 for t in tasks if t.get("done"))
+        # Priority icon - packed by _fill_row in expanded mode
+        row["pri"] = self.ui(tk.Label, frame, bg="entry", font=("Segoe UI", 9))
         
-        for task in tasks:
-            if ftype == "active" and task.get("done"):
-                continue
-            if ftype == "done" and not task.get("done"):
-                continue
-            self._task_row(task, tasks.index(task))
+        row["check"] = self.ui(tk.Checkbutton, frame, variable=row["var"], bg="entry",
+                                                command=lambda: self.toggle(row["id"], row["var"].get()))
+        row["check"].pack(side="left")
         
-        if self.expanded:
-            self.stats.config(text=f"📊 {done_count}/{len(tasks)} done")
-    
-    def _task_row(self, task, idx):
-        row = tk.Frame(self.tasks_fr, bg=self.theme["entry"], pady=3)
-        row.pack(fill="x", pady=1, padx=1)
+        row["label"] = self.ui(tk.Label, frame, bg="entry", anchor="w")
+        row["label"].pack(side="left", fill="x", expand=True, padx=3)
+        row["label"].bind("<Button-3>", lambda e: self._task_menu(e, row["id"]))
         
-        # Priority icon only in expanded mode
+        del_btn = self.ui(tk.Label, frame, text="✕", bg="entry", fg="#E74C3C",
+                                    font=FONTS["tiny"], cursor="hand2")
+        del_btn.pack(side="right", padx=2)
+        del_btn.bind("<Button-1>", lambda e: self.delete(row["id"]))
+        return row
+    
+    def _fill_row(self, row, i):
+        tid = self.shown[i]
+        if self.rows.get(row["id"]) is row:
+            del self.rows[row["id"]]
+        row["id"] = tid
+        self.rows[tid] = row
+        if row["size"] != self.size:
+            # Rows are recycled across size changes - adapt them when refilled
+            row["size"] = self.size
+            if self.expanded:
+                row["pri"].pack(side="left", padx=2, before=row["check"])
+            else:
+                row["pri"].pack_forget()
+        self._show_task(row, self.app.data["todos"][self._pos(tid)])
+    
+    def _show_task(self, row, task):
         if self.expanded:
             icons = {"high": "🔴", "med": "🟡", "low": "🟢"}
-            tk.Label(row, text=icons.get(task.get("priority", "low"), "●"),
-                    bg=self.theme["entry"], font=("Segoe UI", 9)).pack(side="left", padx=2)
-        
-        var = tk.BooleanVar(value=task.get("done", False))
-        tk.Checkbutton(row, variable=var, bg=self.theme["entry"],
-                      command=lambda: self.toggle(idx, var.get())).pack(side="left")
+            row["pri"].config(text=icons.get(task.get("priority", "low"), "●"))
         
+        row["var"].set(task.get("done", False))
         fg = self.theme["text_light"] if task.get("done") else self.theme["text"]
         font = ("Segoe UI", 9, "overstrike") if task.get("done") else FONTS["small"]
-        tk.Label(row, text=task.get("text", "")[:25], bg=self.theme["entry"],
-                fg=fg, font=font, anchor="w").pack(side="left", fill="x", expand=True, padx=3)
         
-        del_btn = tk.Label(row, text="✕", bg=self.theme["entry"], fg="#E74C3C",
-                          font=FONTS["tiny"], cursor="hand2")
-        del_btn.pack(side="right", padx=2)
-        del_btn.bind("<Button-1>", lambda e: self.delete(idx))
+        # ⚠ overdue, 📅 due today, ⏰ has a reminder
+        mark, due = "", task.get("due")
+        if due and not task.get("done"):
+            if due < self.due_day:
+                mark, fg = "⚠ ", "#E74C3C"
+            elif due == self.due_day:
+                mark = "📅 "
+        if task.get("remind") and not task.get("done"):
+            mark += "⏰ "
+        row["label"].config(text=(mark + task.get("text", ""))[:25], fg=fg, font=font)
     
     def add_task(self, e=None):
         text = self.entry.get().strip()
         if text:
-            if "todos" not in self.app.data:
-                self.app.data["todos"] = []
-            self.app.data["todos"].append({
-                "text": text, "done": False,
-                "priority": self.priority.get() if self.expanded else "low"
-            })
-            self.app.save()
+            task = {"text": text, "done": False, "priority": self.priority.get() if self.expanded else "low"}
+            if self.expanded:
+                try:
+                    task.update(parse_due(self.due_entry.get(), self.remind_entry.get()))
+                except ValueError:
+                    # Leave everything typed in place to be fixed
+                    self.due_entry.config(bg="#FADBD8")
+                    return
+                self.due_entry.config(bg=self.theme["entry"])
+                self.due_entry.delete(0, "end")
+                self.remind_entry.delete(0, "end")
+            
+            tid = self.next_id
+            self.next_id += 1
+            self.app.append(["todos"], dict(task, id=tid))
             self.entry.delete(0, "end")
-            self.load()
+            
+            self.order.append(tid)
+            self.states["active"].append(tid)
+            if task.get("due"):
+                self.index_due()
+            shown = self.shown
+            if shown and shown[-1] == tid:
+                self.scroll.set_count(len(shown), len(shown) - 1)
+            self.update_stats()
     
-    def toggle(self, idx, done):
-        if idx < len(self.app.data.get("todos", [])):
-            self.app.data["todos"][idx]["done"] = done
-            self.app.save()
-            self.load()
+    def toggle(self, tid, done):
+        pos = self._pos(tid)
+        if pos is None:
+            return
+        task = self.app.data["todos"][pos]
+        if bool(task.get("done")) == done:
+            return
+        self.app.put(["todos", pos, "done"], done)
+        
+        shown = self.shown
+        first = bisect_left(shown, tid)
+        src, dst = ("active", "done") if done else ("done", "active")
+        self.states[src].remove(tid)
+        insort(self.states[dst], tid)
+        if task.get("due"):
+            self.index_due()
+        
+        if shown is self.order:
+            # Same rows, only this one changes look
+            if tid in self.rows:
+                self._show_task(self.rows[tid], task)
+        else:
+            self.scroll.set_count(len(self.shown), first)
+        self.update_stats()
     
-    def delete(self, idx):
-        if idx < len(self.app.data.get("todos", [])):
-            del self.app.data["todos"][idx]
-            self.app.save()
-            self.load()
+    def delete(self, tid):
+        pos = self._pos(tid)
+        if pos is None:
+            return
+        task = self.app.data["todos"][pos]
+        self.app.delete(["todos", pos])
+        
+        shown = self.shown
+        first = bisect_left(shown, tid)
+        visible = first < len(shown) and shown[first] == tid
+        del self.order[pos]
+        self.states["done" if task.get("done") else "active"].remove(tid)
+        if task.get("due"):
+            self.index_due()
+        self.rows.pop(tid, None)
+        if visible:
+            self.scroll.set_count(len(self.shown), first)
+        self.update_stats()
+    
+    def _task_menu(self, e, tid):
+        """Right-click on a task: set or clear its due date and reminder"""
+        pos = self._pos(tid)
+        if pos is None:
+            return
+        task = self.app.data["todos"][pos]
+        now = datetime.now()
+        today = now.date()
+        menu = tk.Menu(self.win, tearoff=0, font=FONTS["small"])
+        for label, days in (("📅 Due today", 0), ("📅 Due tomorrow", 1), ("📅 Due in a week", 7)):
+            menu.add_command(label=label, command=lambda d=days: self.set_field(tid, "due", (today + timedelta(days=d)).isoformat()))
+        if task.get("due"):
+            menu.add_command(label=f"No due date ({task['due']})", command=lambda: self.set_field(tid, "due", None))
+        
+        menu.add_separator()
+        menu.add_command(label="⏰ Remind in 1 hour", command=lambda: self.set_field(tid, "remind", minute_key(now + timedelta(hours=1))))
+        if task.get("due") and task["due"] >= today.isoformat():
+            menu.add_command(label=f"⏰ Remind on the due day at {REMINDER_DUE_TIME}",
+                             command=lambda: self.set_field(tid, "remind", f"{task['due']}T{REMINDER_DUE_TIME}"))
+        menu.add_command(label=f"⏰ Remind tomorrow at {REMINDER_DUE_TIME}",
+                         command=lambda: self.set_field(tid, "remind", f"{today + timedelta(days=1)}T{REMINDER_DUE_TIME}"))
+        if task.get("remind"):
+            menu.add_command(label=f"No reminder ({task['remind'].replace('T', ' ')})",
+                             command=lambda: self.set_field(tid, "remind", None))
+        menu.tk_popup(e.x_root, e.y_root)
+    
+    def set_field(self, tid, field, value):
+        """Set or (value None) remove a task's due date or reminder"""
+        pos = self._pos(tid)
+        if pos is None:
+            return
+        if value is None:
+            self.app.delete(["todos", pos, field])
+        else:
+            self.app.put(["todos", pos, field], value)
+        if field == "due":
+            self.index_due()
+        self.scroll.set_count(len(self.shown))
+    
+    def _on_hour(self, now):
+        # Yesterday's "today" tasks are overdue now
+        if now.date().isoformat() != self.due_day:
+            self.index_due()
+            self.scroll.set_count(len(self.shown))
     
     def on_mode_change(self):
         self.load()
     
+    def reveal(self, pos):
+        if pos < len(self.order):
+            self.filter.set("all")
+            self.load()
+            self.scroll.see(pos)
+    
     def apply_theme(self):
         super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
-        self.load()
+        self.scroll.set_count(len(self.shown))
 
 
 # ============== DAY PLANNER ==============
 class DayPlannerWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "📆 Day", "day_planner", app)
-        self.date = datetime.now().strftime("%Y-%m-%d")
+        self.day = datetime.now().date()
+        self.date = self.day.isoformat()
         self.entries = {}
+        self.pages = PageCache(self, self._build_page, self._neighbours)
         self.build()
+        app.ticks.subscribe(lambda now: self.load_data(), "hour", self)
+        app.subscribe(self._on_change)
     
     def build(self):
         # Nav
-        nav = tk.Frame(self.content, bg=self.theme["bg"])
+        nav = self.ui(tk.Frame, self.content, bg="bg")
         nav.pack(fill="x", pady=3)
         
-        tk.Button(nav, text="◀", command=self.prev_d, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
+        self.ui(tk.Button, nav, text="◀", command=self.prev_d, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
         
-        self.date_lbl = tk.Label(nav, bg=self.theme["bg"], fg=self.theme["text"], font=FONTS["small"])
+        self.date_lbl = self.ui(tk.Label, nav, bg="bg", fg="text", font=FONTS["small"])
         self.date_lbl.pack(side="left", fill="x", expand=True)
         
-        self.today_btn = tk.Button(nav, text="Today", command=self.go_today, bg=self.theme["accent"],
-                                   fg="white", font=FONTS["tiny"], bd=0, padx=4, cursor="hand2")
+        self.today_btn = self.ui(tk.Button, nav, text="Today", command=self.go_today, bg="accent",
+                                             fg="white", font=FONTS["tiny"], bd=0, padx=4, cursor="hand2")
+        
+        self.ui(tk.Button, nav, text="▶", command=self.next_d, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
         
-        tk.Button(nav, text="▶", command=self.next_d, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
+        # Recurring and all-day events - packed by load_data() when there are any
+        self.allday_lbl = self.ui(tk.Label, self.content, bg="bg", fg="accent", font=FONTS["tiny"],
+                                  anchor="w", justify="left")
         
         # Time slots scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
         self.scroll.pack(fill="both", expand=True)
         
-        # Create time slots
-        start_h = 6 if not self.expanded else 5
-        end_h = 22 if not self.expanded else 24
-        
-        for h in range(start_h, end_h):
-            row = tk.Frame(self.scroll.inner, bg=self.theme["bg"])
-            row.pack(fill="x", pady=1)
+        # Create time slots - 06-21, plus 05, 22 and 23 when expanded
+        for h in range(5, 24):
+            row = self.ui(tk.Frame, self.scroll.inner, bg="bg")
+            if 6 <= h < 22:
+                row.pack(fill="x", pady=1)
             
-            lbl = tk.Label(row, text=f"{h:02d}", bg=self.theme["header"],
-                          fg=self.theme["text"], font=FONTS["tiny"], width=3)
+            lbl = self.ui(tk.Label, row, text=f"{h:02d}", bg="header",
+                                    fg="text", font=FONTS["tiny"], width=3)
             lbl.pack(side="left", padx=(0, 2))
+            lbl.bind("<Button-3>", lambda e, hr=h: self._hour_menu(e, hr))
+            
+            # Timed events in this hour - packed by load_data() when there are any
+            timed = self.ui(tk.Label, row, bg="bg", fg="accent", font=FONTS["tiny"], anchor="e")
             
-            entry = tk.Entry(row, bg=self.theme["entry"], fg=self.theme["text"],
-                           font=FONTS["tiny"], bd=1, relief="solid")
+            entry = self.ui(tk.Entry, row, bg="entry", fg="text",
+                                     font=FONTS["tiny"], bd=1, relief="solid")
             entry.pack(side="left", fill="x", expand=True)
-            entry.bind("<KeyRelease>", lambda e, hr=h: self.save_slot(hr))
+            self.bind_editor(entry, lambda hr=h: self.save_slot(hr))
             
-            self.entries[h] = {"entry": entry, "label": lbl}
+            self.entries[h] = {"row": row, "entry": entry, "label": lbl, "timed": timed}
+        
+        self.layout.show(self.today_btn, "expanded", side="right", padx=2)
+        self.layout.show(self.entries[5]["row"], "expanded", fill="x", pady=1, before=self.entries[6]["row"])
+        for h in (22, 23):
+            self.layout.show(self.entries[h]["row"], "expanded", fill="x", pady=1, after=self.entries[h - 1]["row"])
+        self.layout.apply(self.size)
         
         self.load_data()
     
+    def _build_page(self, key):
+        self.app.fetch("day_planner", key)
+        day = datetime.strptime(key, "%Y-%m-%d")
+        page = {
+            "long": day.strftime("%A, %b %d"),
+            "short": day.strftime("%b %d"),
+            "slots": dict(self.app.data.get("day_planner", {}).get(key, {})),
+            "allday": [f"🔁 {text}" for _, text in self.app.recurrences.on_day(day)],
+            "hours": {},
+            "alarms": {int(k[11:]) for k in self.app.data.get("slot_reminders", {}) if k[:10] == key},
+            "deps": {("day_planner", key), ("recurring", None), ("timed", None), ("slot_reminders", None)},
+        }
+        # Events covering the whole day go on top, the others next to the hours they overlap
+        for _, event in self.app.timed.by_day(day.date(), 1).get(day.date(), []):
+            if event["start"] <= f"{key}T00:00" and event["end"] >= f"{(day + timedelta(days=1)):%Y-%m-%d}T00:00":
+                page["allday"].append(timed_label(event, day.date()))
+                continue
+            for h in self.entries:
+                if event["start"] < f"{key}T{h + 1:02d}:00" and event["end"] > f"{key}T{h:02d}:00":
+                    page["hours"].setdefault(h, []).append(event["title"])
+        return page
+    
+    def _neighbours(self, key):
+        day = datetime.strptime(key, "%Y-%m-%d").date()
+        return [(day - timedelta(days=1)).isoformat(), (day + timedelta(days=1)).isoformat()]
+    
     def load_data(self):
-        data = self.app.data.get("day_planner", {}).get(self.date, {})
-        dt = datetime.strptime(self.date, "%Y-%m-%d")
+        self.commit_edits()
+        page = self.pages.get(self.date)
         
-        if self.expanded:
-            self.date_lbl.config(text=dt.strftime("%A, %b %d"))
-            self.today_btn.pack(side="right", padx=2)
+        self.date_lbl.config(text=page["long"] if self.expanded else page["short"])
+        if page["allday"]:
+            self.allday_lbl.config(text="\n".join(page["allday"]))
+            self.allday_lbl.pack(fill="x", before=self.scroll)
         else:
-            self.date_lbl.config(text=dt.strftime("%b %d"))
-            self.today_btn.pack_forget()
+            self.allday_lbl.pack_forget()
         
-        now_h = datetime.now().hour
-        is_today = self.date == datetime.now().strftime("%Y-%m-%d")
+        now = datetime.now()
+        now_h = now.hour
+        is_today = self.day == now.date()
         
         for h, w in self.entries.items():
-            w["entry"].delete(0, "end")
-            if str(h) in data:
-                w["entry"].insert(0, data[str(h)])
+            self.fill_editor(w["entry"], page["slots"].get(str(h), ""))
+            if h in page["hours"] or h in page["alarms"]:
+                marks = ("⏰ " if h in page["alarms"] else "") + (f"🕒 {', '.join(page['hours'][h])}" if h in page["hours"] else "")
+                w["timed"].config(text=marks.strip()[:16])
+                w["timed"].pack(side="right", padx=(2, 0), before=w["entry"])
+            else:
+                w["timed"].pack_forget()
             
             bg = self.theme["accent"] if (h == now_h and is_today) else self.theme["header"]
             fg = "white" if (h == now_h and is_today) else self.theme["text"]
             w["label"].config(bg=bg, fg=fg)
     
     def save_slot(self, h):
-        if "day_planner" not in self.app.data:
-            self.app.data["day_planner"] = {}
-        if self.date not in self.app.data["day_planner"]:
-            self.app.data["day_planner"][self.date] = {}
-        
         text = self.entries[h]["entry"].get()
         if text:
-            self.app.data["day_planner"][self.date][str(h)] = text
-        elif str(h) in self.app.data["day_planner"][self.date]:
-            del self.app.data["day_planner"][self.date][str(h)]
-        self.app.save()
+            self.app.put(["day_planner", self.date, str(h)], text)
+        else:
+            self.app.delete(["day_planner", self.date, str(h)])
     
-    def prev_d(self):
-        self.date = (datetime.strptime(self.date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    def _go(self, day):
+        self.commit_edits()
+        self.day = day
+        self.date = day.isoformat()
         self.load_data()
     
+    def prev_d(self):
+        self._go(self.day - timedelta(days=1))
+    
     def next_d(self):
-        self.date = (datetime.strptime(self.date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
-        self.load_data()
+        self._go(self.day + timedelta(days=1))
     
     def go_today(self):
-        self.date = datetime.now().strftime("%Y-%m-%d")
-        self.load_data()
+        self._go(datetime.now().date())
+    
+    def _hour_menu(self, e, h):
+        """Right-click on an hour: add a timed event there, or edit or delete one overlapping it"""
+        key = self.date
+        menu = tk.Menu(self.win, tearoff=0, font=FONTS["small"])
+        menu.add_command(label=f"🕒 Event at {h:02d}:00…", command=lambda: TimedEventDialog(self, f"{key}T{h:02d}:00"))
+        
+        # Slot reminders: data["slot_reminders"]["YYYY-MM-DDTHH"] = time to ring
+        slot = f"{key}T{h:02d}"
+        start = datetime.strptime(f"{key}T{h:02d}:00", "%Y-%m-%dT%H:%M")
+        menu.add_command(label=f"⏰ Remind at {h:02d}:00", command=lambda: self.app.put(["slot_reminders", slot], minute_key(start)))
+        menu.add_command(label="⏰ Remind 15 min before",
+                         command=lambda: self.app.put(["slot_reminders", slot], minute_key(start - timedelta(minutes=15))))
+        current = self.app.data.get("slot_reminders", {}).get(slot)
+        if current:
+            menu.add_command(label=f"No reminder ({current[11:]})", command=lambda: self.app.delete(["slot_reminders", slot]))
+        for eid, event in self.app.timed.overlapping(f"{key}T{h:02d}:00", f"{key}T{h + 1:02d}:00"):
+            name = event["title"][:20]
+            menu.add_separator()
+            menu.add_command(label=f"Edit “{name}”…", command=lambda eid=eid: TimedEventDialog(self, f"{key}T{h:02d}:00", eid))
+            menu.add_command(label=f"Delete “{name}”", command=lambda eid=eid: self.app.delete(["timed", eid]))
+        menu.tk_popup(e.x_root, e.y_root)
+    
+    def _on_change(self, op, path):
+        if path[0] in ("recurring", "timed", "slot_reminders"):
+            self.defer(self.load_data)
+    
+    def reveal(self, key, hour):
+        self._go(datetime.strptime(key, "%Y-%m-%d").date())
+        if int(hour) in self.entries:
+            self.entries[int(hour)]["entry"].focus_set()
     
     def on_mode_change(self):
         self.load_data()
     
     def apply_theme(self):
         super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
         self.load_data()
 
 
@@ -803,69 +3277,97 @@ class DayPlannerWidget(BaseWidget):
 class WeekPlannerWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "📋 Week", "week_planner", app)
-        self.week_start = datetime.now() - timedelta(days=datetime.now().weekday())
+        today = datetime.now().date()
+        self.week_start = today - timedelta(days=today.weekday())
+        self.week_key = self.week_start.isoformat()
         self.day_widgets = {}
+        self.pages = PageCache(self, self._build_page, self._neighbours)
         self.build()
+        app.subscribe(self._on_change)
     
     def build(self):
         # Nav
-        nav = tk.Frame(self.content, bg=self.theme["bg"])
+        nav = self.ui(tk.Frame, self.content, bg="bg")
         nav.pack(fill="x", pady=3)
         
-        tk.Button(nav, text="◀", command=self.prev_w, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
+        self.ui(tk.Button, nav, text="◀", command=self.prev_w, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
         
-        self.week_lbl = tk.Label(nav, bg=self.theme["bg"], fg=self.theme["text"], font=FONTS["small"])
+        self.week_lbl = self.ui(tk.Label, nav, bg="bg", fg="text", font=FONTS["small"])
         self.week_lbl.pack(side="left", fill="x", expand=True)
         
-        tk.Button(nav, text="▶", command=self.next_w, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
+        self.ui(tk.Button, nav, text="▶", command=self.next_w, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
         
         # Days scroll - HORIZONTAL
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
         self.scroll.pack(fill="both", expand=True)
         
         days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        col_w = 90 if self.expanded else 65
         
         for i, day in enumerate(days):
-            col = tk.Frame(self.scroll.inner, bg=self.theme["entry"], relief="solid", bd=1, width=col_w)
+            col = self.ui(tk.Frame, self.scroll.inner, bg="entry", relief="solid", bd=1)
             col.pack(side="left", fill="both", padx=1)
             col.pack_propagate(False)
             
             is_wknd = i >= 5
-            hdr = tk.Label(col, text=day[:2] if not self.expanded else day[:3],
-                          bg=self.theme["header"], fg="#E74C3C" if is_wknd else self.theme["text"],
-                          font=FONTS["tiny"], pady=2)
+            hdr = self.ui(tk.Label, col, bg="header", fg="#E74C3C" if is_wknd else self.theme["text"],
+                                    font=FONTS["tiny"], pady=2)
             hdr.pack(fill="x")
             
-            date_lbl = tk.Label(col, text="", bg=self.theme["header"],
-                               fg=self.theme["text_light"], font=FONTS["tiny"])
+            date_lbl = self.ui(tk.Label, col, text="", bg="header",
+                                         fg="text_light", font=FONTS["tiny"])
             date_lbl.pack(fill="x")
             
-            txt = tk.Text(col, bg=self.theme["entry"], fg=self.theme["text"],
-                         font=FONTS["tiny"], bd=0, wrap="word", width=10, height=8)
+            # Recurring and timed events - packed by load_data() when there are any
+            extra = self.ui(tk.Label, col, bg="entry", fg="accent", font=FONTS["tiny"],
+                                      anchor="w", justify="left", wraplength=60)
+            
+            txt = self.ui(tk.Text, col, bg="entry", fg="text",
+                                   font=FONTS["tiny"], bd=0, wrap="word", width=10, height=8)
             txt.pack(fill="both", expand=True, padx=2, pady=2)
-            txt.bind("<KeyRelease>", lambda e, idx=i: self.save_day(idx))
+            self.bind_editor(txt, lambda idx=i: self.save_day(idx))
             
-            self.day_widgets[i] = {"col": col, "header": hdr, "date": date_lbl, "text": txt}
+            # Column width and day names follow the size class
+            self.layout.config(col, width={"compact": 65, "expanded": 90, "wide": 120})
+            self.layout.config(hdr, text={"compact": day[:2], "expanded": day})
+            self.layout.config(extra, wraplength={"compact": 60, "expanded": 85, "wide": 115})
+            self.day_widgets[i] = {"col": col, "header": hdr, "date": date_lbl, "extra": extra, "text": txt}
         
+        self.layout.apply(self.size)
         self.load_data()
     
-    def load_data(self):
-        key = self.week_start.strftime("%Y-%m-%d")
+    def _build_page(self, key):
+        self.app.fetch("week_planner", key)
         data = self.app.data.get("week_planner", {}).get(key, {})
-        
-        end = self.week_start + timedelta(days=6)
-        self.week_lbl.config(text=f"{self.week_start.strftime('%b %d')} - {end.strftime('%b %d')}")
+        start = datetime.strptime(key, "%Y-%m-%d").date()
+        end = start + timedelta(days=6)
+        timed = self.app.timed.by_day(start, 7)
+        return {
+            "label": f"{start.strftime('%b %d')} - {end.strftime('%b %d')}",
+            "days": [(f"{(start + timedelta(days=i)).day:02d}", data.get(str(i), "")) for i in range(7)],
+            "extra": [[f"🔁 {text}" for _, text in self.app.recurrences.on_day(day)] +
+                      [timed_label(e, day) for _, e in timed.get(day, [])]
+                      for day in (start + timedelta(days=i) for i in range(7))],
+            "deps": {("week_planner", key), ("recurring", None), ("timed", None)},
+        }
+    
+    def _neighbours(self, key):
+        start = datetime.strptime(key, "%Y-%m-%d").date()
+        return [(start - timedelta(days=7)).isoformat(), (start + timedelta(days=7)).isoformat()]
+    
+    def load_data(self):
+        self.commit_edits()
+        page = self.pages.get(self.week_key)
+        self.week_lbl.config(text=page["label"])
         
         today = datetime.now().date()
         
         for i, w in self.day_widgets.items():
-            day_date = self.week_start + timedelta(days=i)
-            w["date"].config(text=day_date.strftime("%d"))
+            day_num, text = page["days"][i]
+            w["date"].config(text=day_num)
             
-            if day_date.date() == today:
+            if self.week_start + timedelta(days=i) == today:
                 w["header"].config(bg=self.theme["accent"], fg="white")
                 w["date"].config(bg=self.theme["accent"], fg="white")
             else:
@@ -873,68 +3375,44 @@ class WeekPlannerWidget(BaseWidget):
                 w["header"].config(bg=self.theme["header"], fg="#E74C3C" if is_wknd else self.theme["text"])
                 w["date"].config(bg=self.theme["header"], fg=self.theme["text_light"])
             
-            w["text"].delete("1.0", "end")
-            if str(i) in data:
-                w["text"].insert("1.0", data[str(i)])
+            if page["extra"][i]:
+                w["extra"].config(text="\n".join(page["extra"][i]))
+                w["extra"].pack(fill="x", padx=2, before=w["text"])
+            else:
+                w["extra"].pack_forget()
+            self.fill_editor(w["text"], text)
     
     def save_day(self, idx):
-        if "week_planner" not in self.app.data:
-            self.app.data["week_planner"] = {}
-        key = self.week_start.strftime("%Y-%m-%d")
-        if key not in self.app.data["week_planner"]:
-            self.app.data["week_planner"][key] = {}
-        
+        key = self.week_key
         text = self.day_widgets[idx]["text"].get("1.0", "end-1c")
         if text.strip():
-            self.app.data["week_planner"][key][str(idx)] = text
-        elif str(idx) in self.app.data["week_planner"][key]:
-            del self.app.data["week_planner"][key][str(idx)]
-        self.app.save()
+            self.app.put(["week_planner", key, str(idx)], text)
+        else:
+            self.app.delete(["week_planner", key, str(idx)])
     
-    def prev_w(self):
-        self.week_start -= timedelta(days=7)
+    def _go(self, week_start):
+        self.commit_edits()
+        self.week_start = week_start
+        self.week_key = week_start.isoformat()
         self.load_data()
     
+    def prev_w(self):
+        self._go(self.week_start - timedelta(days=7))
+    
     def next_w(self):
-        self.week_start += timedelta(days=7)
-        self.load_data()
+        self._go(self.week_start + timedelta(days=7))
     
-    def on_mode_change(self):
-        # Rebuild columns for new size
-        for w in self.scroll.inner.winfo_children():
-            w.destroy()
-        self.day_widgets = {}
-        
-        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        col_w = 90 if self.expanded else 65
-        
-        for i, day in enumerate(days):
-            col = tk.Frame(self.scroll.inner, bg=self.theme["entry"], relief="solid", bd=1, width=col_w)
-            col.pack(side="left", fill="both", padx=1)
-            col.pack_propagate(False)
-            
-            is_wknd = i >= 5
-            hdr = tk.Label(col, text=day[:2] if not self.expanded else day[:3],
-                          bg=self.theme["header"], fg="#E74C3C" if is_wknd else self.theme["text"],
-                          font=FONTS["tiny"], pady=2)
-            hdr.pack(fill="x")
-            
-            date_lbl = tk.Label(col, text="", bg=self.theme["header"],
-                               fg=self.theme["text_light"], font=FONTS["tiny"])
-            date_lbl.pack(fill="x")
-            
-            txt = tk.Text(col, bg=self.theme["entry"], fg=self.theme["text"],
-                         font=FONTS["tiny"], bd=0, wrap="word", width=10, height=8)
-            txt.pack(fill="both", expand=True, padx=2, pady=2)
-            txt.bind("<KeyRelease>", lambda e, idx=i: self.save_day(idx))
-            
-            self.day_widgets[i] = {"col": col, "header": hdr, "date": date_lbl, "text": txt}
-        
-        self.load_data()
+    def _on_change(self, op, path):
+        if path[0] in ("recurring", "timed"):
+            self.defer(self.load_data)
+    
+    def reveal(self, key, day):
+        self._go(datetime.strptime(key, "%Y-%m-%d").date())
+        if int(day) in self.day_widgets:
+            self.day_widgets[int(day)]["text"].focus_set()
     
     def apply_theme(self):
         super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
         self.load_data()
 
 
@@ -944,99 +3422,101 @@ class MonthlyPlannerWidget(BaseWidget):
         super().__init__(master, "🎯 Monthly", "monthly_planner", app)
         self.current = datetime.now()
         self.sections = {}
+        self.pages = PageCache(self, self._build_page, self._neighbours)
         self.build()
     
     def build(self):
         # Nav
-        nav = tk.Frame(self.content, bg=self.theme["bg"])
+        nav = self.ui(tk.Frame, self.content, bg="bg")
         nav.pack(fill="x", pady=3)
         
-        tk.Button(nav, text="◀", command=self.prev_m, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
+        self.ui(tk.Button, nav, text="◀", command=self.prev_m, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
         
-        self.month_lbl = tk.Label(nav, bg=self.theme["bg"], fg=self.theme["text"], font=FONTS["small"])
+        self.month_lbl = self.ui(tk.Label, nav, bg="bg", fg="text", font=FONTS["small"])
         self.month_lbl.pack(side="left", fill="x", expand=True)
         
-        tk.Button(nav, text="▶", command=self.next_m, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
+        self.ui(tk.Button, nav, text="▶", command=self.next_m, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
         
         # Sections scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
         self.scroll.pack(fill="both", expand=True)
         
-        self.render_sections()
-    
-    def render_sections(self):
-        for w in self.scroll.inner.winfo_children():
-            w.destroy()
-        self.sections = {}
-        
-        # Different sections based on mode
-        if self.expanded:
-            secs = [("🎯 Goals", "goals", "#4CAF50"), ("📝 Tasks", "tasks", "#2196F3"),
-                    ("💡 Ideas", "ideas", "#FF9800"), ("📊 Review", "review", "#9C27B0")]
-        else:
-            secs = [("🎯 Goals", "goals", "#4CAF50"), ("📝 Tasks", "tasks", "#2196F3")]
+        # Sections - Ideas and Review only when expanded
+        secs = [("🎯 Goals", "goals", "#4CAF50", "compact"), ("📝 Tasks", "tasks", "#2196F3", "compact"),
+                ("💡 Ideas", "ideas", "#FF9800", "expanded"), ("📊 Review", "review", "#9C27B0", "expanded")]
         
-        for title, key, color in secs:
-            frame = tk.Frame(self.scroll.inner, bg=self.theme["entry"], relief="solid", bd=1)
-            frame.pack(fill="x", pady=2)
+        for title, key, color, smallest in secs:
+            frame = self.ui(tk.Frame, self.scroll.inner, bg="entry", relief="solid", bd=1)
             
             hdr = tk.Label(frame, text=title, bg=color, fg="white",
                           font=FONTS["tiny"], anchor="w", padx=6, pady=3)
             hdr.pack(fill="x")
             
-            height = 3 if self.expanded else 2
-            txt = tk.Text(frame, height=height, bg=self.theme["entry"], fg=self.theme["text"],
-                         font=FONTS["tiny"], bd=0, wrap="word", padx=4, pady=2)
+            txt = self.ui(tk.Text, frame, bg="entry", fg="text",
+                                   font=FONTS["tiny"], bd=0, wrap="word", padx=4, pady=2)
             txt.pack(fill="x")
-            txt.bind("<KeyRelease>", lambda e, k=key: self.save_sec(k))
+            self.bind_editor(txt, lambda k=key: self.save_sec(k))
             
-            self.sections[key] = {"text": txt}
+            self.layout.show(frame, smallest, fill="x", pady=2)
+            self.layout.config(txt, height={"compact": 2, "expanded": 3})
+            self.sections[key] = {"frame": frame, "text": txt}
         
+        self.layout.apply(self.size)
         self.load_data()
     
+    @property
+    def month_key(self):
+        return f"{self.current.year}-{self.current.month:02d}"
+    
+    def _build_page(self, key):
+        self.app.fetch("monthly", key)
+        year, month = int(key[:4]), int(key[5:7])
+        return {
+            "label": f"{calendar.month_abbr[month]} {year}",
+            "sections": dict(self.app.data.get("monthly", {}).get(key, {})),
+            "deps": {("monthly", key)},
+        }
+    
+    def _neighbours(self, key):
+        year, month = int(key[:4]), int(key[5:7])
+        return ["%d-%02d" % add_months(year, month, n) for n in (-1, 1)]
+    
     def load_data(self):
-        key = self.current.strftime("%Y-%m")
-        data = self.app.data.get("monthly", {}).get(key, {})
-        
-        self.month_lbl.config(text=f"{calendar.month_abbr[self.current.month]} {self.current.year}")
+        self.commit_edits()
+        page = self.pages.get(self.month_key)
+        self.month_lbl.config(text=page["label"])
         
         for k, w in self.sections.items():
-            w["text"].delete("1.0", "end")
-            if k in data:
-                w["text"].insert("1.0", data[k])
+            self.fill_editor(w["text"], page["sections"].get(k, ""))
     
     def save_sec(self, key):
-        if "monthly" not in self.app.data:
-            self.app.data["monthly"] = {}
-        mkey = self.current.strftime("%Y-%m")
-        if mkey not in self.app.data["monthly"]:
-            self.app.data["monthly"][mkey] = {}
-        
+        mkey = self.month_key
         text = self.sections[key]["text"].get("1.0", "end-1c")
         if text.strip():
-            self.app.data["monthly"][mkey][key] = text
-        elif key in self.app.data["monthly"][mkey]:
-            del self.app.data["monthly"][mkey][key]
-        self.app.save()
+            self.app.put(["monthly", mkey, key], text)
+        else:
+            self.app.delete(["monthly", mkey, key])
     
     def prev_m(self):
+        self.commit_edits()
         self.current = self.current.replace(day=1) - timedelta(days=1)
         self.load_data()
     
     def next_m(self):
+        self.commit_edits()
         self.current = self.current.replace(day=28) + timedelta(days=4)
         self.current = self.current.replace(day=1)
         self.load_data()
     
-    def on_mode_change(self):
-        self.render_sections()
-    
-    def apply_theme(self):
-        super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
-        self.render_sections()
+    def reveal(self, key, section):
+        self.commit_edits()
+        self.current = datetime.strptime(key, "%Y-%m")
+        self.load_data()
+        # Ideas and Review are only shown when expanded
+        if section in self.sections and self.sections[section]["frame"].winfo_ismapped():
+            self.sections[section]["text"].focus_set()
 
 
 # ============== STICKY NOTES ==============
@@ -1048,181 +3528,301 @@ class StickyNotesWidget(BaseWidget):
     
     def build(self):
         # Add buttons
-        add = tk.Frame(self.content, bg=self.theme["bg"])
+        add = self.ui(tk.Frame, self.content, bg="bg")
         add.pack(fill="x", pady=3)
         
-        tk.Label(add, text="Add:", bg=self.theme["bg"], fg=self.theme["text"],
-                font=FONTS["tiny"]).pack(side="left", padx=2)
+        self.ui(tk.Label, add, text="Add:", bg="bg", fg="text",
+                          font=FONTS["tiny"]).pack(side="left", padx=2)
         
-        for c in self.colors[:4] if not self.expanded else self.colors:
-            tk.Button(add, text=" ", bg=c, bd=1, width=2,
-                     command=lambda col=c: self.add_note(col), cursor="hand2").pack(side="left", padx=1)
+        # Four colors in compact mode, all of them when expanded
+        for i, c in enumerate(self.colors):
+            btn = tk.Button(add, text=" ", bg=c, bd=1, width=2,
+                           command=lambda col=c: self.add_note(col), cursor="hand2")
+            self.layout.show(btn, "compact" if i < 4 else "expanded", side="left", padx=1)
+        self.layout.apply(self.size)
         
         # Notes scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
         self.scroll.pack(fill="both", expand=True)
-        self.notes_fr = self.scroll.inner
         
         self.load()
     
     def load(self):
-        for w in self.notes_fr.winfo_children():
-            w.destroy()
-        
         notes = self.app.data.get("notes", [])
-        cols = 2 if self.expanded else 1
-        note_w = 120 if self.expanded else 200
-        note_h = 80 if self.expanded else 60
-        
-        row, col = 0, 0
-        for i, note in enumerate(notes):
-            self._note(i, note, row, col, note_w, note_h)
-            col += 1
-            if col >= cols:
-                col = 0
-                row += 1
-    
-    def _note(self, idx, note, row, col, w, h):
-        color = note.get("color", "#FFFFA5")
-        
-        frame = tk.Frame(self.notes_fr, bg=color, relief="raised", bd=1, width=w, height=h)
-        frame.grid(row=row, column=col, padx=2, pady=2, sticky="nsew")
-        frame.grid_propagate(False)
+        cols = by_size(self.size, compact=1, expanded=2, wide=3)
+        note_w = by_size(self.size, compact=200, expanded=120)
+        note_h = by_size(self.size, compact=60, expanded=80)
         
-        del_btn = tk.Label(frame, text="✕", bg=color, fg="#666", font=FONTS["tiny"], cursor="hand2")
-        del_btn.pack(anchor="ne", padx=1)
-        del_btn.bind("<Button-1>", lambda e: self.delete_note(idx))
+        self.scroll.set_rows(len(notes), note_h + 4, self._make_note, self._fill_note, cols, note_w + 4)
+    
+    def _make_note(self, parent):
+        outer = self.ui(tk.Frame, parent, bg="bg")
+        frame = tk.Frame(outer, relief="raised", bd=1)
+        frame.pack(fill="both", expand=True, padx=2, pady=2)
+        frame.pack_propagate(False)
+        row = {"frame": outer, "note": frame, "idx": 0}
+        
+        row["del"] = tk.Label(frame, text="✕", fg="#666", font=FONTS["tiny"], cursor="hand2")
+        row["del"].pack(anchor="ne", padx=1)
+        row["del"].bind("<Button-1>", lambda e: self.delete_note(row["idx"]))
+        
+        row["text"] = tk.Text(frame, height=3, fg="#333", font=FONTS["tiny"], bd=0, wrap="word")
+        row["text"].pack(fill="both", expand=True, padx=3, pady=1)
+        self.bind_editor(row["text"], lambda: self.save_note(row["idx"], row["text"]))
+        return row
+    
+    def _fill_note(self, row, idx):
+        # A recycled row may still hold an edit of the note it showed before
+        self.commit_edits(row["text"])
+        note = self.app.data["notes"][idx]
+        color = note.get("color", "#FFFFA5")
+        row["idx"] = idx
+        for w in (row["note"], row["del"], row["text"]):
+            w.config(bg=color)
         
-        txt = tk.Text(frame, height=3, bg=color, fg="#333", font=FONTS["tiny"], bd=0, wrap="word")
-        txt.pack(fill="both", expand=True, padx=3, pady=1)
-        txt.insert("1.0", note.get("text", ""))
-        txt.bind("<KeyRelease>", lambda e, i=idx, t=txt: self.save_note(i, t))
+        self.fill_editor(row["text"], note.get("text", ""))
     
     def add_note(self, color):
-        if "notes" not in self.app.data:
-            self.app.data["notes"] = []
-        self.app.data["notes"].append({"text": "", "color": color})
-        self.app.save()
+        self.app.append(["notes"], {"text": "", "color": color})
         self.load()
     
     def save_note(self, idx, txt):
         if idx < len(self.app.data.get("notes", [])):
-            self.app.data["notes"][idx]["text"] = txt.get("1.0", "end-1c")
-            self.app.save()
+            self.app.put(["notes", idx, "text"], txt.get("1.0", "end-1c"))
     
     def delete_note(self, idx):
+        self.commit_edits()     # indexes shift below idx
         if idx < len(self.app.data.get("notes", [])):
-            del self.app.data["notes"][idx]
-            self.app.save()
+            self.app.delete(["notes", idx])
             self.load()
     
-    def on_mode_change(self):
-        self.load()
+    def reveal(self, idx):
+        if idx < len(self.app.data.get("notes", [])):
+            self.scroll.see(idx)
+            row = self.scroll.rows.get(idx)
+            if row:
+                row["text"].focus_set()
     
-    def apply_theme(self):
-        super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
+    def on_mode_change(self):
         self.load()
 
 
 # ============== POMODORO ==============
+def focus_periods(day):
+    """Rollup keys a day counts towards: ISO week, month and year"""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}", f"{day.year}-{day.month:02d}", str(day.year)
+
+
+class DeadlineTimer:
+    """Countdown measured against a monotonic deadline. Redraws only read it, so a stalled
+    Tk loop delays the display but never the time. clock and wall are injectable for tests"""
+    
+    def __init__(self, duration, clock=time.monotonic, wall=time.time):
+        self.clock = clock
+        self.wall = wall
+        self.duration = duration
+        self.left = duration     # seconds left while paused
+        self.deadline = None     # clock() time the phase ends while running
+    
+    @property
+    def running(self):
+        return self.deadline is not None
+    
+    def start(self):
+        if self.deadline is None:
+            self.deadline = self.clock() + self.left
+    
+    def pause(self):
+        if self.deadline is not None:
+            self.left = max(0.0, self.deadline - self.clock())
+            self.deadline = None
+    
+    def reset(self, duration):
+        self.duration = duration
+        self.left = duration
+        self.deadline = None
+    
+    def remaining(self):
+        if self.deadline is None:
+            return self.left
+        return max(0.0, self.deadline - self.clock())
+    
+    def elapsed(self):
+        return self.duration - self.remaining()
+    
+    def overdue(self):
+        """Seconds since the deadline passed (a stall or sleep ran past it)"""
+        if self.deadline is None:
+            return 0.0
+        return max(0.0, self.clock() - self.deadline)
+    
+    def ends_at(self):
+        """Wall-clock time the running phase ends, or ended if it is overdue"""
+        if self.deadline is None:
+            return None
+        return self.wall() + self.deadline - self.clock()
+    
+    def next_tick(self):
+        """Milliseconds until the shown whole second changes"""
+        frac = self.remaining() % 1
+        return int((frac or 1) * 1000) + 1
+    
+    def state(self):
+        """Persistable state - a wall-clock end time because monotonic clocks restart with the machine"""
+        return {"duration": self.duration, "left": self.remaining(), "ends_at": self.ends_at()}
+    
+    @classmethod
+    def restore(cls, state, clock=time.monotonic, wall=time.time):
+        timer = cls(state.get("duration", 25 * 60), clock, wall)
+        if state.get("ends_at") is not None:
+            # Deadline may already be past: overdue() then counts from the saved end, not from now
+            timer.deadline = clock() + state["ends_at"] - wall()
+            timer.left = max(0.0, state["ends_at"] - wall())
+        else:
+            timer.left = state.get("left", timer.duration)
+        return timer
+
+
 class PomodoroWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "🍅 Pomodoro", "pomodoro", app)
         self.work = 25 * 60
         self.brk = 5 * 60
         self.long_brk = 15 * 60
-        self.time = self.work
-        self.running = False
+        self.timer = DeadlineTimer(self.work)
         self.is_work = True
         self.sessions = 0
+        self.kind = "w"            # phase for the session log: work, break or long break
+        self.phase_start = None
+        self.credited = 0          # whole seconds of this work phase already added to the stats
+        self.build_rollups()
+        self.restore_state()
         self.build()
+        if self.running:
+            self.start_btn.config(text="⏸", bg="#FF9800")
+            self._start_ticks()
     
     def build(self):
         # Timer
-        self.timer_lbl = tk.Label(self.content, text="25:00", bg=self.theme["bg"],
-                                  fg=self.theme["accent"], font=FONTS["timer"])
+        self.timer_lbl = self.ui(tk.Label, self.content, text="25:00", bg="bg",
+                                            fg="accent", font=FONTS["timer"])
         self.timer_lbl.pack(pady=8)
         
         # Status
-        self.status_lbl = tk.Label(self.content, text="🍅 Work", bg=self.theme["bg"],
-                                   fg=self.theme["text"], font=FONTS["small"])
+        self.status_lbl = self.ui(tk.Label, self.content, text="🍅 Work", bg="bg",
+                                             fg="text", font=FONTS["small"])
         self.status_lbl.pack()
         
         # Sessions (compact)
-        self.sess_lbl = tk.Label(self.content, text="", bg=self.theme["bg"],
-                                 fg=self.theme["text_light"], font=FONTS["tiny"])
+        self.sess_lbl = self.ui(tk.Label, self.content, text="", bg="bg",
+                                           fg="text_light", font=FONTS["tiny"])
         self.sess_lbl.pack(pady=2)
         
         # Controls
-        ctrl = tk.Frame(self.content, bg=self.theme["bg"])
+        ctrl = self.ui(tk.Frame, self.content, bg="bg")
         ctrl.pack(pady=8)
         
-        self.start_btn = tk.Button(ctrl, text="▶", command=self.toggle, bg=self.theme["accent"],
-                                   fg="white", font=FONTS["small"], bd=0, padx=12, cursor="hand2")
+        self.start_btn = self.ui(tk.Button, ctrl, text="▶", command=self.toggle, bg="accent",
+                                             fg="white", font=FONTS["small"], bd=0, padx=12, cursor="hand2")
         self.start_btn.pack(side="left", padx=3)
         
-        tk.Button(ctrl, text="↺", command=self.reset, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["small"], bd=0, padx=12, cursor="hand2").pack(side="left", padx=3)
+        self.ui(tk.Button, ctrl, text="↺", command=self.reset, bg="button",
+                           fg="text", font=FONTS["small"], bd=0, padx=12, cursor="hand2").pack(side="left", padx=3)
         
-        tk.Button(ctrl, text="⏭", command=self.skip, bg=self.theme["button"],
-                 fg=self.theme["text"], font=FONTS["small"], bd=0, padx=12, cursor="hand2").pack(side="left", padx=3)
+        self.ui(tk.Button, ctrl, text="⏭", command=self.skip, bg="button",
+                           fg="text", font=FONTS["small"], bd=0, padx=12, cursor="hand2").pack(side="left", padx=3)
         
         # Settings frame (expanded only)
-        self.settings_fr = tk.LabelFrame(self.content, text="⚙️ Settings", bg=self.theme["bg"],
-                                         fg=self.theme["text"], font=FONTS["tiny"])
+        self.settings_fr = self.ui(tk.LabelFrame, self.content, text="⚙️ Settings", bg="bg",
+                                                   fg="text", font=FONTS["tiny"])
         
         # Stats frame (expanded only)
-        self.stats_fr = tk.LabelFrame(self.content, text="📊 Focus Stats", bg=self.theme["bg"],
-                                      fg=self.theme["text"], font=FONTS["tiny"])
+        self.stats_fr = self.ui(tk.LabelFrame, self.content, text="📊 Focus Stats", bg="bg",
+                                                fg="text", font=FONTS["tiny"])
+        
+        for txt, attr in [("Work:", "work"), ("Break:", "brk"), ("Long:", "long_brk")]:
+            row = self.ui(tk.Frame, self.settings_fr, bg="bg")
+            row.pack(fill="x", padx=5, pady=1)
+            self.ui(tk.Label, row, text=txt, bg="bg", fg="text",
+                              font=FONTS["tiny"], width=5).pack(side="left")
+            spin = tk.Spinbox(row, from_=1, to=60, width=4, font=FONTS["tiny"])
+            spin.pack(side="left")
+            spin.delete(0, "end")
+            spin.insert(0, str(getattr(self, attr) // 60))
+            setattr(self, f"{attr}_spin", spin)
         
         self.stats_labels = {}
+        self.chart_range = tk.StringVar(value="day")
+        
+        for txt, key in [("Today:", "today"), ("Week:", "week"), ("Month:", "month")]:
+            row = self.ui(tk.Frame, self.stats_fr, bg="bg")
+            row.pack(fill="x", padx=5, pady=1)
+            self.ui(tk.Label, row, text=txt, bg="bg", fg="text",
+                              font=FONTS["tiny"], width=6).pack(side="left")
+            lbl = self.ui(tk.Label, row, text="0m", bg="bg", fg="accent",
+                                    font=FONTS["tiny"])
+            lbl.pack(side="left")
+            self.stats_labels[key] = lbl
+        
+        # History chart
+        bar = self.ui(tk.Frame, self.stats_fr, bg="bg")
+        bar.pack(fill="x", padx=5, pady=(4, 1))
+        for txt, val in [("D", "day"), ("W", "week"), ("M", "month"), ("Y", "year")]:
+            self.ui(tk.Radiobutton, bar, text=txt, variable=self.chart_range, value=val,
+                                    bg="button", fg="text", font=FONTS["tiny"],
+                                    indicatoron=False, selectcolor="accent",
+                                    command=self.draw_chart, padx=4).pack(side="left", padx=1)
+        self.ui(tk.Button, bar, text="⤓ CSV", command=self.export_csv, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=4, cursor="hand2").pack(side="right")
+        
+        self.chart = self.ui(tk.Canvas, self.stats_fr, bg="bg", height=70, highlightthickness=0)
+        self.chart.pack(fill="x", padx=5, pady=(0, 4))
+        self.chart.bind("<Configure>", lambda e: self.defer(self.draw_chart))
+        
+        self.layout.show(self.settings_fr, "expanded", fill="x", pady=5, padx=5)
+        self.layout.show(self.stats_fr, "expanded", fill="x", pady=5, padx=5)
+        self.layout.apply(self.size)
         
         self.update_display()
         self.on_mode_change()
     
     def on_mode_change(self):
+        # Stats aren't kept current while hidden
         if self.expanded:
-            # Show settings
-            self.settings_fr.pack(fill="x", pady=5, padx=5)
-            for w in self.settings_fr.winfo_children():
-                w.destroy()
-            
-            for txt, attr, default in [("Work:", "work", 25), ("Break:", "brk", 5), ("Long:", "long_brk", 15)]:
-                row = tk.Frame(self.settings_fr, bg=self.theme["bg"])
-                row.pack(fill="x", padx=5, pady=1)
-                tk.Label(row, text=txt, bg=self.theme["bg"], fg=self.theme["text"],
-                        font=FONTS["tiny"], width=5).pack(side="left")
-                spin = tk.Spinbox(row, from_=1, to=60, width=4, font=FONTS["tiny"])
-                spin.pack(side="left")
-                spin.delete(0, "end")
-                spin.insert(0, str(default))
-                setattr(self, f"{attr}_spin", spin)
-            
-            # Show stats
-            self.stats_fr.pack(fill="x", pady=5, padx=5)
-            for w in self.stats_fr.winfo_children():
-                w.destroy()
-            
-            for txt, key in [("Today:", "today"), ("Week:", "week"), ("Month:", "month")]:
-                row = tk.Frame(self.stats_fr, bg=self.theme["bg"])
-                row.pack(fill="x", padx=5, pady=1)
-                tk.Label(row, text=txt, bg=self.theme["bg"], fg=self.theme["text"],
-                        font=FONTS["tiny"], width=6).pack(side="left")
-                lbl = tk.Label(row, text="0m", bg=self.theme["bg"], fg=self.theme["accent"],
-                              font=FONTS["tiny"])
-                lbl.pack(side="left")
-                self.stats_labels[key] = lbl
-            
             self.update_stats()
-        else:
-            self.settings_fr.pack_forget()
-            self.stats_fr.pack_forget()
+    
+    @property
+    def running(self):
+        return self.timer.running
+    
+    def restore_state(self):
+        """Pick up a session saved by a previous run - a running timer keeps its deadline"""
+        state = self.app.data.get("pomo_timer")
+        if not state:
+            return
+        self.work = state.get("work", self.work)
+        self.brk = state.get("brk", self.brk)
+        self.long_brk = state.get("long_brk", self.long_brk)
+        self.is_work = state.get("is_work", True)
+        self.kind = state.get("kind", "w")
+        self.sessions = state.get("sessions", 0)
+        self.phase_start = state.get("phase_start")
+        self.credited = state.get("credited", 0)
+        self.timer = DeadlineTimer.restore(state)
+    
+    def save_state(self):
+        self.app.put(["pomo_timer"], dict(self.timer.state(), work=self.work, brk=self.brk, long_brk=self.long_brk,
+                                          is_work=self.is_work, kind=self.kind, sessions=self.sessions,
+                                          phase_start=self.phase_start, credited=self.credited))
     
     def toggle(self):
         if self.running:
-            self.running = False
+            self.credit_focus()
+            self.timer.pause()
+            self.app.ticks.unsubscribe(self.tick)
             self.start_btn.config(text="▶", bg=self.theme["accent"])
+            self.save_state()
         else:
             # Load settings if expanded
             if self.expanded:
@@ -1233,117 +3833,220 @@ class PomodoroWidget(BaseWidget):
                 except:
                     pass
             
-            self.running = True
+            self.timer.start()
+            if self.phase_start is None:
+                self.phase_start = int(time.time())
             self.start_btn.config(text="⏸", bg="#FF9800")
-            self.tick()
+            self.save_state()
+            self._start_ticks()
     
-    def tick(self):
-        if self.running and self.time > 0:
-            m, s = divmod(self.time, 60)
-            self.timer_lbl.config(text=f"{m:02d}:{s:02d}")
-            self.time -= 1
-            
-            if self.is_work:
-                self.add_focus(1)
-            
-            self.win.after(1000, self.tick)
-        elif self.running:
+    def _start_ticks(self):
+        # Not tied to the window: a hidden timer must still finish its phase on time
+        self.app.ticks.subscribe(self.tick, "second")
+        self.tick()
+    
+    def tick(self, now=None):
+        # Only redraws - elapsed time always comes from the timer's deadline
+        if not self.running:
+            return
+        self.credit_focus()
+        if self.timer.remaining() <= 0:
             self.complete()
+            return
+        self.defer(self.update_display)
+    
+    def credit_focus(self):
+        """Add the work seconds elapsed since the last call to today's stats"""
+        if self.is_work:
+            secs = int(self.timer.elapsed()) - self.credited
+            if secs > 0:
+                self.credited += secs
+                self.add_focus(secs)
     
     def complete(self):
-        try:
-            import winsound
-            winsound.MessageBeep()
-        except:
-            pass
+        beep()
         
+        # The phase really ended at the deadline, even if the loop stalled or the machine slept past it
+        self.log_phase(int(self.timer.ends_at()))
         if self.is_work:
             self.sessions += 1
             self.add_session()
             
             if self.sessions % 4 == 0:
-                self.time = self.long_brk
-                self.status_lbl.config(text="☕ Long Break")
+                self._next_phase(self.long_brk, "l", "☕ Long Break")
             else:
-                self.time = self.brk
-                self.status_lbl.config(text="☕ Break")
-            self.is_work = False
+                self._next_phase(self.brk, "b", "☕ Break")
         else:
-            self.time = self.work
-            self.status_lbl.config(text="🍅 Work")
-            self.is_work = True
+            self._next_phase(self.work, "w", "🍅 Work")
         
-        self.update_display()
+        self.timer.start()
+        self.phase_start = int(time.time())
+        self.save_state()
         self.tick()
     
+    def _next_phase(self, duration, kind, status):
+        self.timer.reset(duration)
+        self.kind = kind
+        self.is_work = kind == "w"
+        self.credited = 0
+        self.status_lbl.config(text=status)
+    
     def skip(self):
+        running = self.running
+        self.credit_focus()
+        self.log_phase()
         if self.is_work:
-            self.time = self.brk
-            self.status_lbl.config(text="☕ Break")
-            self.is_work = False
+            self._next_phase(self.brk, "b", "☕ Break")
         else:
-            self.time = self.work
-            self.status_lbl.config(text="🍅 Work")
-            self.is_work = True
+            self._next_phase(self.work, "w", "🍅 Work")
+        if running:
+            self.timer.start()
+            self.phase_start = int(time.time())
+        self.save_state()
         self.update_display()
     
     def reset(self):
-        self.running = False
-        self.is_work = True
-        self.time = self.work
-        self.status_lbl.config(text="🍅 Work")
+        self.credit_focus()
+        self.log_phase()
+        self.app.ticks.unsubscribe(self.tick)
+        self._next_phase(self.work, "w", "🍅 Work")
         self.start_btn.config(text="▶", bg=self.theme["accent"])
+        self.save_state()
         self.update_display()
     
     def update_display(self):
-        m, s = divmod(self.time, 60)
-        self.timer_lbl.config(text=f"{m:02d}:{s:02d}")
-        self.sess_lbl.config(text=f"Sessions: {self.sessions}")
+        m, s = divmod(math.ceil(self.timer.remaining()), 60)
+        self.app.ticks.set_text(self.timer_lbl, f"{m:02d}:{s:02d}")
+        self.app.ticks.set_text(self.sess_lbl, f"Sessions: {self.sessions}")
+    
+    def build_rollups(self):
+        """One-time fill of the week/month/year rollups from the daily stats"""
+        if "pomo_rollups" in self.app.data:
+            return
+        rollups = {}
+        for month in self.app.months("pomo_stats"):
+            self.app.fetch("pomo_stats", month)
+            stats = self.app.data.get("pomo_stats", {})
+            for d in range(1, 32):
+                day = stats.get(f"{month}-{d:02d}")
+                if not day:
+                    continue
+                for key in focus_periods(datetime.strptime(f"{month}-{d:02d}", "%Y-%m-%d").date()):
+                    entry = rollups.setdefault(key, {"secs": 0, "sessions": 0})
+                    entry["secs"] += day.get("secs", 0)
+                    entry["sessions"] += day.get("sessions", 0)
+        self.app.put(["pomo_rollups"], rollups)
+    
+    def _count(self, secs, sessions):
+        """Add to today's stats and its rollups in memory. Returns the paths that changed"""
+        day = datetime.now().date()
+        today = day.isoformat()
+        self.app.fetch("pomo_stats", today[:7])
+        paths = [["pomo_stats", today]] + [["pomo_rollups", key] for key in focus_periods(day)]
+        for domain, key in paths:
+            entry = self.app.data.setdefault(domain, {}).setdefault(key, {"secs": 0, "sessions": 0})
+            entry["secs"] += secs
+            entry["sessions"] += sessions
+            self.app.hold([domain, key])
+        return paths
+    
+    def _save_counts(self, paths):
+        for domain, key in paths:
+            self.app.put([domain, key], dict(self.app.data[domain][key]))
     
     def add_focus(self, secs):
-        if "pomo_stats" not in self.app.data:
-            self.app.data["pomo_stats"] = {}
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today not in self.app.data["pomo_stats"]:
-            self.app.data["pomo_stats"][today] = {"secs": 0, "sessions": 0}
-        self.app.data["pomo_stats"][today]["secs"] += secs
-        
-        if self.app.data["pomo_stats"][today]["secs"] % 60 == 0:
-            self.app.save()
+        paths = self._count(secs, 0)
+        
+        # Counted in memory every second, recorded once a minute (with the credit so a restart can't double count)
+        total = self.app.data["pomo_stats"][paths[0][1]]["secs"]
+        if total // 60 != (total - secs) // 60:
+            self._save_counts(paths)
+            self.save_state()
             if self.expanded:
                 self.update_stats()
     
     def add_session(self):
-        if "pomo_stats" not in self.app.data:
-            self.app.data["pomo_stats"] = {}
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today not in self.app.data["pomo_stats"]:
-            self.app.data["pomo_stats"][today] = {"secs": 0, "sessions": 0}
-        self.app.data["pomo_stats"][today]["sessions"] += 1
-        self.app.save()
+        self._save_counts(self._count(0, 1))
+    
+    def log_phase(self, end=None):
+        """Append the phase that just ended to the session log as [start, end, kind]"""
+        if self.phase_start is None:
+            return
+        start, self.phase_start = self.phase_start, None
+        day = datetime.fromtimestamp(start).strftime("%Y-%m-%d")
+        self.app.fetch("pomo_log", day[:7])
+        entries = self.app.data.get("pomo_log", {}).get(day, [])
+        self.app.put(["pomo_log", day], entries + [[start, end or int(time.time()), self.kind]])
     
     def update_stats(self):
+        day = datetime.now().date()
+        today = day.isoformat()
+        self.app.fetch("pomo_stats", today[:7])
         stats = self.app.data.get("pomo_stats", {})
-        now = datetime.now()
+        rollups = self.app.data.get("pomo_rollups", {})
+        week, month, _ = focus_periods(day)
         
-        # Today
-        today = now.strftime("%Y-%m-%d")
-        today_secs = stats.get(today, {}).get("secs", 0)
-        self.stats_labels["today"].config(text=self.fmt_time(today_secs))
-        
-        # Week
-        week_secs = 0
-        for i in range(7):
-            day = (now - timedelta(days=i)).strftime("%Y-%m-%d")
-            week_secs += stats.get(day, {}).get("secs", 0)
-        self.stats_labels["week"].config(text=self.fmt_time(week_secs))
-        
-        # Month
-        month_secs = 0
-        for d, s in stats.items():
-            if d.startswith(now.strftime("%Y-%m")):
-                month_secs += s.get("secs", 0)
-        self.stats_labels["month"].config(text=self.fmt_time(month_secs))
+        self.stats_labels["today"].config(text=self.fmt_time(stats.get(today, {}).get("secs", 0)))
+        self.stats_labels["week"].config(text=self.fmt_time(rollups.get(week, {}).get("secs", 0)))
+        self.stats_labels["month"].config(text=self.fmt_time(rollups.get(month, {}).get("secs", 0)))
+        self.draw_chart()
+    
+    def chart_series(self):
+        """(label, seconds) bars for the chosen range, oldest first"""
+        day = datetime.now().date()
+        rng = self.chart_range.get()
+        if rng == "day":
+            days = [day - timedelta(days=i) for i in range(13, -1, -1)]
+            for month in {d.isoformat()[:7] for d in days}:
+                self.app.fetch("pomo_stats", month)
+            stats = self.app.data.get("pomo_stats", {})
+            return [(str(d.day), stats.get(d.isoformat(), {}).get("secs", 0)) for d in days]
+        
+        if rng == "week":
+            keys = [focus_periods(day - timedelta(weeks=i))[0] for i in range(11, -1, -1)]
+            labels = [k[6:] for k in keys]
+        elif rng == "month":
+            keys = ["%d-%02d" % add_months(day.year, day.month, -i) for i in range(11, -1, -1)]
+            labels = [calendar.month_abbr[int(k[5:])][:1] for k in keys]
+        else:
+            keys = [str(day.year - i) for i in range(4, -1, -1)]
+            labels = keys
+        rollups = self.app.data.get("pomo_rollups", {})
+        return [(label, rollups.get(k, {}).get("secs", 0)) for label, k in zip(labels, keys)]
+    
+    def draw_chart(self):
+        if not self.expanded:
+            return
+        c, paint = self.chart, self.styles.paint
+        c.delete("all")
+        series = self.chart_series()
+        w, h = max(c.winfo_width(), 100), int(c.cget("height"))
+        most = max(secs for _, secs in series)
+        bw = w / len(series)
+        
+        for i, (label, secs) in enumerate(series):
+            x = i * bw
+            bh = (h - 24) * secs / (most or 1)
+            c.create_rectangle(x + 1, h - 12 - bh, x + bw - 1, h - 12, outline="", **paint(fill="accent"))
+            c.create_text(x + bw / 2, h - 11, text=label, anchor="n", font=("Segoe UI", 7), **paint(fill="text_light"))
+        c.create_text(w - 1, 0, text=f"max {self.fmt_time(most)}", anchor="ne",
+                      font=("Segoe UI", 7), **paint(fill="text_light"))
+    
+    def export_csv(self):
+        path = filedialog.asksaveasfilename(parent=self.win, defaultextension=".csv", initialfile="focus_stats.csv",
+                                            filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        rollups = self.app.data.get("pomo_rollups", {})
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                out = csv.writer(f)
+                out.writerow(["period", "kind", "focus_minutes", "sessions"])
+                for key in sorted(rollups):
+                    kind = "week" if "-W" in key else "month" if "-" in key else "year"
+                    out.writerow([key, kind, rollups[key].get("secs", 0) // 60, rollups[key].get("sessions", 0)])
+        except OSError as e:
+            print(f"CSV export error: {e}")
     
     def fmt_time(self, secs):
         if secs < 60:
@@ -1355,118 +4058,417 @@ class PomodoroWidget(BaseWidget):
     
     def apply_theme(self):
         super().apply_theme()
-        self.timer_lbl.config(bg=self.theme["bg"], fg=self.theme["accent"])
-        self.status_lbl.config(bg=self.theme["bg"], fg=self.theme["text"])
-        self.sess_lbl.config(bg=self.theme["bg"], fg=self.theme["text_light"])
+        if self.running:
+            self.start_btn.config(bg="#FF9800")
+
+
+# ============== HABIT HISTORY ==============
+# Each habit keeps "bits": {"YYYY": hex} - bit n set means the habit was done on day n of that year
+def day_bit(day):
+    return day.timetuple().tm_yday - 1
+
+
+def habit_year(habit, year):
+    return int(habit.get("bits", {}).get(str(year), "0"), 16)
+
+
+def weeks_to_bits(checked):
+    """Convert the old {"week start": [bool] * 7} layout into {"YYYY": hex} bitmaps"""
+    years = {}
+    for wk, days in checked.items():
+        try:
+            start = datetime.strptime(wk, "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        for d, done in enumerate(days[:7]):
+            if done:
+                day = start + timedelta(days=d)
+                years[day.year] = years.get(day.year, 0) | 1 << day_bit(day)
+    return {str(y): format(bits, "x") for y, bits in years.items()}
+
+
+class HabitAnalytics:
+    """Streaks, completion rates and heatmaps computed with whole-bitmap int operations.
+    Results are cached on the encoded bitmaps, so only habits that changed are recomputed"""
+    
+    def __init__(self, size=256):
+        self.size = size
+        self.cache = OrderedDict()
+    
+    def _cached(self, key, compute):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        value = self.cache[key] = compute()
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return value
+    
+    @staticmethod
+    def timeline(habit):
+        """(first day, bitmap) with every stored year shifted into one int"""
+        years = sorted(int(y) for y in habit.get("bits", {}))
+        if not years:
+            return None, 0
+        start = datetime(years[0], 1, 1).date()
+        line = 0
+        for y in years:
+            line |= habit_year(habit, y) << (datetime(y, 1, 1).date() - start).days
+        return start, line
+    
+    def stats(self, habit, today):
+        """current/longest streak and done share over the last 7, 30 and 365 days.
+        A habit younger than a window is rated over the days since it was first checked"""
+        key = ("stats", today, tuple(sorted(habit.get("bits", {}).items())))
+        return self._cached(key, lambda: self._stats(habit, today))
+    
+    def _stats(self, habit, today):
+        start, line = self.timeline(habit)
+        result = {"current": 0, "longest": 0, "rates": {7: 0.0, 30: 0.0, 365: 0.0}}
+        if start is None or today < start:
+            return result
+        t = (today - start).days
+        line &= (1 << (t + 1)) - 1
+        
+        # Current streak: ones below the highest gap; an unchecked today doesn't break it yet
+        end = t if line >> t & 1 else t - 1
+        if end >= 0:
+            gaps = ~line & ((1 << (end + 1)) - 1)
+            result["current"] = end - gaps.bit_length() + 1
+        
+        # Longest streak: each x & (x >> 1) shortens every run of ones by one
+        x = line
+        while x:
+            x &= x >> 1
+            result["longest"] += 1
+        
+        if not line:
+            return result
+        tracked = t - ((line & -line).bit_length() - 1) + 1    # days since the first check, today included
+        for n in result["rates"]:
+            window = line >> max(0, t - n + 1)
+            result["rates"][n] = window.bit_count() / min(n, tracked)
+        return result
+    
+    def heatmap(self, habits, year):
+        """Habits done on each day of year, summed with a bit-sliced counter"""
+        key = ("heatmap", year, tuple(h.get("bits", {}).get(str(year), "0") for h in habits))
+        return self._cached(key, lambda: self._heatmap(habits, year))
+    
+    @staticmethod
+    def _heatmap(habits, year):
+        planes = []   # planes[k] holds bit k of every day's count
+        for habit in habits:
+            carry = habit_year(habit, year)
+            for k in range(len(planes)):
+                if not carry:
+                    break
+                planes[k], carry = planes[k] ^ carry, planes[k] & carry
+            if carry:
+                planes.append(carry)
+        days = 366 if calendar.isleap(year) else 365
+        return [sum((p >> d & 1) << k for k, p in enumerate(planes)) for d in range(days)]
 
 
 # ============== HABIT TRACKER ==============
 class HabitTrackerWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "📊 Habits", "habit_tracker", app)
+        today = datetime.now().date()
+        self.week_start = today - timedelta(days=today.weekday())
+        self.year = today.year
+        self.view = "week"
+        self.selected = None   # habit index shown in the heatmap, None = all habits
+        self.analytics = HabitAnalytics()
+        self._heat_job = None
+        self.migrate()
         self.build()
     
+    def migrate(self):
+        """Move week lists ("checked") into yearly bitmaps ("bits")"""
+        for idx, habit in enumerate(self.app.data.get("habits", [])):
+            if "checked" in habit:
+                bits = dict(habit.get("bits", {}))
+                for y, hexbits in weeks_to_bits(habit["checked"]).items():
+                    bits[y] = format(int(bits.get(y, "0"), 16) | int(hexbits, 16), "x")
+                self.app.put(["habits", idx, "bits"], bits)
+                self.app.delete(["habits", idx, "checked"])
+    
     def build(self):
         # Add
-        add = tk.Frame(self.content, bg=self.theme["bg"])
+        add = self.ui(tk.Frame, self.content, bg="bg")
         add.pack(fill="x", pady=3)
         
-        self.entry = tk.Entry(add, bg=self.theme["entry"], fg=self.theme["text"],
-                             font=FONTS["tiny"], bd=1, relief="solid")
+        self.entry = self.ui(tk.Entry, add, bg="entry", fg="text",
+                                       font=FONTS["tiny"], bd=1, relief="solid")
         self.entry.pack(side="left", fill="x", expand=True, padx=(0, 3))
         self.entry.bind("<Return>", self.add_habit)
         
-        tk.Button(add, text="+", command=self.add_habit, bg=self.theme["accent"],
-                 fg="white", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
+        self.ui(tk.Button, add, text="+", command=self.add_habit, bg="accent",
+                           fg="white", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
         
-        # Habits scroll
-        self.scroll = ScrollFrame(self.content, bg=self.theme["bg"])
-        self.scroll.pack(fill="both", expand=True)
-        self.habits_fr = self.scroll.inner
+        # Nav - weeks in the list, years in the heatmap
+        nav = self.ui(tk.Frame, self.content, bg="bg")
+        nav.pack(fill="x", pady=1)
         
-        self.load()
-    
-    def get_week(self):
-        today = datetime.now()
-        return (today - timedelta(days=today.weekday())).strftime("%Y-%m-%d")
-    
-    def load(self):
-        for w in self.habits_fr.winfo_children():
-            w.destroy()
+        self.ui(tk.Button, nav, text="◀", command=self.prev_p, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="left")
         
-        habits = self.app.data.get("habits", [])
-        wk = self.get_week()
+        self.view_btn = self.ui(tk.Button, nav, text="▦", command=self.toggle_view, bg="button",
+                                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2")
+        self.view_btn.pack(side="right", padx=(2, 0))
+        
+        self.ui(tk.Button, nav, text="▶", command=self.next_p, bg="button",
+                           fg="text", font=FONTS["tiny"], bd=0, padx=5, cursor="hand2").pack(side="right")
         
-        # Header
-        days = ["M", "T", "W", "T", "F", "S", "S"] if not self.expanded else ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        name_w = 12 if self.expanded else 8
+        self.nav_lbl = self.ui(tk.Label, nav, bg="bg", fg="text", font=FONTS["tiny"], cursor="hand2")
+        self.nav_lbl.pack(side="left", fill="x", expand=True)
+        self.nav_lbl.bind("<Button-1>", lambda e: self.go_today())
         
-        tk.Label(self.habits_fr, text="Habit", bg=self.theme["bg"], fg=self.theme["text"],
-                font=FONTS["tiny"], width=name_w, anchor="w").grid(row=0, column=0, padx=2, pady=2)
+        # Habits scroll - header stays in inner, habit rows are virtual
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
+        self.habits_fr = self.scroll.inner
         
-        for c, d in enumerate(days):
-            tk.Label(self.habits_fr, text=d, bg=self.theme["header"], fg=self.theme["text"],
-                    font=FONTS["tiny"], width=3).grid(row=0, column=c + 1, padx=1, pady=2)
+        self.name_hdr = self.ui(tk.Label, self.habits_fr, text="Habit", bg="bg", fg="text",
+                                          font=FONTS["tiny"], anchor="w")
+        self.name_hdr.grid(row=0, column=0, padx=2, pady=2)
+        self.layout.config(self.name_hdr, width={"compact": 8, "expanded": 12})
+        
+        self.day_hdrs = []
+        for c, d in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+            lbl = self.ui(tk.Label, self.habits_fr, bg="header", fg="text",
+                                    font=FONTS["tiny"], width=3)
+            lbl.grid(row=0, column=c + 1, padx=1, pady=2)
+            self.layout.config(lbl, text={"compact": d[0], "expanded": d})
+            self.day_hdrs.append(lbl)
+        self.layout.apply(self.size)
+        self._align(self.habits_fr)
+        
+        # Heatmap
+        self.heat_fr = self.ui(tk.Frame, self.content, bg="bg")
+        self.heat_title = self.ui(tk.Label, self.heat_fr, bg="bg", fg="text",
+                                            font=FONTS["tiny"], cursor="hand2")
+        self.heat_title.pack(fill="x")
+        self.heat_title.bind("<Button-1>", lambda e: self.cycle_habit())
+        
+        self.heat = self.ui(tk.Canvas, self.heat_fr, bg="bg", highlightthickness=0, height=110)
+        self.heat.pack(fill="both", expand=True)
+        self.heat.bind("<Configure>", lambda e: self.defer(self._queue_heatmap))
+        
+        self.heat_info = self.ui(tk.Label, self.heat_fr, bg="bg", fg="text_light", font=FONTS["tiny"])
+        self.heat_info.pack(fill="x")
         
-        for i, habit in enumerate(habits):
-            self._habit_row(i, habit, wk, name_w)
+        self.load()
     
-    def _habit_row(self, idx, habit, wk, name_w):
-        row = idx + 1
-        
-        name = habit["name"][:name_w - 2] if len(habit["name"]) > name_w - 2 else habit["name"]
-        tk.Label(self.habits_fr, text=name, bg=self.theme["entry"], fg=self.theme["text"],
-                font=FONTS["tiny"], width=name_w, anchor="w").grid(row=row, column=0, padx=2, pady=1)
+    def load(self):
+        if self.view == "heatmap":
+            self.scroll.pack_forget()
+            self.heat_fr.pack(fill="both", expand=True)
+            self.view_btn.config(text="☰")
+            self.nav_lbl.config(text=str(self.year))
+            self.render_heatmap()
+            return
+        
+        self.heat_fr.pack_forget()
+        self.scroll.pack(fill="both", expand=True)
+        self.view_btn.config(text="▦")
+        end = self.week_start + timedelta(days=6)
+        self.nav_lbl.config(text=f"{self.week_start.strftime('%b %d')} - {end.strftime('%b %d')}")
         
-        checked = habit.get("checked", {}).get(wk, [False] * 7)
-        while len(checked) < 7:
-            checked.append(False)
+        habits = self.app.data.get("habits", [])
+        self.scroll.set_rows(len(habits), 26, self._make_row, self._fill_row)
+    
+    @property
+    def name_w(self):
+        return by_size(self.size, compact=8, expanded=12)
+    
+    def _align(self, frame):
+        # Header and rows are separate grids - fixed day columns keep them lined up
+        for c in range(1, 8):
+            frame.grid_columnconfigure(c, minsize=by_size(self.size, compact=28, expanded=36))
+    
+    def _make_row(self, parent):
+        frame = self.ui(tk.Frame, parent, bg="bg")
+        row = {"frame": frame, "idx": 0, "vars": [tk.BooleanVar() for _ in range(7)], "size": None}
+        
+        row["name"] = self.ui(tk.Label, frame, bg="entry", fg="text",
+                                        font=FONTS["tiny"], anchor="w", cursor="hand2")
+        row["name"].grid(row=0, column=0, padx=2, pady=1)
+        row["name"].bind("<Button-1>", lambda e: self.show_heatmap(row["idx"]))
+        
+        for d, var in enumerate(row["vars"]):
+            self.ui(tk.Checkbutton, frame, variable=var, bg="entry",
+                                    command=lambda day=d, v=var: self.toggle_day(row["idx"], day, v.get())
+                                    ).grid(row=0, column=d + 1, padx=1, pady=1)
+        
+        # Current streak - only in expanded, shown by _fill_row
+        row["streak"] = self.ui(tk.Label, frame, bg="bg", fg="text_light",
+                                          font=FONTS["tiny"], width=5, anchor="w")
+        row["streak"].grid(row=0, column=8, padx=1)
+        
+        del_btn = self.ui(tk.Label, frame, text="✕", bg="bg", fg="#E74C3C",
+                                    font=FONTS["tiny"], cursor="hand2")
+        del_btn.grid(row=0, column=9, padx=2)
+        del_btn.bind("<Button-1>", lambda e: self.delete_habit(row["idx"]))
+        return row
+    
+    def _fill_row(self, row, idx):
+        habit = self.app.data["habits"][idx]
+        name_w = self.name_w
+        row["idx"] = idx
+        if row["size"] != self.size:
+            # Rows are recycled across size changes - adapt them when refilled
+            row["size"] = self.size
+            row["name"].config(width=name_w)
+            self._align(row["frame"])
+            if self.expanded:
+                row["streak"].grid()
+            else:
+                row["streak"].grid_remove()
+        row["name"].config(text=habit["name"][:name_w - 2] if len(habit["name"]) > name_w - 2 else habit["name"])
         
-        for d in range(7):
-            var = tk.BooleanVar(value=checked[d])
-            tk.Checkbutton(self.habits_fr, variable=var, bg=self.theme["entry"],
-                          command=lambda i=idx, day=d, v=var: self.toggle_day(i, day, v.get())
-                          ).grid(row=row, column=d + 1, padx=1, pady=1)
+        # A week can span two years, so look each day up in its own year
+        bits = {}
+        for d, var in enumerate(row["vars"]):
+            day = self.week_start + timedelta(days=d)
+            if day.year not in bits:
+                bits[day.year] = habit_year(habit, day.year)
+            var.set(bits[day.year] >> day_bit(day) & 1)
         
-        del_btn = tk.Label(self.habits_fr, text="✕", bg=self.theme["bg"], fg="#E74C3C",
-                          font=FONTS["tiny"], cursor="hand2")
-        del_btn.grid(row=row, column=8, padx=2)
-        del_btn.bind("<Button-1>", lambda e: self.delete_habit(idx))
+        if self.expanded:
+            streak = self.analytics.stats(habit, datetime.now().date())["current"]
+            row["streak"].config(text=f"🔥{streak}" if streak else "")
     
     def add_habit(self, e=None):
         name = self.entry.get().strip()
         if name:
-            if "habits" not in self.app.data:
-                self.app.data["habits"] = []
-            self.app.data["habits"].append({"name": name, "checked": {}})
-            self.app.save()
+            self.app.append(["habits"], {"name": name, "bits": {}})
             self.entry.delete(0, "end")
             self.load()
     
     def toggle_day(self, idx, day, checked):
         if idx < len(self.app.data.get("habits", [])):
-            wk = self.get_week()
-            habit = self.app.data["habits"][idx]
-            if "checked" not in habit:
-                habit["checked"] = {}
-            if wk not in habit["checked"]:
-                habit["checked"][wk] = [False] * 7
-            habit["checked"][wk][day] = checked
-            self.app.save()
+            date = self.week_start + timedelta(days=day)
+            bits = habit_year(self.app.data["habits"][idx], date.year)
+            if checked:
+                bits |= 1 << day_bit(date)
+            else:
+                bits &= ~(1 << day_bit(date))
+            self.app.put(["habits", idx, "bits", str(date.year)], format(bits, "x"))
+            
+            row = self.scroll.rows.get(idx)
+            if row:
+                self._fill_row(row, idx)
     
     def delete_habit(self, idx):
         if idx < len(self.app.data.get("habits", [])):
-            del self.app.data["habits"][idx]
-            self.app.save()
+            self.app.delete(["habits", idx])
+            if self.selected is not None and self.selected >= idx:
+                self.selected = None if self.selected == idx else self.selected - 1
             self.load()
     
-    def on_mode_change(self):
+    # ---- History and heatmap
+    def prev_p(self):
+        if self.view == "heatmap":
+            self.year -= 1
+        else:
+            self.week_start -= timedelta(days=7)
+        self.load()
+    
+    def next_p(self):
+        if self.view == "heatmap":
+            self.year += 1
+        else:
+            self.week_start += timedelta(days=7)
+        self.load()
+    
+    def go_today(self):
+        today = datetime.now().date()
+        self.week_start = today - timedelta(days=today.weekday())
+        self.year = today.year
+        self.load()
+    
+    def toggle_view(self):
+        self.view = "week" if self.view == "heatmap" else "heatmap"
+        self.load()
+    
+    def show_heatmap(self, idx):
+        self.selected = idx
+        self.view = "heatmap"
         self.load()
     
+    def cycle_habit(self):
+        count = len(self.app.data.get("habits", []))
+        if self.selected is None:
+            self.selected = 0 if count else None
+        else:
+            self.selected = self.selected + 1 if self.selected + 1 < count else None
+        self.render_heatmap()
+    
+    def _queue_heatmap(self):
+        if self.view == "heatmap" and not self._heat_job:
+            self._heat_job = self.win.after_idle(self.render_heatmap)
+    
+    def _shade(self, level):
+        """Cell color from the theme: button for empty days, entry -> accent by level"""
+        if level <= 0:
+            return self.theme["button"]
+        a = self.win.winfo_rgb(self.theme["entry"])
+        b = self.win.winfo_rgb(self.theme["accent"])
+        t = 0.35 + 0.65 * level
+        return "#%02x%02x%02x" % tuple(int(x + (y - x) * t) >> 8 for x, y in zip(a, b))
+    
+    def render_heatmap(self):
+        self._heat_job = None
+        habits = self.app.data.get("habits", [])
+        if self.selected is not None and self.selected >= len(habits):
+            self.selected = None
+        shown = habits if self.selected is None else [habits[self.selected]]
+        counts = self.analytics.heatmap(shown, self.year)
+        
+        c = self.heat
+        c.delete("all")
+        cs = max(4, min(14, (max(c.winfo_width(), 200) - 20) // 54))
+        left, top = 16, 14
+        offset = datetime(self.year, 1, 1).weekday()
+        most = max(counts) or 1
+        shades = [self._shade(n / most) for n in range(most + 1)]
+        
+        for d, n in enumerate(counts):
+            col, r = divmod(d + offset, 7)
+            x, y = left + col * cs, top + r * cs
+            c.create_rectangle(x, y, x + cs - 1, y + cs - 1, fill=shades[n], outline="")
+        
+        for m in range(1, 13):
+            col = (day_bit(datetime(self.year, m, 1)) + offset) // 7
+            c.create_text(left + col * cs, 1, text=calendar.month_abbr[m][:3 if self.expanded else 1],
+                          anchor="nw", fill=self.theme["text_light"], font=FONTS["tiny"])
+        for r, name in ((0, "M"), (2, "W"), (4, "F")):
+            c.create_text(1, top + r * cs, text=name, anchor="nw", fill=self.theme["text_light"], font=FONTS["tiny"])
+        c.config(height=top + 7 * cs + 2)
+        
+        if self.selected is None:
+            self.heat_title.config(text=f"All habits ({len(habits)}) ▸")
+            self.heat_info.config(text=f"{sum(1 for n in counts if n)} active days · {sum(counts)} check-ins")
+        else:
+            habit = habits[self.selected]
+            st = self.analytics.stats(habit, datetime.now().date())
+            self.heat_title.config(text=f"{habit['name']} ▸")
+            self.heat_info.config(text=f"🔥{st['current']}  best {st['longest']}  "
+                                       f"7d {st['rates'][7]:.0%}  30d {st['rates'][30]:.0%}  1y {st['rates'][365]:.0%}")
+    
+    def on_mode_change(self):
+        self._align(self.habits_fr)
+        if self.view == "heatmap":
+            self.render_heatmap()
+        else:
+            self.scroll.set_count(len(self.app.data.get("habits", [])))
+    
     def apply_theme(self):
         super().apply_theme()
-        self.scroll.set_bg(self.theme["bg"])
-        self.load()
+        # Heatmap shades are blended from the theme, so they are drawn again
+        if self.view == "heatmap":
+            self.defer(self.render_heatmap)
 
 
 # ============== CLOCK ==============
@@ -1474,83 +4476,763 @@ class ClockWidget(BaseWidget):
     def __init__(self, master, app):
         super().__init__(master, "🕐 Clock", "clock", app)
         self.build()
-        self.tick()
+        self.tick(datetime.now())
+        app.ticks.subscribe(self.tick, "second", self)
     
     def build(self):
-        self.time_lbl = tk.Label(self.content, text="", bg=self.theme["bg"],
-                                 fg=self.theme["accent"], font=FONTS["clock"])
+        self.time_lbl = self.ui(tk.Label, self.content, text="", bg="bg",
+                                           fg="accent", font=FONTS["clock"])
         self.time_lbl.pack(expand=True, pady=5)
         
-        self.date_lbl = tk.Label(self.content, text="", bg=self.theme["bg"],
-                                 fg=self.theme["text"], font=FONTS["small"])
+        self.date_lbl = self.ui(tk.Label, self.content, text="", bg="bg",
+                                           fg="text", font=FONTS["small"])
         self.date_lbl.pack(pady=(0, 5))
     
-    def tick(self):
-        now = datetime.now()
-        self.time_lbl.config(text=now.strftime("%H:%M:%S"))
+    def tick(self, now):
+        ticks = self.app.ticks
+        ticks.set_text(self.time_lbl, now.strftime("%H:%M:%S"))
         if self.expanded:
-            self.date_lbl.config(text=now.strftime("%A, %B %d, %Y"))
+            ticks.set_text(self.date_lbl, now.strftime("%A, %B %d, %Y"))
         else:
-            self.date_lbl.config(text=now.strftime("%b %d"))
-        self.win.after(1000, self.tick)
+            ticks.set_text(self.date_lbl, now.strftime("%b %d"))
     
-    def apply_theme(self):
-        super().apply_theme()
-        self.time_lbl.config(bg=self.theme["bg"], fg=self.theme["accent"])
-        self.date_lbl.config(bg=self.theme["bg"], fg=self.theme["text"])
+    def on_mode_change(self):
+        self.tick(datetime.now())
+
+
+# ============== AGENDA ==============
+class AgendaWidget(BaseWidget):
+    """The next AGENDA_DAYS in one list: events, recurring and timed events, day planner
+    slots and week planner notes. Clicking an item jumps to it"""
+    
+    def __init__(self, master, app):
+        super().__init__(master, "🗓 Agenda", "agenda", app)
+        self.items = []
+        self._load_job = None
+        self.build()
+        app.ticks.subscribe(lambda now: self.load(), "hour", self)
+        app.subscribe(self._on_change)
+    
+    def build(self):
+        self.empty = self.ui(tk.Label, self.content, text="Nothing coming up", bg="bg",
+                                         fg="text_light", font=FONTS["tiny"])
+        self.scroll = self.ui(ScrollFrame, self.content, bg="bg")
+        self.scroll.pack(fill="both", expand=True)
+        self.load()
+    
+    def _on_change(self, op, path):
+        # One reload for a burst of changes
+        if path[0] in AGENDA_DOMAINS and not self._load_job and self._touches(path):
+            self._load_job = self.win.after_idle(self.defer, self.load)
+    
+    def _touches(self, path):
+        """Whether a change can alter what the agenda lists - planner edits outside the window can't"""
+        today = datetime.now().date()
+        first, last = today.isoformat(), (today + timedelta(days=AGENDA_DAYS - 1)).isoformat()
+        domain = path[0]
+        if len(path) < 2 or domain in ("recurring", "timed"):
+            return True
+        if domain in ("events", "day_planner"):
+            return first <= path[1][:10] <= last
+        if domain == "week_planner":
+            # Keyed by week start
+            return (today - timedelta(days=6)).isoformat() <= path[1] <= last
+        if domain == "todos":
+            # Tasks moving or being added/removed shift positions; otherwise only dated tasks are listed
+            todos = self.app.data.get("todos", [])
+            return (len(path) < 3 or path[2] == "due"
+                    or path[1] < len(todos) and bool(todos[path[1]].get("due")))
+        return True
+    
+    def collect(self):
+        """[(when, icon, text, path)] from now on, by time - whole-day items first each day"""
+        now = datetime.now()
+        today = now.date()
+        data = self.app.data
+        items = []
+        for i in range(AGENDA_DAYS):
+            day = today + timedelta(days=i)
+            key = day.isoformat()
+            self.app.fetch("events", key[:7])
+            if data.get("events", {}).get(key):
+                items.append((f"{key}T", "📅", data["events"][key], ("events", key)))
+            for _, text in self.app.recurrences.on_day(day):
+                items.append((f"{key}T", "🔁", text, ("events", key)))
+            
+            week = (day - timedelta(days=day.weekday())).isoformat()
+            self.app.fetch("week_planner", week)
+            text = data.get("week_planner", {}).get(week, {}).get(str(day.weekday()), "")
+            if text.strip():
+                items.append((f"{key}T", "📋", text, ("week_planner", week, str(day.weekday()))))
+            
+            self.app.fetch("day_planner", key)
+            for hour, text in data.get("day_planner", {}).get(key, {}).items():
+                if text.strip() and (day > today or int(hour) >= now.hour):
+                    items.append((f"{key}T{int(hour):02d}:00", "📆", text, ("day_planner", key, hour)))
+        
+        # Open tasks due in the range; overdue ones are listed today
+        last = (today + timedelta(days=AGENDA_DAYS - 1)).isoformat()
+        for pos, task in enumerate(data.get("todos", [])):
+            due = task.get("due")
+            if due and due <= last and not task.get("done"):
+                icon = "⚠" if due < today.isoformat() else "✅"
+                items.append((f"{max(due, today.isoformat())}T", icon, task.get("text", ""), ("todos", pos)))
+        
+        # Timed events still running or starting before the end of the range
+        end = f"{(today + timedelta(days=AGENDA_DAYS)).isoformat()}T00:00"
+        for _, event in self.app.timed.overlapping(minute_key(now), end):
+            start = max(event["start"], f"{today.isoformat()}T")
+            hour = min(max(int(start[11:13] or now.hour), 5), 23)
+            until = event["end"][11:] if event["end"][:10] == start[:10] else event["end"][5:].replace("T", " ")
+            items.append((start, "🕒", f"{event['title']} → {until}", ("day_planner", start[:10], str(hour))))
+        
+        items.sort(key=lambda item: item[0])
+        return items
+    
+    def load(self):
+        self._load_job = None
+        self.items = self.collect()
+        if self.items:
+            self.empty.pack_forget()
+        else:
+            self.empty.pack(fill="x", pady=8, before=self.scroll)
+        self.scroll.set_rows(len(self.items), 22, self._make_row, self._fill_row)
+    
+    def _make_row(self, parent):
+        outer = self.ui(tk.Frame, parent, bg="bg")
+        row = {"frame": outer, "i": 0}
+        row["when"] = self.ui(tk.Label, outer, bg="bg", fg="accent", font=FONTS["tiny"], width=12, anchor="w")
+        row["when"].pack(side="left")
+        row["text"] = self.ui(tk.Label, outer, bg="bg", fg="text", font=FONTS["tiny"], anchor="w", cursor="hand2")
+        row["text"].pack(side="left", fill="x", expand=True)
+        for w in (row["when"], row["text"]):
+            w.bind("<Button-1>", lambda e: self.app.reveal(self.items[row["i"]][3]))
+        return row
+    
+    def _fill_row(self, row, i):
+        when, icon, text, _ = self.items[i]
+        row["i"] = i
+        day = datetime.strptime(when[:10], "%Y-%m-%d").date()
+        today = datetime.now().date()
+        name = "Today" if day == today else "Tomorrow" if day == today + timedelta(days=1) else day.strftime("%a %d")
+        row["when"].config(text=f"{name} {when[11:]}".strip())
+        row["text"].config(text=f"{icon} {' '.join(text.split())}"[:40])
+    
+    def on_mode_change(self):
+        self.load()
+
+
+# ============== REMINDERS ==============
+def parse_due(due, remind=""):
+    """{"due", "remind"} from what was typed for a new task: a date as YYYY-MM-DD, "today",
+    "tomorrow" or "+N" days, and a reminder time HH:MM on that day (today without a date).
+    Empty fields are left out; anything else raises ValueError"""
+    found = {}
+    due, remind = due.strip().lower(), remind.strip()
+    today = datetime.now().date()
+    if due:
+        if due in ("today", "tomorrow"):
+            day = today + timedelta(days=due == "tomorrow")
+        elif due.startswith("+"):
+            day = today + timedelta(days=int(due[1:]))
+        else:
+            day = datetime.strptime(due, "%Y-%m-%d").date()
+        found["due"] = day.isoformat()
+    if remind:
+        at = datetime.strptime(remind, "%H:%M")
+        found["remind"] = f"{found.get('due', today.isoformat())}T{at:%H:%M}"
+    return found
+
+
+class ReminderScheduler:
+    """Task reminders ("remind" on a todo) and day planner slot reminders (data["slot_reminders"],
+    "YYYY-MM-DDTHH" -> time) in one min-heap, with a single after() armed for the earliest.
+    Edits re-sync it. The minute tick re-arms it, so a sleep or a clock change is caught
+    within a minute and reminders missed while the app was closed ring on startup"""
+    
+    def __init__(self, app, notify):
+        self.app = app
+        self.notify = notify    # notify(ref, text, path) for every reminder that rings
+        self.heap = []          # (time, ref) - entries that no longer match self.due are skipped
+        self.due = {}           # ref -> time, ref is ("todos", task id) or ("slot", "YYYY-MM-DDTHH")
+        self.rung = 0
+        self._job = None
+        self._sync_job = None
+        self.sync()
+        app.subscribe(self._on_change)
+        app.ticks.subscribe(lambda now: self.arm(), "minute")
+    
+    def _on_change(self, op, path):
+        # One sync for a burst of changes
+        if path[0] in ("todos", "slot_reminders") and not self._sync_job:
+            self._sync_job = self.app.root.after_idle(self.sync)
+    
+    def sync(self):
+        """Pick up added, moved and removed reminders"""
+        self._sync_job = None
+        wanted = {}
+        for task in self.app.data.get("todos", []):
+            if task.get("remind") and not task.get("done") and task.get("id") is not None:
+                wanted[("todos", task["id"])] = task["remind"]
+        for slot, when in self.app.data.get("slot_reminders", {}).items():
+            wanted[("slot", slot)] = when
+        for ref, when in wanted.items():
+            if self.due.get(ref) != when:
+                heapq.heappush(self.heap, (when, ref))
+        self.due = wanted
+        if len(self.heap) > 2 * len(self.due) + 16:
+            self.heap = [(when, ref) for ref, when in self.due.items()]
+            heapq.heapify(self.heap)
+        self.arm()
+    
+    def arm(self):
+        """(Re)start the one timer for the earliest reminder, against the wall clock now"""
+        if self._job:
+            self.app.root.after_cancel(self._job)
+            self._job = None
+        while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return
+        wait = (datetime.strptime(self.heap[0][0], "%Y-%m-%dT%H:%M") - datetime.now()).total_seconds()
+        # A few ms late so the minute has surely started; at most a day, the minute tick re-arms anyway
+        self._job = self.app.root.after(int(min(max(wait, 0), 86400) * 1000) + 5, self._fire)
+    
+    def _fire(self):
+        self._job = None
+        now = minute_key(datetime.now())
+        rung = []
+        while self.heap and self.heap[0][0] <= now:
+            when, ref = heapq.heappop(self.heap)
+            if self.due.get(ref) == when:
+                del self.due[ref]
+                rung.append(ref)
+        if rung:
+            beep()
+        for ref in rung:
+            self._ring(ref)
+        self.arm()
+    
+    def _task_pos(self, tid):
+        return next((pos for pos, task in enumerate(self.app.data.get("todos", [])) if task.get("id") == tid), None)
+    
+    def _ring(self, ref):
+        # A reminder rings once: it is removed from the data, snoozing puts it back
+        self.rung += 1
+        if ref[0] == "todos":
+            pos = self._task_pos(ref[1])
+            if pos is None:
+                return
+            self.app.delete(["todos", pos, "remind"])
+            self.notify(ref, self.app.data["todos"][pos].get("text", ""), ("todos", pos))
+        else:
+            date, hour = ref[1][:10], str(int(ref[1][11:]))
+            self.app.delete(["slot_reminders", ref[1]])
+            self.app.fetch("day_planner", date)
+            text = self.app.data.get("day_planner", {}).get(date, {}).get(hour, "")
+            self.notify(ref, f"{int(hour):02d}:00 {text}".strip(), ("day_planner", date, hour))
+    
+    def snooze(self, ref, minutes=REMINDER_SNOOZE_MIN):
+        when = minute_key(datetime.now() + timedelta(minutes=minutes))
+        if ref[0] == "todos":
+            pos = self._task_pos(ref[1])
+            if pos is not None:
+                self.app.put(["todos", pos, "remind"], when)
+        else:
+            self.app.put(["slot_reminders", ref[1]], when)
+
+
+class ReminderPopup:
+    """Always-on-top card for one reminder that rang: open the item, snooze it or dismiss it"""
+    
+    def __init__(self, app, ref, text, path, slot):
+        self.app = app
+        theme = THEMES.get(app.data.get("theme", "🌊 Blue"), THEMES["🌊 Blue"])
+        self.win = tk.Toplevel(app.root)
+        self.win.overrideredirect(True)
+        self.win.attributes('-topmost', True)
+        # Stacked up from the bottom right corner
+        x, y = self.win.winfo_screenwidth() - 280, self.win.winfo_screenheight() - 150 - slot * 100
+        self.win.geometry(f"260x90+{x}+{max(y, 0)}")
+        
+        frame = tk.Frame(self.win, bg=theme["bg"], highlightbackground=theme["accent"], highlightthickness=2)
+        frame.pack(fill="both", expand=True)
+        tk.Label(frame, text="⏰ Reminder", bg=theme["bg"], fg=theme["accent"],
+                font=FONTS["small"], anchor="w").pack(fill="x", padx=6, pady=(4, 0))
+        tk.Label(frame, text=" ".join(text.split())[:80], bg=theme["bg"], fg=theme["text"], font=FONTS["small"],
+                anchor="w", justify="left", wraplength=240).pack(fill="x", padx=6)
+        
+        btns = tk.Frame(frame, bg=theme["bg"])
+        btns.pack(side="bottom", fill="x", padx=6, pady=4)
+        for label, command in (("Open", lambda: app.reveal(path)),
+                               (f"Snooze {REMINDER_SNOOZE_MIN} min", lambda: app.reminders.snooze(ref)),
+                               ("Dismiss", None)):
+            tk.Button(btns, text=label, command=lambda c=command: self.close(c), bg=theme["button"], fg=theme["text"],
+                     font=FONTS["tiny"], bd=0, padx=6, cursor="hand2").pack(side="left", padx=2)
+    
+    def close(self, then=None):
+        self.app.popups.remove(self)
+        self.win.destroy()
+        if then:
+            then()
+
+
+# ============== SEARCH ==============
+WORD_RE = re.compile(r"\w+")
+SEARCH_WIDGETS = {"todos": "todo", "notes": "sticky_notes", "events": "calendar",
+                  "day_planner": "day_planner", "week_planner": "week_planner", "monthly": "monthly_planner"}
+SEARCH_ICONS = {"todos": "✅", "notes": "📝", "events": "📅", "day_planner": "📆", "week_planner": "📋", "monthly": "🎯"}
+
+
+def words(text):
+    return WORD_RE.findall(text.casefold())
+
+
+def search_texts(prefix, node):
+    """(path, text) for every searchable text in node, the data found at path prefix.
+    Each level is copied with list() before walking it, so this can run off the Tk thread"""
+    if node is None:
+        return
+    if prefix[0] in SEARCH_LISTS:
+        items = enumerate(list(node)) if len(prefix) == 1 else [(prefix[1], node)]
+        for i, item in items:
+            text = item.get("text") if isinstance(item, dict) else None
+            if text:
+                yield (prefix[0], i), text
+    elif isinstance(node, dict):
+        for key, value in list(node.items()):
+            yield from search_texts(prefix + (key,), value)
+    elif isinstance(node, str) and node.strip():
+        yield prefix, node
+
+
+def hit_label(path, text):
+    """One line for a search hit: where it is and the start of its text"""
+    domain = path[0]
+    if domain == "day_planner":
+        where = f"{path[1]} {int(path[2]):02d}:00"
+    elif domain == "week_planner":
+        where = (datetime.strptime(path[1], "%Y-%m-%d") + timedelta(days=int(path[2]))).strftime("%Y-%m-%d")
+    elif domain in SEARCH_LISTS:
+        where = ""
+    else:
+        where = " ".join(path[1:])
+    snippet = " ".join(text.split())
+    return f"{SEARCH_ICONS[domain]} {where + ' ' if where else ''}{snippet}"[:60]
+
+
+class SearchIndex:
+    """Inverted index over the texts of SEARCH_DOMAINS. A document is one data path,
+    e.g. ("day_planner", "2024-05-01", "9") or ("todos", 3).
+    Each word's postings are kept sorted by (occurrences, date), so a query reads only the best
+    entries of every matching word until nothing left unread can make the top hits. The
+    vocabulary is sorted too, so a query word finds every word it begins by bisection"""
+    
+    def __init__(self):
+        self.docs = {}        # path -> text
+        self.postings = {}    # word -> [(occurrences, str(path[1]), path)] ascending
+        self.vocab = []       # sorted words
+        self.groups = {}      # path[:2] -> paths, so a change drops its documents without a full scan
+    
+    def add(self, path, text, sort=True):
+        counts = Counter(words(text))
+        if not counts:
+            return
+        self.docs[path] = text
+        self.groups.setdefault(path[:2], set()).add(path)
+        for word, n in counts.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = []
+                if sort:
+                    insort(self.vocab, word)
+            if sort:
+                insort(posting, (n, str(path[1]), path))
+            else:
+                posting.append((n, str(path[1]), path))
+    
+    def finish(self):
+        """Sort once after a bulk load with add(sort=False)"""
+        for posting in self.postings.values():
+            posting.sort()
+        self.vocab = sorted(self.postings)
+    
+    def discard(self, prefix):
+        """Drop every document at or below path prefix"""
+        n = len(prefix)
+        keys = [prefix[:2]] if n >= 2 else [k for k in self.groups if k[0] == prefix[0]]
+        for key in keys:
+            group = self.groups.get(key, set())
+            for path in [p for p in group if p[:n] == prefix]:
+                group.discard(path)
+                for word, count in Counter(words(self.docs.pop(path))).items():
+                    posting = self.postings[word]
+                    del posting[bisect_left(posting, (count, str(path[1]), path))]
+                    if not posting:
+                        del self.postings[word]
+                        del self.vocab[bisect_left(self.vocab, word)]
+            if not group:
+                self.groups.pop(key, None)
+    
+    def _weight(self, word, term):
+        # Rare words weigh more, and whole-word matches more than prefixes
+        return math.log(1 + len(self.docs) / len(self.postings[word])) * (1 if word == term else SEARCH_PREFIX_WEIGHT)
+    
+    def _score(self, path, terms):
+        """Score of one document, or None if a term matches none of its words"""
+        text = self.docs[path].casefold()
+        # Most documents read while looking for a rare combination fail this cheap test
+        if any(term not in text for term in terms):
+            return None
+        counts = Counter(WORD_RE.findall(text))
+        score = 0
+        for term in terms:
+            part = sum(n * self._weight(w, term) for w, n in counts.items() if w.startswith(term))
+            if not part:
+                return None
+            score += part
+        return score
+    
+    def search(self, query, limit=SEARCH_LIMIT):
+        """[(score, path, text)] best first, for documents matching every word of query
+        (the whole word or its beginning). Ties go to the later date"""
+        terms = set(words(query))
+        if not terms:
+            return []
+        # One list per (term, matching word), read from the best end
+        lists = []
+        for term in terms:
+            i = bisect_left(self.vocab, term)
+            found = []
+            while i < len(self.vocab) and self.vocab[i].startswith(term):
+                word = self.vocab[i]
+                found.append([self.postings[word], len(self.postings[word]), self._weight(word, term)])
+                i += 1
+            if not found:
+                return []
+            lists.append(found)
+        
+        seen = set()
+        best = []     # min-heap of (score, str(path[1]), path)
+        
+        def offer(path, key):
+            score = self._score(path, terms)
+            if score is not None:
+                if len(best) < limit:
+                    heapq.heappush(best, (score, key, path))
+                elif (score, key, path) > best[0]:
+                    heapq.heapreplace(best, (score, key, path))
+        
+        while True:
+            for found in lists:
+                for cursor in found:
+                    posting, i, _ = cursor
+                    if not i:
+                        continue
+                    cursor[1] = i = i - 1
+                    _, key, path = posting[i]
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                    offer(path, key)
+            
+            # Once one term's lists are read, every document matching the query has been seen
+            if any(not any(i for _, i, _ in found) for found in lists):
+                break
+            # Nothing unread can score above the sum of the next entries - or tie it with a later date
+            if len(best) == limit:
+                nxt = [(posting[i - 1], weight) for found in lists for posting, i, weight in found if i]
+                bound = sum(entry[0] * weight for entry, weight in nxt)
+                if best[0][:2] >= (bound, min(entry[1] for entry, _ in nxt)):
+                    break
+            # Common words that rarely occur together: intersecting whole postings is cheaper
+            if len(terms) > 1 and len(seen) > SEARCH_SCAN_DOCS:
+                matching = None
+                for found in lists:
+                    paths = {entry[2] for posting, _, _ in found for entry in posting}
+                    matching = paths if matching is None else matching & paths
+                for path in matching - seen:
+                    offer(path, str(path[1]))
+                break
+        return [(score, path, self.docs[path]) for score, _, path in sorted(best, reverse=True)]
+
+
+class SearchIndexer:
+    """Builds the SearchIndex on a worker thread at startup, then keeps it current from
+    App changes on the Tk thread. Changes made during the build are replayed once it is in"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.index = None      # SearchIndex once built
+        self.pending = []      # path prefixes changed during the build
+        self.build_ms = 0
+        self._built = None
+        app.subscribe(self._on_change)
+    
+    def start(self):
+        threading.Thread(target=self._build, name="widgets-search", daemon=True).start()
+        self.app.root.after(SEARCH_POLL_MS, self._poll)
+    
+    def _build(self):
+        t0 = time.perf_counter()
+        index = SearchIndex()
+        try:
+            # Stored history first; whatever is in memory is at least as new
+            docs = {}
+            for path, value in self.app.store.scan(SEARCH_DOMAINS):
+                docs.update(search_texts(path, value))
+            for domain in SEARCH_DOMAINS:
+                docs.update(search_texts((domain,), self.app.data.get(domain)))
+            for path, text in docs.items():
+                index.add(path, text, sort=False)
+            index.finish()
+        except Exception as e:
+            print(f"Search index error: {e}")
+        self.build_ms = (time.perf_counter() - t0) * 1000
+        self._built = index
+    
+    def _poll(self):
+        if self._built is None:
+            self.app.root.after(SEARCH_POLL_MS, self._poll)
+            return
+        self.index, self._built = self._built, None
+        pending, self.pending = self.pending, []
+        for prefix in pending:
+            self._update(prefix)
+        print(f"Search index: {len(self.index.docs)} entries in {self.build_ms:.0f} ms")
+    
+    def _on_change(self, op, path):
+        domain = path[0]
+        if domain not in SEARCH_DOMAINS:
+            return
+        if domain in SEARCH_LISTS:
+            # Deleting or appending shifts list positions - reindex the whole (short) list
+            prefix = tuple(path[:2]) if op == "set" and len(path) > 1 else (domain,)
+        else:
+            prefix = tuple(path)
+        if self.index is None:
+            self.pending.append(prefix)
+        else:
+            self._update(prefix)
+    
+    def _update(self, prefix):
+        self.index.discard(prefix)
+        for path, text in search_texts(prefix, _walk(self.app.data, prefix)):
+            self.index.add(path, text)
+    
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Ranked hits, or None while the index is still being built"""
+        return None if self.index is None else self.index.search(query, limit)
 
 
 # ============== MAIN APP ==============
+# Startup order: cheap widgets first so something is on screen quickly, heavy ones in later idle slices
+WIDGET_CLASSES = {
+    "clock": ClockWidget, "todo": TodoWidget, "sticky_notes": StickyNotesWidget,
+    "pomodoro": PomodoroWidget, "habit_tracker": HabitTrackerWidget, "day_planner": DayPlannerWidget,
+    "monthly_planner": MonthlyPlannerWidget, "calendar": CalendarWidget, "week_planner": WeekPlannerWidget,
+    "agenda": AgendaWidget,
+}
+
+
 class App:
-    def __init__(self):
+    def __init__(self, idle_detector=None, backend=None):
+        self.started = time.perf_counter()
+        self.startup = {}   # timings in ms: first_widget, all_widgets
         self.root = tk.Tk()
         self.root.withdraw()
-        
-        # Initialize desktop layer
+        load_user_themes(check=self.root.winfo_rgb)
+        self.backend = backend or open_backend()
+        self.desktop = DesktopWallpaperLayer(self.root, self.backend)
+        self.idle_detector = idle_detector or self.backend
+        self.idle = False
+        self._idle_job = None
+        self.saver = WriteBehindSaver(self.root, self._write)
+        self.geometry = {}    # (kind, wid) -> position or size not recorded yet
+        self.layout_saver = WriteBehindSaver(self.root, self._commit_geometry, delay=LAYOUT_SAVE_DELAY_MS)
+        self.store = open_store()
+        self.writer = BackgroundWriter(self.store.write)
+        self.changes = []
+        self.listeners = []
+        self.ticks = TickScheduler(self.root)
+        self._full_save = False
+        self._poll_job = None
+        self.save_errors = 0
+        self.last_save_error = None
+        self._save_failures = 0
+        
+        # Find the desktop layer in the background while widgets are built
         print("Initializing desktop layer...")
-        DesktopWallpaperLayer.initialize()
+        self.desktop.start()
         
         self.load()
+        self.recurrences = RecurrenceEngine(self)
+        self.timed = TimedEvents(self)
+        self.popups = []
+        self.reminders = ReminderScheduler(self, self.show_reminder)
+        self.search = SearchIndexer(self)
+        self.search.start()
         self.widgets = {}
+        self._search_job = None
+        self.hits = []
         self.create_widgets()
         self.create_panel()
+        self.ticks.subscribe(self.check_idle, "minute")
     
     def load(self):
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            except:
-                self.data = {}
+        self.data = self.store.load()
+    
+    def fetch(self, domain, key):
+        """Make sure one period (date, week start or "YYYY-MM") of a domain is in self.data"""
+        self.store.fetch(self.data, domain, key, self.changes)
+    
+    def hold(self, path):
+        """Changed data[path] in place without recording it yet - the store must not drop it"""
+        self.store.hold(self.data, path)
+    
+    def months(self, domain):
+        """Every "YYYY-MM" with stored data for a period domain (fetch() each one to read it)"""
+        return self.store.months(self.data, domain)
+    
+    def flush(self):
+        """Write pending changes now"""
+        for widget in self.widgets.values():
+            widget.commit_edits()
+        self.layout_saver.flush()
+        return self.saver.flush()
+    
+    def save_geometry(self, kind, wid, value):
+        """Queue a window position or size. Layout is batched apart from content: it is
+        recorded once moving has settled, so dragging around doesn't keep the store busy"""
+        self.geometry[(kind, wid)] = value
+        self.layout_saver.mark_dirty()
+    
+    def _commit_geometry(self):
+        pending, self.geometry = self.geometry, {}
+        for (kind, wid), value in pending.items():
+            if self.data.get(kind, {}).get(wid) != value:
+                self.put([kind, wid], value)
+    
+    @property
+    def save_pending(self):
+        return self.saver.pending
+    
+    def _write(self):
+        # Snapshot on the Tk thread, encode and write on the writer thread
+        changes, self.changes = self.changes, []
+        full, self._full_save = self._full_save, False
+        self.writer.submit(self.store.prepare(self.data, None if full else changes))
+        if not self._poll_job:
+            self._poll_job = self.root.after(SAVE_POLL_MS, self._poll_writes)
+    
+    def _poll_writes(self):
+        self._poll_job = None
+        for payload, error in self.writer.poll():
+            if error:
+                self._on_save_error(payload, error)
+            else:
+                self._save_failures = 0
+        if self.writer.outstanding:
+            self._poll_job = self.root.after(SAVE_POLL_MS, self._poll_writes)
+    
+    def _on_save_error(self, payload, error):
+        self.save_errors += 1
+        self._save_failures += 1
+        self.last_save_error = f"{type(error).__name__}: {error}"
+        print(f"Save error #{self.save_errors}: {self.last_save_error}")
+        
+        # The store falls back to a full write; retry a few times before waiting for the next edit
+        self.store.failed(payload)
+        self._full_save = True
+        if self._save_failures <= SAVE_RETRIES:
+            self.saver.mark_dirty()
+        self.update_save_status()
+    
+    def update_save_status(self):
+        if hasattr(self, "save_lbl"):
+            text = f"⚠ {self.save_errors} save error(s): {self.last_save_error}" if self.save_errors else ""
+            self.save_lbl.config(text=text[:60])
+    
+    # ----- Mutations -----
+    def _record(self, op, path, value=None):
+        path = list(path)
+        if len(path) > 1 and path[0] in PERIOD_DOMAINS:
+            # Never change a period the store only has on disk - a delete would find nothing to record
+            self.fetch(path[0], path[1])
+        if not apply_change(self.data, op, path, value):
+            return False
+        # A burst of keystrokes into one field becomes a single record. Only a set or a dict-key
+        # delete replaces a pending set - an append must keep the set it builds on
+        last = self.changes[-1] if self.changes else None
+        if last and last[0] == "set" and last[1] == path and (op == "set" or op == "del" and isinstance(path[-1], str)):
+            self.changes[-1] = (op, path, value)
         else:
-            self.data = {}
+            self.changes.append((op, path, value))
+        self.saver.mark_dirty()
+        for callback in self.listeners:
+            callback(op, path)
+        return True
     
-    def save(self):
-        try:
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-        except:
-            pass
+    def subscribe(self, callback):
+        """Call callback(op, path) after every recorded change"""
+        self.listeners.append(callback)
+    
+    def put(self, path, value):
+        """Set data[path] = value, creating missing dicts along the way"""
+        return self._record("set", path, value)
+    
+    def delete(self, path):
+        """Remove data[path] (a dict key or list index) if it exists"""
+        return self._record("del", path)
+    
+    def append(self, path, value):
+        """Append value to the list at data[path], creating it if needed"""
+        return self._record("append", path, value)
     
     def create_widgets(self):
+        """Build the first visible widget now and the others one per idle slice.
+        Hidden widgets are only built when they are first shown - except a running Pomodoro"""
         hidden = self.data.get("hidden", [])
+        self._hydrate_queue = [wid for wid in WIDGET_CLASSES if wid not in hidden]
+        self._hydrate_next()
         
-        classes = {
-            "calendar": CalendarWidget, "todo": TodoWidget, "day_planner": DayPlannerWidget,
-            "week_planner": WeekPlannerWidget, "monthly_planner": MonthlyPlannerWidget,
-            "sticky_notes": StickyNotesWidget, "pomodoro": PomodoroWidget,
-            "habit_tracker": HabitTrackerWidget, "clock": ClockWidget
-        }
-        
-        for wid, cls in classes.items():
-            self.widgets[wid] = cls(self.root, self)
-            if wid in hidden:
-                self.widgets[wid].win.withdraw()
+        # A hidden timer must still finish its phase on time, so it can't wait to be shown
+        if "pomodoro" in hidden and (self.data.get("pomo_timer") or {}).get("ends_at") is not None:
+            self.widget("pomodoro").win.withdraw()
+    
+    def _hydrate_next(self):
+        hidden = self.data.get("hidden", [])
+        while self._hydrate_queue:
+            wid = self._hydrate_queue.pop(0)
+            if wid not in self.widgets and wid not in hidden:
+                self.widget(wid)
+                break
+        
+        if self._hydrate_queue:
+            self.root.after_idle(self._hydrate_next)
+        else:
+            self._mark_startup("all_widgets")
+            print(f"Startup: first widget {self.startup.get('first_widget', 0):.0f} ms, "
+                  f"{len(self.widgets)} widgets {self.startup['all_widgets']:.0f} ms")
+    
+    def _mark_startup(self, name):
+        if name not in self.startup:
+            self.startup[name] = (time.perf_counter() - self.started) * 1000
+    
+    def widget(self, wid):
+        """The widget for wid, built on first use"""
+        if wid not in self.widgets:
+            self.widgets[wid] = WIDGET_CLASSES[wid](self.root, self)
+            if "first_widget" not in self.startup:
+                # Drawn, not just created
+                self.widgets[wid].win.update_idletasks()
+                self._mark_startup("first_widget")
+        return self.widgets[wid]
     
     def create_panel(self):
         self.panel = tk.Toplevel(self.root)
         self.panel.title("🎮 Widgets")
-        self.panel.geometry("260x480")
+        self.panel.geometry("260x640")
         self.panel.resizable(False, False)
         self.panel.attributes('-topmost', True)
         
@@ -1566,6 +5248,23 @@ class App:
                 bg=theme["bg"], fg=theme["text_light"], font=FONTS["tiny"],
                 pady=6).pack(fill="x", padx=10)
         
+        # Search
+        sframe = tk.LabelFrame(self.panel, text="🔍 Search", bg=theme["bg"],
+                              fg=theme["text"], font=FONTS["small"])
+        sframe.pack(fill="x", padx=10, pady=5)
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *a: self._queue_search())
+        entry = tk.Entry(sframe, textvariable=self.search_var, bg=theme["entry"], fg=theme["text"],
+                        font=FONTS["small"], bd=1, relief="solid")
+        entry.pack(fill="x", padx=5, pady=3)
+        entry.bind("<Return>", lambda e: self.open_hit(0))
+        
+        self.results = tk.Listbox(sframe, height=6, bg=theme["entry"], fg=theme["text"], font=FONTS["tiny"],
+                                  bd=0, highlightthickness=0, activestyle="none")
+        self.results.pack(fill="x", padx=5, pady=(0, 5))
+        self.results.bind("<<ListboxSelect>>", lambda e: self.open_hit(next(iter(self.results.curselection()), None)))
+        
         # Autostart
         auto = tk.Frame(self.panel, bg=theme["bg"])
         auto.pack(fill="x", padx=10, pady=5)
@@ -1584,7 +5283,7 @@ class App:
             "calendar": "📅 Calendar", "todo": "✅ To-Do", "day_planner": "📆 Day",
             "week_planner": "📋 Week", "monthly_planner": "🎯 Monthly",
             "sticky_notes": "📝 Notes", "pomodoro": "🍅 Pomodoro",
-            "habit_tracker": "📊 Habits", "clock": "🕐 Clock"
+            "habit_tracker": "📊 Habits", "clock": "🕐 Clock", "agenda": "🗓 Agenda"
         }
         
         self.widget_vars = {}
@@ -1606,12 +5305,51 @@ class App:
         tk.Button(btns, text="Hide All", command=self.hide_all, bg=theme["button"],
                  fg=theme["text"], font=FONTS["tiny"], bd=0, padx=10, cursor="hand2").pack(side="left", padx=3)
         
+        # Save errors
+        self.save_lbl = tk.Label(self.panel, text="", bg=theme["bg"], fg="#E74C3C",
+                                 font=FONTS["tiny"], wraplength=230, justify="left")
+        self.save_lbl.pack(fill="x", padx=10)
+        self.update_save_status()
+        
         # Exit
         tk.Button(self.panel, text="❌ Exit", command=self.exit_app, bg="#E74C3C",
                  fg="white", font=FONTS["small"], bd=0, padx=15, pady=5, cursor="hand2").pack(pady=10)
         
         self.panel.protocol("WM_DELETE_WINDOW", lambda: self.panel.iconify())
     
+    def _queue_search(self):
+        # One query per burst of keys
+        if not self._search_job:
+            self._search_job = self.root.after_idle(self.run_search)
+    
+    def run_search(self):
+        self._search_job = None
+        query = self.search_var.get()
+        hits = self.search.search(query) if query.strip() else []
+        self.results.delete(0, "end")
+        if hits is None:
+            self.results.insert("end", "Indexing…")
+            self._search_job = self.root.after(SEARCH_POLL_MS, self.run_search)
+            hits = []
+        self.hits = [path for _, path, _ in hits]
+        for _, path, text in hits:
+            self.results.insert("end", hit_label(path, text))
+    
+    def open_hit(self, i):
+        if i is not None and i < len(self.hits):
+            self.reveal(self.hits[i])
+    
+    def show_reminder(self, ref, text, path):
+        self.popups.append(ReminderPopup(self, ref, text, path, len(self.popups)))
+    
+    def reveal(self, path):
+        """Show the widget holding data path and jump to it"""
+        wid = SEARCH_WIDGETS[path[0]]
+        widget = self.widget(wid)
+        widget.show()
+        self.widget_vars[wid].set(True)
+        widget.reveal(*path[1:])
+    
     def toggle_auto(self):
         if self.auto_var.get():
             enable_autostart()
@@ -1623,24 +5361,59 @@ class App:
         for wid, var in self.widget_vars.items():
             var.set(wid not in hidden)
     
+    def check_idle(self, now=None):
+        """Suspend every widget while the session is idle or locked, resume them when it's back"""
+        if self._idle_job:
+            self.root.after_cancel(self._idle_job)
+            self._idle_job = None
+        try:
+            idle = self.idle_detector.is_idle(IDLE_AFTER_S)
+        except Exception as e:
+            print(f"Idle check error: {e}")
+            idle = False
+        if idle != self.idle:
+            self.idle = idle
+            if not idle:
+                for widget in self.widgets.values():
+                    if not widget.hidden:
+                        widget.resume()
+        if self.idle:
+            self._idle_job = self.root.after(IDLE_POLL_MS, self.check_idle)
+    
     def toggle_widget(self, wid):
         if self.widget_vars[wid].get():
-            self.widgets[wid].show()
-        else:
+            self.widget(wid).show()
+        elif wid in self.widgets:
             self.widgets[wid]._hide()
+        else:
+            # Never built - just remember it stays hidden
+            self._mark_hidden(wid)
+            self.flush()
+    
+    def _mark_hidden(self, wid):
+        if wid not in self.data.get("hidden", []):
+            self.append(["hidden"], wid)
     
     def show_all(self):
-        for wid, widget in self.widgets.items():
-            widget.show()
+        for wid in WIDGET_CLASSES:
+            self.widget(wid).show()
             self.widget_vars[wid].set(True)
     
     def hide_all(self):
-        for wid, widget in self.widgets.items():
-            widget._hide()
+        for wid in WIDGET_CLASSES:
+            if wid in self.widgets:
+                self.widgets[wid]._hide(flush=False)
+            else:
+                self._mark_hidden(wid)
             self.widget_vars[wid].set(False)
+        self.flush()
     
     def exit_app(self):
-        self.save()
+        self.flush()
+        if not self.writer.drain():
+            print("Save still running at exit")
+        self._poll_writes()
+        self.store.close()
         self.root.quit()
         self.root.destroy()
         sys.exit()
@@ -1649,7 +5422,462 @@ class App:
         self.root.mainloop()
 
 
+# ============== BENCHMARKS ==============
+def sample_data(years):
+    """Synthetic history with planner slots, events, weekly plans and focus stats for every day"""
+    data = {"theme": "🌊 Blue", "positions": {wid: {"x": 50, "y": 50} for wid in COMPACT_SIZES},
+            "todos": [{"text": f"Task {i}", "done": i % 2 == 0, "priority": "low"} for i in range(50)],
+            "events": {}, "day_planner": {}, "week_planner": {}, "monthly": {}, "pomo_stats": {}}
+    start = datetime(2000, 1, 1)
+    for i in range(int(years * 365)):
+        day = start + timedelta(days=i)
+        key = day.strftime("%Y-%m-%d")
+        data["day_planner"][key] = {str(h): f"Slot {h} on {key}" for h in range(8, 18)}
+        data["pomo_stats"][key] = {"secs": 1500 * (i % 5), "sessions": i % 5}
+        if i % 3 == 0:
+            data["events"][key] = f"Event {i}"
+        if day.weekday() == 0:
+            data["week_planner"][key] = {str(d): f"Plan for day {d}" for d in range(7)}
+        if day.day == 1:
+            data["monthly"][key[:7]] = {"goals": "Goals", "tasks": "Tasks"}
+    return data
+
+
+def benchmark_encoder(years=(1, 3, 10, 30), rounds=10):
+    """Full json.dumps versus IncrementalEncoder after a one-slot edit, by dataset size"""
+    print(f"{'years':>6} {'size KB':>9} {'full ms':>9} {'incremental ms':>15}")
+    for y in years:
+        data = sample_data(y)
+        encoder = IncrementalEncoder()
+        encoder.mark(None)
+        encoder.encode(encoder.prepare(data))
+        
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            text = json.dumps(data, indent=2, ensure_ascii=False)
+        full_ms = (time.perf_counter() - t0) / rounds * 1000
+        
+        key = next(reversed(data["day_planner"]))
+        t0 = time.perf_counter()
+        for i in range(rounds):
+            change = ("set", ["day_planner", key, "9"], f"Edit {i}")
+            apply_change(data, *change)
+            encoder.mark([change])
+            text = encoder.encode(encoder.prepare(data))
+        inc_ms = (time.perf_counter() - t0) / rounds * 1000
+        
+        assert text == json.dumps(data, indent=2, ensure_ascii=False)
+        print(f"{y:>6} {len(text) // 1024:>9} {full_ms:>9.1f} {inc_ms:>15.1f}")
+    
+    # Round trip through edits inside list sections and removed/added sections
+    for change in [("set", ["todos", 0, "done"], True), ("set", ["todos", 1], {"text": "New", "done": False}),
+                   ("del", ["todos", 2], None), ("append", ["todos"], {"text": "Added", "done": False}),
+                   ("append", ["hidden"], "todo"), ("del", ["hidden", 0], None), ("set", ["theme"], "🌿 Green"),
+                   ("del", ["pomo_stats"], None), ("set", ["day_planner", key, "10"], "Last")]:
+        apply_change(data, *change)
+        encoder.mark([change])
+        assert encoder.encode(encoder.prepare(data)) == json.dumps(data, indent=2, ensure_ascii=False), change
+    print("round trip ok")
+
+
+def benchmark_timer(duration=25 * 60, seed=1):
+    """Simulated Tk loop with random stalls: per-callback countdown versus DeadlineTimer"""
+    import random
+    rng = random.Random(seed)
+    now = [0.0]
+    timer = DeadlineTimer(duration, clock=lambda: now[0], wall=lambda: 1e9 + now[0])
+    timer.start()
+    ticks = credited = 0
+    while timer.remaining() > 0:
+        # Callbacks fire late: small jitter, saves and redraws, now and then a machine sleep
+        stall = rng.choice([0.002, 0.05, 0.4, 1.5]) if rng.random() > 0.002 else 300
+        now[0] += timer.next_tick() / 1000 + stall
+        ticks += 1
+        credited += int(timer.elapsed()) - credited
+    # When the real phase is over, the old loop has counted one second per callback
+    ended = now[0] - timer.overdue()
+    print(f"{'':>16} {'focus s':>8} {'phase end s':>12} {'drift s':>8}")
+    print(f"{'after(1000) -=1':>16} {ticks:>8} {'-':>12} {ticks - duration:>8}")
+    print(f"{'deadline':>16} {credited:>8} {ended:>12.1f} {ended - duration:>8.1f}")
+
+
+def benchmark_search(years=(1, 3, 10, 30), rounds=20):
+    """Index build time and query latency by dataset size"""
+    queries = ("slot", "s", "plan day", "event 12", "goals")
+    print(f"{'years':>6} {'entries':>8} {'build ms':>9} " + " ".join(f"{q!r:>11}" for q in queries) + "  (ms)")
+    for y in years:
+        data = sample_data(y)
+        t0 = time.perf_counter()
+        index = SearchIndex()
+        for domain in SEARCH_DOMAINS:
+            for path, text in search_texts((domain,), data.get(domain)):
+                index.add(path, text, sort=False)
+        index.finish()
+        build_ms = (time.perf_counter() - t0) * 1000
+        
+        times = []
+        for q in queries:
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                index.search(q)
+            times.append((time.perf_counter() - t0) / rounds * 1000)
+        print(f"{y:>6} {len(index.docs):>8} {build_ms:>9.0f} " + " ".join(f"{t:>11.2f}" for t in times))
+
+
+def benchmark_intervals(counts=(1000, 10000, 100000), rounds=200, seed=1):
+    """Month range query: IntervalIndex versus scanning every event"""
+    import random
+    rng = random.Random(seed)
+    print(f"{'events':>8} {'scan ms':>9} {'index ms':>9} {'hits':>6}")
+    for n in counts:
+        base = datetime(2000, 1, 1)
+        items = []
+        for i in range(n):
+            start = base + timedelta(minutes=rng.randrange(30 * 365 * 24 * 60 // 15) * 15)
+            # Mostly an hour or two, sometimes several days
+            length = timedelta(hours=rng.choice([1, 1, 2, 3])) if rng.random() > 0.05 else timedelta(days=rng.randint(1, 14))
+            items.append((minute_key(start), minute_key(start + length), str(i)))
+        index = IntervalIndex(items)
+        a, b = "2015-06-01T00:00", "2015-07-01T00:00"
+        
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            scanned = [item for item in items if item[0] < b and item[1] > a]
+        scan_ms = (time.perf_counter() - t0) / rounds * 1000
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            found = index.overlapping(a, b)
+        index_ms = (time.perf_counter() - t0) / rounds * 1000
+        
+        assert sorted(scanned) == found
+        print(f"{n:>8} {scan_ms:>9.2f} {index_ms:>9.3f} {len(found):>6}")
+
+
+def benchmark_desktop(windows=9, find_delay=0.25):
+    """Longest Tk-thread stall during startup: blocking layer search and per-window
+    embedding versus the background search and one batched embed"""
+    class Stub:
+        def __init__(self, root, i):
+            self.wid = f"w{i}"
+            self.win = tk.Toplevel(root)
+            tk.Label(self.win, text=self.wid).pack()
+    
+    def measure(batched):
+        root = tk.Tk()
+        root.withdraw()
+        backend = FakeDesktopBackend(find_delay)
+        stalls = []
+        last = [0.0]
+        
+        def beat():
+            now = time.perf_counter()
+            stalls.append(now - last[0])
+            last[0] = now
+            if len(backend.embedded) < windows:
+                root.after(1, beat)
+            else:
+                root.quit()
+        
+        def build():
+            t0 = time.perf_counter()
+            if batched:
+                layer = DesktopWallpaperLayer(root, backend)
+                layer.start()
+                for i in range(windows):
+                    layer.request(Stub(root, i))
+            else:
+                found = backend.find_layer()
+                for i in range(windows):
+                    stub = Stub(root, i)
+                    stub.win.update_idletasks()
+                    backend.embed(backend.handle(stub.win), found)
+            last[0] = time.perf_counter()
+            stalls.append(last[0] - t0)
+            root.after(1, beat)
+        
+        root.after_idle(build)
+        t0 = time.perf_counter()
+        root.mainloop()
+        total = time.perf_counter() - t0
+        root.destroy()
+        return max(stalls) * 1000, total * 1000
+    
+    print(f"{'':>10} {'max stall ms':>13} {'all embedded ms':>16}")
+    for name, batched in (("blocking", False), ("batched", True)):
+        stall, total = measure(batched)
+        print(f"{name:>10} {stall:>13.1f} {total:>16.1f}")
+
+
 # ============== START ==============
+# ============== SELF-TESTS ==============
+class FakeLoop:
+    """Stands in for the Tk root's timers: jobs run when advance() moves the clock past them"""
+    
+    def __init__(self):
+        self.now = 0
+        self.jobs = {}
+        self.count = 0
+    
+    def after(self, ms, fn=None, *args):
+        self.count += 1
+        job = f"after#{self.count}"
+        self.jobs[job] = (self.now + ms, self.count, fn, args)
+        return job
+    
+    def after_idle(self, fn, *args):
+        return self.after(0, fn, *args)
+    
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+    
+    def update_idletasks(self):
+        pass
+    
+    def advance(self, ms):
+        end = self.now + ms
+        while self.jobs:
+            job = min(self.jobs, key=lambda j: self.jobs[j][:2])
+            at, _, fn, args = self.jobs[job]
+            if at > end:
+                break
+            del self.jobs[job]
+            self.now = max(self.now, at)
+            fn(*args)
+        self.now = end
+
+
+def check_stores(seeds=15, ops=200):
+    """Random sets and deletes in planner history survive a reload of every store,
+    with the partition cache far smaller than the months touched"""
+    import random
+    import tempfile
+    stores = {
+        "json": lambda d: JsonStore(os.path.join(d, "data.json"), os.path.join(d, "journal")),
+        "journal": lambda d: JournalStore(os.path.join(d, "data.json"), os.path.join(d, "journal"), compact_bytes=4096),
+        "sqlite": lambda d: SqliteStore(os.path.join(d, "data.db"), os.path.join(d, "data.json"), os.path.join(d, "journal")),
+        "partitioned": lambda d: PartitionedStore(os.path.join(d, "parts"), os.path.join(d, "data.json"),
+                                                  os.path.join(d, "journal"), capacity=2),
+    }
+    for name, make in stores.items():
+        for seed in range(seeds):
+            rng = random.Random(seed)
+            with tempfile.TemporaryDirectory() as folder:
+                store = make(folder)
+                data, changes, model = store.load(), [], {"events": {}, "day_planner": {}}
+                for i in range(ops):
+                    date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                    path = ["events", date] if rng.random() < 0.5 else ["day_planner", date, str(rng.randint(8, 9))]
+                    op, value = ("set", f"v{i}") if rng.random() < 0.6 else ("del", None)
+                    # What App._record does: fetch the period, then apply and record
+                    store.fetch(data, path[0], path[1], changes)
+                    if apply_change(data, op, path, value):
+                        changes.append((op, path, value))
+                    apply_change(model, op, path, value)
+                    if rng.random() < 0.1:
+                        store.commit(data, changes)
+                        changes = []
+                store.commit(data, changes)
+                store.close()
+                
+                # Month by month, since the partition cache can't hold them all
+                store = make(folder)
+                data = store.load()
+                for domain, values in model.items():
+                    for m in range(1, 13):
+                        month = f"2024-{m:02d}"
+                        for day in range(1, 29):
+                            store.fetch(data, domain, f"{month}-{day:02d}")
+                        stored = {k: v for k, v in data.get(domain, {}).items() if k[:7] == month and v}
+                        expected = {k: v for k, v in values.items() if k[:7] == month and v}
+                        assert stored == expected, (name, seed, domain, month)
+                store.close()
+    print("stores ok")
+
+
+def check_page_refetch():
+    """A cached page whose month was evicted loads it again, so an edit finds the stored value"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as folder:
+        store = PartitionedStore(folder, os.path.join(folder, "data.json"), os.path.join(folder, "journal"), capacity=1)
+        data = store.load()
+        changes = [("set", ["events", "2024-01-05"], "Jan"), ("set", ["events", "2024-02-05"], "Feb")]
+        for change in changes:
+            apply_change(data, *change)
+        store.commit(data, changes)
+        data = store.load()
+        
+        class Host:
+            win = FakeLoop()
+            app = type("FakeApp", (), {"subscribe": lambda self, cb: None,
+                                       "fetch": lambda self, d, k: store.fetch(data, d, k)})()
+        
+        def build(month):
+            store.fetch(data, "events", month)
+            return {"deps": {("events", month)}, "text": data["events"].get(month + "-05")}
+        pages = PageCache(Host, build, lambda key: [])
+        assert pages.get("2024-01")["text"] == "Jan"
+        pages.get("2024-02")
+        assert "2024-01-05" not in data["events"]        # evicted, page still cached
+        assert pages.get("2024-01")["text"] == "Jan" and pages.hits == 1
+        assert data["events"].get("2024-01-05") == "Jan"
+    print("page refetch ok")
+
+
+def check_deadline_timer():
+    """DeadlineTimer against injected monotonic and wall clocks: stalls don't drift the end,
+    pauses don't count, and a restore after a gap keeps the saved wall-clock end"""
+    now = {"mono": 100.0, "wall": 1_000_000.0}
+    
+    def sleep(secs):
+        now["mono"] += secs
+        now["wall"] += secs
+    timer = DeadlineTimer(60, clock=lambda: now["mono"], wall=lambda: now["wall"])
+    timer.start()
+    started = now["wall"]
+    # Uneven, stalled ticks - the end still lands exactly 60 s after the start
+    for step in (0.3, 1.7, 12.0, 0.9, 30.1):
+        sleep(step)
+    assert timer.remaining() == 60 - 45.0
+    sleep(20.0)
+    assert timer.remaining() == 0 and timer.overdue() == 5.0 and timer.ends_at() == started + 60
+    
+    # Pause/resume: time paused is not counted
+    timer.reset(60)
+    timer.start()
+    sleep(10)
+    timer.pause()
+    sleep(500)
+    assert not timer.running and timer.remaining() == 50 and timer.overdue() == 0
+    timer.start()
+    sleep(20)
+    assert timer.remaining() == 30 and timer.elapsed() == 30
+    
+    # Restore after a gap: the monotonic clock restarted (reboot), the wall clock moved on
+    state = timer.state()
+    assert state["ends_at"] == now["wall"] + 30
+    now["mono"] = 5.0
+    now["wall"] += 10
+    restored = DeadlineTimer.restore(state, clock=lambda: now["mono"], wall=lambda: now["wall"])
+    assert restored.running and restored.remaining() == 20 and restored.ends_at() == state["ends_at"]
+    # ... and one restored after its end stays dated to that end
+    now["wall"] += 100
+    restored = DeadlineTimer.restore(state, clock=lambda: now["mono"], wall=lambda: now["wall"])
+    assert restored.remaining() == 0 and restored.overdue() == 80 and restored.ends_at() == state["ends_at"]
+    
+    paused = DeadlineTimer.restore({"duration": 60, "left": 42, "ends_at": None})
+    assert not paused.running and paused.remaining() == 42
+    print("deadline timer ok")
+
+
+def check_write_behind():
+    """A burst of keystrokes is one write once it settles, and a long burst still writes every
+    SAVE_MAX_DELAY_MS"""
+    loop = FakeLoop()
+    written = []
+    saver = WriteBehindSaver(loop, lambda: written.append(loop.now), clock=lambda: loop.now / 1000)
+    
+    # 30 keystrokes 100 ms apart: nothing while typing, one write SAVE_DELAY_MS after the last
+    for _ in range(30):
+        saver.mark_dirty()
+        loop.advance(100)
+    assert written == []
+    loop.advance(SAVE_DELAY_MS)
+    assert written == [2900 + SAVE_DELAY_MS] and not saver.pending
+    
+    # 20 s of non-stop typing: never more than SAVE_MAX_DELAY_MS between a change and its write
+    written.clear()
+    start = loop.now
+    for _ in range(200):
+        saver.mark_dirty()
+        loop.advance(100)
+    loop.advance(SAVE_DELAY_MS)
+    gaps = [b - a for a, b in zip([start] + written, written)]
+    assert max(gaps) <= SAVE_MAX_DELAY_MS and len(written) <= 20000 // SAVE_MAX_DELAY_MS + 1, gaps
+    assert not saver.pending
+    
+    # flush() writes at once and leaves nothing queued
+    saver.mark_dirty()
+    assert saver.flush() and not saver.flush() and not loop.jobs
+    print("write-behind ok")
+
+
+def check_desktop_layer():
+    """The layer search runs off the Tk thread, its result is reused for later batches,
+    and a search that finds no layer is not repeated for every request"""
+    class Window:
+        def __init__(self, n):
+            self.wid = f"w{n}"
+            self.win = type("Win", (), {"winfo_id": lambda self: n})()
+    
+    def settle(desktop):
+        # Run the loop until the worker thread has reported back
+        while desktop._thread.is_alive() or desktop._found is None or desktop._job or loop.jobs:
+            time.sleep(0.01)
+            loop.advance(DESKTOP_POLL_MS)
+    
+    loop, backend = FakeLoop(), FakeDesktopBackend(find_delay=0.3)
+    desktop = DesktopWallpaperLayer(loop, backend)
+    t0 = time.perf_counter()
+    desktop.start()
+    for n in range(3):
+        desktop.request(Window(n))
+    loop.advance(0)
+    assert time.perf_counter() - t0 < 0.1, "search blocked the Tk thread"
+    settle(desktop)
+    assert desktop.embedded == 3 and desktop.batches == 1 and backend.finds == 1
+    
+    for n in range(3, 6):
+        desktop.request(Window(n))
+    loop.advance(0)
+    assert desktop.embedded == 6 and backend.finds == 1, "cached layer not reused"
+    
+    # Layer gone stale (shell restarted): found again once
+    backend.layer = 2
+    desktop.request(Window(6))
+    loop.advance(0)
+    settle(desktop)
+    assert backend.finds == 2 and backend.embedded[6] == 2
+    
+    # No layer at all: one search, then requests fall back until the back-off runs out
+    loop, backend = FakeLoop(), FakeDesktopBackend()
+    backend.layer = None
+    desktop = DesktopWallpaperLayer(loop, backend)
+    desktop.start()
+    settle(desktop)
+    for n in range(5):
+        desktop.request(Window(n))
+        loop.advance(0)
+    assert backend.finds == 1 and not desktop.pending and desktop.embedded == 0
+    desktop._retry_at = 0
+    backend.layer = 3
+    desktop.request(Window(9))
+    loop.advance(0)
+    settle(desktop)
+    assert backend.finds == 2 and desktop.embedded == 1 and desktop._backoff == DESKTOP_RETRY_MS
+    print("desktop layer ok")
+
+
+def self_test():
+    check_stores()
+    check_page_refetch()
+    check_deadline_timer()
+    check_write_behind()
+    check_desktop_layer()
+
+
 if __name__ == "__main__":
-    app = App()
-    app.run()
+    if "--self-test" in sys.argv:
+        self_test()
+    elif "--bench-encode" in sys.argv:
+        benchmark_encoder()
+    elif "--bench-timer" in sys.argv:
+        benchmark_timer()
+    elif "--bench-desktop" in sys.argv:
+        benchmark_desktop()
+    elif "--bench-search" in sys.argv:
+        benchmark_search()
+    elif "--bench-intervals" in sys.argv:
+        benchmark_intervals()
+    else:
+        app = App()
+        app.run()